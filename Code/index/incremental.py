@@ -0,0 +1,164 @@
+"""
+Incremental news sync driven by nankai_news.updated_at
+增量同步：只推送上次同步之后变更的行，并清理已在 MySQL 中删除的文档
+"""
+
+import os
+import sys
+import json
+import time
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from datetime import datetime
+from elasticsearch import helpers
+from config import Config
+from index import get_es, get_stream_connection, iter_rows, row_to_action, bulk_index, invalidate_search_cache
+from near_dup import NearDupIndex
+
+TS_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 以 (updated_at, id) 作为高水位，updated_at 只有秒级精度，id 用于区分同一秒内的行；
+# 上界取本次开始时的 NOW()，当前这一秒内的变更留到下一次同步
+CHANGED_SQL = (
+    "SELECT * FROM nankai_news "
+    "WHERE (updated_at > %s OR (updated_at = %s AND id > %s)) AND updated_at < %s "
+    "ORDER BY updated_at, id"
+)
+
+
+def load_state(path=None):
+    """读取同步状态文件"""
+    path = path or Config.INDEX_STATE_FILE
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state, path=None):
+    """原子地写入同步状态文件"""
+    path = path or Config.INDEX_STATE_FILE
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def db_now(conn):
+    """以数据库时钟为准，避免应用与 MySQL 时区/时钟不一致"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT NOW()")
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+
+def capture_watermark(conn=None):
+    """返回当前数据库时间对应的高水位，供全量重建前记录"""
+    own_conn = conn is None
+    conn = conn or get_stream_connection()
+    try:
+        return {"updated_at": db_now(conn).strftime(TS_FORMAT), "id": 0}
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def sync_changes(index_name=None, es=None, state_path=None, **kwargs):
+    """推送自上次高水位以来变更的行，返回本次同步指标
+
+    kwargs 透传给 bulk_index
+    """
+    index_name = index_name or Config.NEWS_INDEX
+    es = es or get_es()
+    state = load_state(state_path)
+    watermark = state.get("watermark", {"updated_at": "1970-01-01 00:00:00", "id": 0})
+    # 变更的行还要与已索引的文章比较，查找近似重复
+    near_dup = NearDupIndex(es, index_name)
+
+    conn = get_stream_connection()
+    try:
+        now = db_now(conn)
+        tracker = {"last": None, "oldest": None, "rows": 0}
+
+        def actions():
+            params = (watermark["updated_at"], watermark["updated_at"], watermark["id"], now)
+            for row in iter_rows(conn, CHANGED_SQL, params):
+                tracker["rows"] += 1
+                tracker["last"] = (row["updated_at"], row["id"])
+                if tracker["oldest"] is None:
+                    tracker["oldest"] = row["updated_at"]
+                yield row_to_action(row, index_name, near_dup)
+
+        report = bulk_index(actions(), es=es, progress_every=0, **kwargs)
+    finally:
+        conn.close()
+
+    metrics = {
+        "run_at": now.strftime(TS_FORMAT),
+        "rows": tracker["rows"],
+        "indexed": report["indexed"],
+        "failed": report["failed"],
+        "elapsed": report["elapsed"],
+        # 本次推送的最旧变更距今的秒数，即索引落后数据库的时间
+        "lag_seconds": (now - tracker["oldest"]).total_seconds() if tracker["oldest"] else 0.0,
+        "near_duplicates": near_dup.stats["clustered"],
+        "errors": report["errors"],
+    }
+
+    if report["indexed"]:
+        es.indices.refresh(index=index_name)
+        invalidate_search_cache()
+
+    # 有失败时不推进高水位，下次同步会重新推送这些行
+    if tracker["last"] and not report["failed"]:
+        last_ts, last_id = tracker["last"]
+        state["watermark"] = {"updated_at": last_ts.strftime(TS_FORMAT), "id": last_id}
+    state["last_sync"] = {k: v for k, v in metrics.items() if k != "errors"}
+    save_state(state, state_path)
+    return metrics
+
+
+def reconcile_deletions(index_name=None, es=None, state_path=None, **kwargs):
+    """删除 ES 中存在但 MySQL 中已不存在的文档，返回删除数量"""
+    index_name = index_name or Config.NEWS_INDEX
+    es = es or get_es()
+    start = time.time()
+
+    conn = get_stream_connection()
+    try:
+        db_ids = {str(row["id"]) for row in iter_rows(conn, "SELECT id FROM nankai_news")}
+    finally:
+        conn.close()
+
+    hits = helpers.scan(es, index=index_name, query={"query": {"match_all": {}}}, _source=False, size=5000)
+    stale_ids = [hit["_id"] for hit in hits if hit["_id"] not in db_ids]
+
+    report = bulk_index(
+        (({"delete": {"_index": index_name, "_id": doc_id}}, None) for doc_id in stale_ids),
+        es=es, progress_every=0, **kwargs
+    )
+    if report["indexed"]:
+        es.indices.refresh(index=index_name)
+        invalidate_search_cache()
+
+    state = load_state(state_path)
+    state["last_reconcile"] = {
+        "run_at": datetime.now().strftime(TS_FORMAT),
+        "deleted": report["indexed"],
+        "failed": report["failed"],
+        "elapsed": round(time.time() - start, 2),
+    }
+    save_state(state, state_path)
+    return state["last_reconcile"]
+
+
+def print_metrics(metrics):
+    """打印增量同步指标"""
+    print(f"✓ 增量同步: 变更 {metrics['rows']} 行, 成功 {metrics['indexed']}, 失败 {metrics['failed']}, "
+          f"延迟 {metrics['lag_seconds']:.0f}s, 耗时 {metrics['elapsed']}s, 近似重复 {metrics['near_duplicates']} 篇")
+    for error in metrics['errors']:
+        print(f"  ✗ {error}")
@@ -1,110 +1,292 @@
-from elasticsearch import Elasticsearch
+#!/usr/bin/env python3
+"""
+News indexer: MySQL nankai_news -> Elasticsearch news_index
+新闻索引脚本：流式读取 MySQL，批量并发写入 Elasticsearch
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Add project root and Code/server to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'server'))
+
 import mysql.connector
+from elasticsearch import Elasticsearch, ApiError, ConnectionError, ConnectionTimeout
+from config import Config
+from elasticsearch_config import NEWS_INDEX_SETTINGS, NEWS_INDEX_MAPPINGS
+from search_cache import bump_generation
+from near_dup import NearDupIndex, document_text, print_near_dup_stats
 
-# 连接到Elasticsearch
-USERNAME = ""
-PASSWORD = ""
-es = Elasticsearch(
-    ["http://localhost:9200"],
-    basic_auth=(USERNAME, PASSWORD),
-    headers={"Accept": "application/json"},
-    verify_certs=False,
-    meta_header=False,
-)
-
-# 设置Elasticsearch索引的映射和配置
-settings = {
-    "index": {
-        "number_of_replicas": 2,
-        "number_of_shards": 3
-    },
-    "analysis": {
-        "filter": {
-            "autocomplete_filter": {
-                "type": "edge_ngram",
-                "min_gram": 2,
-                "max_gram": 20
-            }
-        },
-        "analyzer": {
-            "autocomplete": {  # 自动补全分析器
-                "type": "custom",
-                "tokenizer": "ik_smart",
-                "filter": [
-                    "lowercase",
-                    "autocomplete_filter"
-                ]
-            },
-            "ik_max_word_analyzer": {
-                "type": "custom",
-                "tokenizer": "ik_max_word",
-                "filter": ["lowercase"]
-            }
-        }
-    }
-}
-
-mappings = {
-    "properties": {
-        "ctime": {"type": "date", "format": "YYYY-MM-DD HH:mm"},
-        "url": {"type": "keyword"},
-        "wapurl": {"type": "keyword"},
-        "title": {
-            "type": "text",
-            "analyzer": "ik_max_word",
-            "fields": {
-                "autocomplete": {  # 为标题添加自动补全字段
-                    "type": "text",
-                    "analyzer": "autocomplete"
-                }
-            }
-        },
-        "media_name": {"type": "keyword"},
-        "keywords": {"type": "text", "analyzer": "ik_max_word"},
-        "content": {"type": "text", "analyzer": "ik_max_word"}
+# 可重试的批量写入状态码（429 为 ES 线程池队列已满）
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+def get_es():
+    """创建 Elasticsearch 客户端"""
+    return Elasticsearch(**Config.get_elasticsearch_config())
+
+
+def get_stream_connection():
+    """创建用于流式读取的独立 MySQL 连接（不走连接池、不缓冲结果集）"""
+    db_config = {
+        k: v for k, v in Config.MYSQL_CONFIG.items()
+        if k not in ('pool_name', 'pool_size', 'buffered')
     }
-}
-
-
-# 创建Elasticsearch索引（如果不存在）
-index_name = "news_index"
-if es.indices.exists(index=index_name):
-    es.indices.delete(index=index_name)
-es.indices.create(
-    index=index_name,
-    settings =settings,
-    mappings = mappings
-)
-
-# 连接到Mysql数据库
-conn=mysql.connector.connect(
-    host="localhost",
-    user="root",
-    password="Qwe248931",
-    database="web_search"
-)
-cursor = conn.cursor(dictionary=True)  # 使用字典模式获取结果
-
-# 执行查询
-cursor.execute("SELECT * FROM nankai_news")
-
-# 遍历 MySQL 结果集
-for row in cursor:
-    # 生成文档ID
-    doc_id = str(row['id'])
+    return mysql.connector.connect(**db_config)
 
-    # 处理日期格式转换
-    row["ctime"] = row["ctime"].strftime("%Y-%m-%d %H:%M")
 
-    # 创建文档副本并移除 id
+def iter_rows(conn, sql, params=None, fetch_size=None):
+    """使用服务端游标逐批读取结果集，内存占用与表大小无关"""
+    fetch_size = fetch_size or Config.INDEX_FETCH_SIZE
+    cursor = conn.cursor(dictionary=True, buffered=False)
+    try:
+        cursor.execute(sql, params or ())
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+    finally:
+        cursor.close()
+
+
+def row_to_doc(row):
+    """将 nankai_news 行转换为 ES 文档（移除 MySQL 自增 id）"""
     doc = dict(row)
-    del doc['id']  # 移除 MySQL 自增ID
+    doc.pop('id', None)
+    for key, value in doc.items():
+        if isinstance(value, datetime):
+            # ctime 与映射中的 yyyy-MM-dd HH:mm 格式保持一致
+            doc[key] = value.strftime("%Y-%m-%d %H:%M") if key == 'ctime' else value.isoformat()
+    return doc
+
+
+def row_to_action(row, index_name, near_dup=None):
+    """将 nankai_news 行转换为 bulk 操作 (action, source)，传入 near_dup 时附加近似重复簇字段"""
+    doc_id = str(row['id'])
+    doc = row_to_doc(row)
+    if near_dup is not None:
+        doc.update(near_dup.assign(doc_id, document_text(doc)))
+    return {"index": {"_index": index_name, "_id": doc_id}}, doc
+
+
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, default=str).encode('utf-8')
+
+
+def chunk_actions(actions, max_docs, max_bytes):
+    """按文档数和字节数两个上限切分 bulk 请求"""
+    chunk, chunk_bytes = [], 0
+    for action, source in actions:
+        lines = [_dumps(action)] if source is None else [_dumps(action), _dumps(source)]
+        size = sum(len(line) + 1 for line in lines)
+        if chunk and (len(chunk) >= max_docs or chunk_bytes + size > max_bytes):
+            yield chunk
+            chunk, chunk_bytes = [], 0
+        chunk.append(lines)
+        chunk_bytes += size
+    if chunk:
+        yield chunk
+
+
+def send_chunk(es, chunk, max_retries=None, initial_backoff=1.0, max_backoff=60.0):
+    """发送一个 bulk 请求，对 429/被拒绝的条目做指数退避重试
+
+    返回 (成功数, 失败数, 错误列表)
+    """
+    max_retries = Config.INDEX_BULK_MAX_RETRIES if max_retries is None else max_retries
+    pending = chunk
+    indexed = 0
+    errors = []
+    last_error = None
+
+    for attempt in range(max_retries + 1):
+        if attempt:
+            backoff = min(max_backoff, initial_backoff * 2 ** (attempt - 1))
+            time.sleep(backoff * random.uniform(0.5, 1.0))
+
+        body = b''.join(line + b'\n' for lines in pending for line in lines)
+        try:
+            resp = es.bulk(operations=body)
+        except (ConnectionError, ConnectionTimeout) as e:
+            last_error = {"error": str(e)}
+            continue
+        except ApiError as e:
+            last_error = {"status": e.meta.status, "error": str(e)}
+            if e.meta.status in RETRY_STATUSES:
+                continue
+            return indexed, len(pending) + len(errors), errors + [last_error]
+
+        # 不可重试的错误直接计入失败，仅重试被拒绝的条目
+        retry = []
+        for lines, item in zip(pending, resp['items']):
+            op, result = next(iter(item.items()))
+            status = result.get('status', 500)
+            # 删除不存在的文档视为成功
+            if status < 300 or (op == 'delete' and status == 404):
+                indexed += 1
+            elif status in RETRY_STATUSES:
+                retry.append(lines)
+            else:
+                errors.append({"_id": result.get('_id'), "status": status, "error": result.get('error')})
+        if not retry:
+            return indexed, len(errors), errors
+        pending = retry
+        last_error = {"status": 429, "error": f"{len(retry)} 条被拒绝"}
+
+    return indexed, len(pending) + len(errors), errors + [{"error": "重试次数耗尽", "last": last_error}]
+
+
+def bulk_index(actions, es=None, max_docs=None, max_bytes=None, workers=None,
+               max_retries=None, progress_every=10000):
+    """并发批量索引任意 (action, source) 序列，返回统计报告"""
+    es = es or get_es()
+    max_docs = max_docs or Config.INDEX_BULK_DOCS
+    max_bytes = max_bytes or Config.INDEX_BULK_BYTES
+    workers = workers or Config.INDEX_BULK_WORKERS
+
+    report = {"indexed": 0, "failed": 0, "errors": []}
+    lock = threading.Lock()
+    start = time.time()
+    next_progress = [progress_every]
+
+    def collect(future):
+        indexed, failed, errors = future.result()
+        with lock:
+            report["indexed"] += indexed
+            report["failed"] += failed
+            # 只保留前若干条错误，避免报告无限增长
+            report["errors"].extend(errors[:max(0, 20 - len(report["errors"]))])
+            done = report["indexed"] + report["failed"]
+            if progress_every and done >= next_progress[0]:
+                next_progress[0] += progress_every
+                print(f"已处理 {done} 条, {done / (time.time() - start):.0f} docs/s")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        for chunk in chunk_actions(actions, max_docs, max_bytes):
+            # 限制在途请求数量，保证内存占用有上界
+            if len(in_flight) >= workers * 2:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+            in_flight.add(executor.submit(send_chunk, es, chunk, max_retries))
+        for future in wait(in_flight).done:
+            collect(future)
+
+    elapsed = time.time() - start
+    report["elapsed"] = round(elapsed, 2)
+    report["docs_per_sec"] = round(report["indexed"] / elapsed, 1) if elapsed > 0 else 0.0
+    return report
+
+
+def recreate_index(es, index_name):
+    """删除并重建索引（index_name 是别名时抛出 ValueError，应写入新版本后切换别名，见 main）"""
+    if es.indices.exists_alias(name=index_name):
+        raise ValueError(f"{index_name} 是别名，请使用 --mode reindex 重建")
+    if es.indices.exists(index=index_name):
+        es.indices.delete(index=index_name)
+    es.indices.create(index=index_name, settings=NEWS_INDEX_SETTINGS, mappings=NEWS_INDEX_MAPPINGS)
+
+
+def bulk_index_news(index_name=None, es=None, sql="SELECT * FROM nankai_news", params=None, near_dup=None,
+                    **kwargs):
+    """将 nankai_news 表全部（或 sql 选出的）行批量索引到 Elasticsearch
+
+    可作为函数导入使用，kwargs 透传给 bulk_index；
+    near_dup 默认只在本次写入的行之间检测近似重复，只写入部分行时应传入 NearDupIndex(es, index_name)
+    """
+    index_name = index_name or Config.NEWS_INDEX
+    es = es or get_es()
+    near_dup = near_dup or NearDupIndex()
+    conn = get_stream_connection()
+    try:
+        actions = (row_to_action(row, index_name, near_dup) for row in iter_rows(conn, sql, params))
+        report = bulk_index(actions, es=es, **kwargs)
+    finally:
+        conn.close()
+    report["near_dup"] = near_dup.stats
+    return report
+
+
+def invalidate_search_cache():
+    """递增索引代数，使搜索服务中已缓存的结果失效"""
+    try:
+        print(f"✓ 搜索缓存代数已更新为 {bump_generation()}")
+    except Exception as e:
+        print(f"⚠ 更新搜索缓存代数失败: {e}")
+
+
+def print_report(report):
+    """打印索引报告"""
+    print(f"✓ 索引完成: 成功 {report['indexed']} 条, 失败 {report['failed']} 条, "
+          f"耗时 {report['elapsed']}s, {report['docs_per_sec']} docs/s")
+    if report.get('near_dup'):
+        print_near_dup_stats(report['near_dup'])
+    for error in report['errors']:
+        print(f"  ✗ {error}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="将 MySQL 中的新闻批量索引到 Elasticsearch")
+    parser.add_argument('--mode', choices=['full', 'reindex', 'rollback', 'incremental'], default='full',
+                        help="full: 删除重建（目标是别名时同 reindex）; reindex: 写入新版本索引后切换别名; rollback: 别名切回上一版本; "
+                             "incremental: 只同步上次之后变更的行")
+    parser.add_argument('--index', default=Config.NEWS_INDEX, help="目标索引名（reindex 模式下为别名）")
+    parser.add_argument('--workers', type=int, default=Config.INDEX_BULK_WORKERS, help="并发 bulk 线程数")
+    parser.add_argument('--batch-docs', type=int, default=Config.INDEX_BULK_DOCS, help="每个 bulk 请求的最大文档数")
+    parser.add_argument('--batch-bytes', type=int, default=Config.INDEX_BULK_BYTES, help="每个 bulk 请求的最大字节数")
+    parser.add_argument('--keep', action='store_true', help="full 模式下不删除已有索引，直接覆盖写入")
+    parser.add_argument('--reconcile', action='store_true', help="incremental 模式下同时清理已删除的文档")
+    parser.add_argument('--keep-versions', type=int, default=Config.INDEX_KEEP_VERSIONS,
+                        help="reindex 模式下保留的旧版本数量")
+    args = parser.parse_args()
+
+    es = get_es()
+    bulk_options = dict(max_docs=args.batch_docs, max_bytes=args.batch_bytes, workers=args.workers)
+
+    if args.mode == 'full' and not args.keep and es.indices.exists_alias(name=args.index):
+        # init_elasticsearch.py 把 news_index 建成别名，不能直接删除重建：写入新版本索引后切换别名
+        print(f"✓ {args.index} 是别名，全量重建将写入新版本索引后切换别名")
+        args.mode = 'reindex'
+
+    if args.mode == 'reindex':
+        from reindex import reindex_news
+        report = reindex_news(alias=args.index, es=es, keep=args.keep_versions, **bulk_options)
+        sys.exit(0 if report['swapped'] else 1)
+
+    if args.mode == 'incremental':
+        from incremental import sync_changes, reconcile_deletions, print_metrics
+        metrics = sync_changes(index_name=args.index, es=es, **bulk_options)
+        print_metrics(metrics)
+        if args.reconcile:
+            result = reconcile_deletions(index_name=args.index, es=es, **bulk_options)
+            print(f"✓ 删除对账: 删除 {result['deleted']} 条, 失败 {result['failed']} 条")
+        sys.exit(1 if metrics['failed'] else 0)
+
+    if args.mode == 'rollback':
+        from reindex import rollback
+        sys.exit(0 if rollback(alias=args.index, es=es) else 1)
+
+    if not args.keep:
+        recreate_index(es, args.index)
 
-    # 索引文档到 Elasticsearch（保持与原来相同的逻辑）
-    es.index(index=index_name, id=doc_id,document=doc)
+    report = bulk_index_news(index_name=args.index, es=es, **bulk_options)
+    print_report(report)
+    es.indices.refresh(index=args.index)
+    invalidate_search_cache()
+    sys.exit(1 if report['failed'] else 0)
 
-    content = doc.get("content", "")
 
-# 关闭连接
-cursor.close()
-conn.close()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Near-duplicate clustering for news articles
+近似重复检测：标题 + 正文的字符三元组计算 64 位 SimHash，按 8 段 8 位中任意两段的组合分桶（LSH），
+汉明距离不超过 MAX_DISTANCE 的文章归入同一簇，簇 id 写入 dup_cluster，搜索时可按它折叠
+"""
+
+import re
+import hashlib
+import threading
+from itertools import combinations
+
+SIMHASH_BITS = 64
+BANDS = 8
+BAND_BITS = SIMHASH_BITS // BANDS
+# 转载、加编者按、截断约 3% 内容时汉明距离多在 6 以内，不相关的文章在 16 以上
+MAX_DISTANCE = 6
+# 分成 8 段时，汉明距离 <= 6 的两篇文章至少有两段完全相同：
+# 以每两段的组合作为分桶键，任意一个键相同即为候选，不会漏掉，且候选数与文章总数基本无关
+BAND_PAIRS = list(combinations(range(BANDS), BANDS - MAX_DISTANCE))
+SHINGLE_SIZE = 3
+# 太短的文本特征太少，容易误判，不参与聚类
+MIN_SHINGLES = 20
+
+# 去掉空白和标点，只保留文字和数字
+NON_WORD = re.compile(r'[\W_]+', re.UNICODE)
+
+# 字节 -> 第 b 位的 0/1，simhash 中按列统计时使用
+_BIT_TABLES = [bytes((value >> bit) & 1 for value in range(256)) for bit in range(8)]
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """字符 n 元组集合（中文没有空格分词，按字符切分与分词器无关）"""
+    text = NON_WORD.sub('', (text or '').lower())
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def simhash(features):
+    """特征集合的 64 位 SimHash，特征过少时返回 None
+
+    每个特征取 md5 前 8 字节，按字节位置切出一列后用 translate + count 统计每一位为 1 的个数，
+    避免逐特征逐位的 Python 循环（约快 5 倍）
+    """
+    if len(features) < MIN_SHINGLES:
+        return None
+    digests = b''.join(hashlib.md5(f.encode('utf-8')).digest()[:8] for f in features)
+    half = len(features) / 2
+    value = 0
+    for position in range(8):
+        column = digests[position::8]
+        for bit, table in enumerate(_BIT_TABLES):
+            if column.translate(table).count(1) > half:
+                # 大端：第 0 个字节是最高位
+                value |= 1 << ((7 - position) * 8 + bit)
+    return value
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def bands(value):
+    """LSH 分桶键，如 "03:1a2b" 表示第 0、3 段的值；任意一个键相同的文章互为候选"""
+    mask = (1 << BAND_BITS) - 1
+    parts = [(value >> (i * BAND_BITS)) & mask for i in range(BANDS)]
+    return [''.join(f"{i}" for i in pair) + ':' + ''.join(f"{parts[i]:02x}" for i in pair) for pair in BAND_PAIRS]
+
+
+class NearDupIndex:
+    """为文章分配近似重复簇 id
+
+    先在本次已处理的文章中查找候选；传入 es 时再按分桶键在已有索引中查找（增量同步、爬虫直写），
+    找到汉明距离最近且不超过 max_distance 的文章时沿用它的簇 id，否则以自身 id 作为新簇
+    """
+
+    def __init__(self, es=None, index_name=None, max_distance=MAX_DISTANCE):
+        self.es = es
+        self.index_name = index_name
+        self.max_distance = max_distance
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.stats = {"docs": 0, "clustered": 0, "too_short": 0}
+
+    def _memory_candidates(self, keys):
+        """本次已处理文章中的候选（调用方持有 _lock）"""
+        return {entry for key in keys for entry in self._buckets.get(key, ())}
+
+    def _index_candidates(self, keys):
+        resp = self.es.search(index=self.index_name, query={"terms": {"simhash_bands": keys}},
+                              source=["simhash", "dup_cluster"], size=50)
+        return [
+            (int(hit['_source']['simhash'], 16), hit['_source']['dup_cluster'])
+            for hit in resp['hits']['hits']
+            if hit['_source'].get('simhash') and hit['_source'].get('dup_cluster')
+        ]
+
+    def _closest(self, value, candidates):
+        best = None
+        for candidate, cluster in candidates:
+            distance = hamming(value, candidate)
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, cluster)
+        return best
+
+    def assign(self, doc_id, text):
+        """返回需要写入 ES 文档的字段 {"simhash", "simhash_bands", "dup_cluster"}
+
+        查找候选和写入分桶在同一把锁内完成，并发处理的两篇近似重复文章不会各自新建一个簇；
+        在已有索引中查找时不持有锁，拿到结果后在锁内重新检查期间加入的文章再写入
+        """
+        value = simhash(shingles(text))
+        if value is None:
+            with self._lock:
+                self.stats["docs"] += 1
+                self.stats["too_short"] += 1
+            return {"dup_cluster": doc_id}
+        keys = bands(value)
+        with self._lock:
+            best = self._closest(value, self._memory_candidates(keys))
+            if best is not None or self.es is None:
+                return self._add(doc_id, value, keys, best)
+        indexed = self._index_candidates(keys)
+        with self._lock:
+            best = self._closest(value, list(self._memory_candidates(keys)) + indexed)
+            return self._add(doc_id, value, keys, best)
+
+    def _add(self, doc_id, value, keys, best):
+        """沿用最近候选的簇 id（没有时以自身 id 作为新簇）并写入分桶（调用方持有 _lock）"""
+        cluster = best[1] if best else doc_id
+        self.stats["docs"] += 1
+        if best:
+            self.stats["clustered"] += 1
+        for key in keys:
+            self._buckets.setdefault(key, []).append((value, cluster))
+        return {"simhash": f"{value:016x}", "simhash_bands": keys, "dup_cluster": cluster}
+
+
+def document_text(doc):
+    """参与近似重复检测的文本"""
+    return f"{doc.get('title') or ''}\n{doc.get('content') or ''}"
+
+
+def print_near_dup_stats(stats):
+    """打印近似重复统计"""
+    print(f"✓ 近似重复: {stats['docs']} 篇中 {stats['clustered']} 篇归入已有簇，"
+          f"{stats['too_short']} 篇文本过短未参与")
@@ -0,0 +1,152 @@
+"""
+Zero-downtime reindex for news_index
+零停机重建索引：写入带时间戳的新索引，完成后原子切换别名
+"""
+
+import os
+import sys
+import copy
+import time
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from config import Config
+from elasticsearch_config import NEWS_INDEX_SETTINGS, NEWS_INDEX_MAPPINGS
+from index import get_es, bulk_index_news, print_report, invalidate_search_cache
+from incremental import capture_watermark, load_state, save_state
+
+
+def version_name(alias):
+    """生成带时间戳的版本索引名，如 news_index_v20240101120000"""
+    return f"{alias}_v{time.strftime('%Y%m%d%H%M%S')}"
+
+
+def list_versions(es, alias):
+    """按时间从旧到新列出别名的所有版本索引"""
+    indices = es.indices.get(index=f"{alias}_v*", expand_wildcards="open,closed")
+    return sorted(indices.keys())
+
+
+def current_versions(es, alias):
+    """返回别名当前指向的索引"""
+    if not es.indices.exists_alias(name=alias):
+        return []
+    return list(es.indices.get_alias(name=alias).keys())
+
+
+def load_settings(settings):
+    """批量导入期间的索引设置：关闭 refresh、零副本"""
+    load = copy.deepcopy(settings)
+    load.setdefault("index", {})
+    load["index"]["number_of_replicas"] = 0
+    load["index"]["refresh_interval"] = "-1"
+    return load
+
+
+def restore_settings(es, index_name, settings):
+    """恢复 elasticsearch_config.py 中的副本数和 refresh 间隔"""
+    index_settings = settings.get("index", {})
+    es.indices.put_settings(index=index_name, settings={
+        "index": {
+            "number_of_replicas": index_settings.get("number_of_replicas", 1),
+            # None 表示恢复为 ES 默认值
+            "refresh_interval": index_settings.get("refresh_interval"),
+        }
+    })
+
+
+def swap_alias(es, alias, new_index):
+    """原子地把别名切换到新索引
+
+    如果存在与别名同名的旧式实体索引，在同一请求中删除它
+    """
+    actions = [{"remove": {"index": old, "alias": alias}}
+               for old in current_versions(es, alias) if old != new_index]
+    if not es.indices.exists_alias(name=alias) and es.indices.exists(index=alias):
+        actions.append({"remove_index": {"index": alias}})
+    actions.append({"add": {"index": new_index, "alias": alias}})
+    es.indices.update_aliases(actions=actions)
+
+
+def prune_versions(es, alias, keep):
+    """删除旧版本，仅保留最近 keep 个非当前版本用于回滚"""
+    active = set(current_versions(es, alias))
+    old = [name for name in list_versions(es, alias) if name not in active]
+    stale = old[:-keep] if keep > 0 else old
+    for name in stale:
+        es.indices.delete(index=name)
+        print(f"✓ 已删除旧版本 {name}")
+    return stale
+
+
+def prepare_for_swap(es, index_name, settings):
+    """恢复设置、合并段并等待分片分配；forcemerge 在大索引上耗时较长，使用单独的长超时"""
+    timeout = Config.INDEX_MAINTENANCE_TIMEOUT
+    restore_settings(es, index_name, settings)
+    es.indices.refresh(index=index_name)
+    es.options(request_timeout=timeout).indices.forcemerge(index=index_name, max_num_segments=1)
+    health = es.options(request_timeout=timeout + 30, ignore_status=408).cluster.health(
+        index=index_name, wait_for_status="yellow", timeout=f"{timeout}s"
+    )
+    if health.get("timed_out"):
+        raise TimeoutError(f"{index_name} 在 {timeout}s 内未达到 yellow 状态")
+
+
+def reindex_news(alias=None, es=None, keep=None, allow_failures=False,
+                 settings=NEWS_INDEX_SETTINGS, mappings=NEWS_INDEX_MAPPINGS, **kwargs):
+    """重建新闻索引并切换别名，返回索引报告
+
+    kwargs 透传给 bulk_index（workers、max_docs 等）
+    """
+    alias = alias or Config.NEWS_INDEX
+    es = es or get_es()
+    keep = Config.INDEX_KEEP_VERSIONS if keep is None else keep
+
+    # 导入开始前记录高水位，导入期间的变更由下一次增量同步补上
+    watermark = capture_watermark()
+    new_index = version_name(alias)
+    es.indices.create(index=new_index, settings=load_settings(settings), mappings=mappings)
+    print(f"✓ 已创建新版本索引 {new_index}")
+
+    try:
+        report = bulk_index_news(index_name=new_index, es=es, **kwargs)
+        report["index"] = new_index
+        print_report(report)
+        if report["failed"] and not allow_failures:
+            es.indices.delete(index=new_index)
+            print(f"✗ 存在失败文档，已放弃 {new_index}，别名 {alias} 保持不变")
+            report["swapped"] = False
+            return report
+        prepare_for_swap(es, new_index, settings)
+        swap_alias(es, alias, new_index)
+    except Exception:
+        # 切换前失败时删除新版本，不留下无别名指向的孤立索引（别名切换是原子的，失败时仍指向旧版本）
+        es.indices.delete(index=new_index, ignore_unavailable=True)
+        print(f"✗ 重建失败，已删除 {new_index}，别名 {alias} 保持不变")
+        raise
+
+    print(f"✓ 别名 {alias} 已切换到 {new_index}")
+    invalidate_search_cache()
+    prune_versions(es, alias, keep)
+    state = load_state()
+    state["watermark"] = watermark
+    save_state(state)
+    report["swapped"] = True
+    return report
+
+
+def rollback(alias=None, es=None):
+    """把别名切回上一个版本"""
+    alias = alias or Config.NEWS_INDEX
+    es = es or get_es()
+    active = set(current_versions(es, alias))
+    older = [name for name in list_versions(es, alias) if name not in active and name < min(active, default="~")]
+    if not older:
+        print("✗ 没有可回滚的旧版本")
+        return None
+    target = older[-1]
+    swap_alias(es, alias, target)
+    print(f"✓ 别名 {alias} 已回滚到 {target}")
+    invalidate_search_cache()
+    return target
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Precomputed related articles for /api/recommend
+离线预计算相关文章：对 news_index 中每篇文章执行 more_like_this（按批通过 _msearch 发送），
+把前 k 篇写入 news_related 索引，推荐接口按文章 id 直接读取，新文章再实时查询
+"""
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# Add project root and Code/server to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'server'))
+
+from elasticsearch import helpers
+from config import Config
+from index import get_es, bulk_index, invalidate_search_cache
+from search_query import recommend_msearch_body, format_recommendations
+
+# related 只存储不索引，按 _id 读取；built_at 用于清理上一次构建留下的条目
+RELATED_MAPPINGS = {
+    "dynamic": False,
+    "properties": {
+        "built_at": {"type": "date", "format": "epoch_second"},
+    },
+}
+
+
+def ensure_related_index(es, index_name):
+    if not es.indices.exists(index=index_name):
+        es.indices.create(index=index_name, mappings=RELATED_MAPPINGS,
+                          settings={"index": {"number_of_replicas": 0}})
+
+
+def related_batches(es, news_index, doc_ids, top_k, batch_size, workers, tracker):
+    """按批执行 _msearch，逐篇产出 (doc_id, 相关文章)；查询失败的文章不产出，推荐时走实时查询"""
+    batches = [doc_ids[i:i + batch_size] for i in range(0, len(doc_ids), batch_size)]
+
+    def run(batch):
+        start = time.perf_counter()
+        resp = es.msearch(searches=recommend_msearch_body(news_index, batch, top_k))
+        return batch, resp['responses'], time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch, responses, seconds in executor.map(run, batches):
+            tracker["msearch_sec"] += seconds
+            for doc_id, response in zip(batch, responses):
+                if 'error' in response:
+                    tracker["failed"] += 1
+                    continue
+                yield doc_id, format_recommendations(response)
+
+
+def build_related(news_index=None, related_index=None, es=None, top_k=None, batch_size=None, workers=None):
+    """为 news_index 的全部文章预计算相关文章，返回统计"""
+    news_index = news_index or Config.NEWS_INDEX
+    related_index = related_index or Config.RELATED_INDEX
+    es = es or get_es()
+    top_k = top_k or Config.RELATED_TOP_K
+    batch_size = batch_size or Config.RELATED_BATCH_SIZE
+    workers = workers or Config.RELATED_WORKERS
+
+    ensure_related_index(es, related_index)
+    built_at = int(time.time())
+    start = time.time()
+    doc_ids = [hit["_id"] for hit in
+               helpers.scan(es, index=news_index, query={"query": {"match_all": {}}}, _source=False, size=5000)]
+
+    tracker = {"failed": 0, "empty": 0, "msearch_sec": 0.0}
+
+    def actions():
+        for doc_id, related in related_batches(es, news_index, doc_ids, top_k, batch_size, workers, tracker):
+            if not related:
+                tracker["empty"] += 1
+            yield ({"index": {"_index": related_index, "_id": doc_id}},
+                   {"related": related, "built_at": built_at})
+
+    report = bulk_index(actions(), es=es, progress_every=0)
+    es.indices.refresh(index=related_index)
+
+    # 删除上一次构建留下、本次没有覆盖的条目（文章已删除）；有失败时保留，避免这些文章退回实时查询
+    stale = 0
+    if not tracker["failed"] and not report["failed"]:
+        resp = es.delete_by_query(index=related_index, query={"range": {"built_at": {"lt": built_at}}},
+                                  refresh=True, conflicts="proceed")
+        stale = resp.get("deleted", 0)
+    # 递增缓存代数，服务端的推荐缓存随之失效
+    invalidate_search_cache()
+
+    elapsed = time.time() - start
+    return {
+        "articles": len(doc_ids),
+        "stored": report["indexed"],
+        "failed": tracker["failed"] + report["failed"],
+        "empty": tracker["empty"],
+        "stale_deleted": stale,
+        "elapsed": round(elapsed, 2),
+        "articles_per_sec": round(len(doc_ids) / elapsed, 1) if elapsed else 0.0,
+        "avg_mlt_ms": round(tracker["msearch_sec"] / len(doc_ids) * 1000, 2) if doc_ids else 0.0,
+        "errors": report["errors"],
+    }
+
+
+def print_related_report(report):
+    """打印预计算报告"""
+    print(f"✓ 相关文章: 文章 {report['articles']} 篇, 写入 {report['stored']}, 失败 {report['failed']}, "
+          f"无相关文章 {report['empty']}, 清理旧条目 {report['stale_deleted']}")
+    print(f"✓ 耗时 {report['elapsed']}s, {report['articles_per_sec']} 篇/s, "
+          f"单篇 more_like_this 平均 {report['avg_mlt_ms']} ms")
+    for error in report['errors']:
+        print(f"  ✗ {error}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="预计算每篇新闻的相关文章")
+    parser.add_argument('--index', default=Config.NEWS_INDEX, help="新闻索引名（或别名）")
+    parser.add_argument('--related-index', default=Config.RELATED_INDEX, help="相关文章索引名")
+    parser.add_argument('--top-k', type=int, default=Config.RELATED_TOP_K, help="每篇保存的相关文章数")
+    parser.add_argument('--batch-size', type=int, default=Config.RELATED_BATCH_SIZE, help="每个 _msearch 的文章数")
+    parser.add_argument('--workers', type=int, default=Config.RELATED_WORKERS, help="并发 _msearch 数")
+    args = parser.parse_args()
+
+    report = build_related(args.index, args.related_index, top_k=args.top_k,
+                           batch_size=args.batch_size, workers=args.workers)
+    print_related_report(report)
+    sys.exit(1 if report['failed'] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,34 @@
 import os
-import webbrowser
+import sys
+import time
+import threading
 import mysql.connector
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
 from datetime import datetime
 from functools import wraps
-from document_search import search_documents
 import logging
 from mysql.connector import pooling
-from elasticsearch import Elasticsearch
+from elasticsearch import Elasticsearch, NotFoundError
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+# Code/snapshot：快照存储
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'snapshot'))
+
+from config import Config
+from document_search import search_documents
+from search_cache import SearchCache, LRUCache, normalize_query
+from history_store import HistoryWriter, RecentHistory
+from search_query import (
+    search_mode, search_request, wildcard_fragments, format_search_response, recommend_request,
+    format_recommendations,
+    cursor_binding, encode_cursor, decode_cursor, page_params
+)
+from compression import compress_body
+from suggest import PopularQueries, suggest_request, suggest_size, format_suggestions, merge_suggestions
+from msearch import MultiSearch
+from snapshot_store import SnapshotStore, url_key, mimetype
 
 app = Flask(__name__)
 CORS(app)
@@ -35,6 +55,19 @@ es = Elasticsearch(
     meta_header=False,
 )
 
+# 搜索结果缓存
+search_cache = SearchCache.from_config()
+# 输入联想的前缀缓存，始终使用进程内 LRU 以保证按键延迟
+suggest_cache = SearchCache(
+    LRUCache(Config.SUGGEST_CACHE_SIZE, Config.SUGGEST_CACHE_TTL),
+    generation_check=Config.CACHE_GENERATION_CHECK
+)
+# 推荐结果缓存：预计算的相关文章或新文章的实时查询结果，重新预计算后随缓存代数失效
+related_cache = SearchCache(
+    LRUCache(Config.RELATED_CACHE_SIZE, Config.RELATED_CACHE_TTL),
+    generation_check=Config.CACHE_GENERATION_CHECK
+)
+
 # 创建连接池
 try:
     connection_pool = pooling.MySQLConnectionPool(**db_config)
@@ -47,6 +80,24 @@ def get_db_connection():
     return connection_pool.get_connection()
 
 
+# 搜索历史异步写入，个性化词从内存中的最近历史读取
+history_writer = HistoryWriter(
+    get_db_connection,
+    batch_size=Config.HISTORY_BATCH_SIZE,
+    flush_interval=Config.HISTORY_FLUSH_INTERVAL,
+    max_queue=Config.HISTORY_QUEUE_SIZE,
+)
+recent_history = RecentHistory(
+    get_db_connection,
+    max_users=Config.HISTORY_CACHE_USERS,
+    max_per_user=Config.HISTORY_CACHE_PER_USER,
+)
+popular_queries = PopularQueries()
+threading.Thread(target=popular_queries.load, args=(get_db_connection,), daemon=True).start()
+# 网页快照（snapshot.py 生成，按 URL 哈希存储）
+snapshot_store = SnapshotStore()
+
+
 # 密码验证函数
 def verify_password(plain_password, hashed_password):
     return plain_password.encode('utf-8') == hashed_password.encode('utf-8')
@@ -116,37 +167,41 @@ def log_search(func):
     return wrapper
 
 
-# 记录搜索历史
+# 记录搜索历史（不阻塞请求，由后台线程批量写入 MySQL）
 def store_history(history_data):
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        user_id = history_data["user_id"]
-        words = history_data["words"]
-        # 检查历史是否存在
-        cursor.execute(
-            "SELECT user_id FROM history WHERE user_id=%s AND words=%s",
-            (user_id, words)
-        )
-        conflicts = cursor.fetchone()
-        if not conflicts:
-            cursor.execute(
-                "INSERT INTO history (user_id,words) VALUES (%s,%s)",
-                (user_id, words)
-            )
-        conn.commit()
-        return jsonify({
-            "success": True,
-        })
-
-    except Exception as e:
-        print(f"数据库错误: {e}")
-        return jsonify({"success": False, "message": "服务器错误"}), 500
-
-    finally:
-        if 'conn' in locals() and conn.is_connected():
-            cursor.close()
-            conn.close()
+    user_id = history_data["user_id"]
+    words = history_data["words"]
+    if not words:
+        return
+    recent_history.add(user_id, words)
+    history_writer.record(user_id, words)
+    popular_queries.record(words)
+
+
+def cursor_search(mode, query, history_query, size, sort, cursor=None):
+    """基于 point-in-time + search_after 的游标分页，深翻页代价与页码无关"""
+    binding = cursor_binding(mode, query, sort)
+    if cursor:
+        # 后续页沿用第一页的个性化词
+        pit_id, search_after, history_query = decode_cursor(cursor, binding)
+    else:
+        pit_id = (es.open_point_in_time(index=ES_INDEX, keep_alive=Config.PIT_KEEP_ALIVE))['id']
+        search_after = None
+
+    result = es.search(**search_request(
+        mode, query, history_query, size=size, sort=sort,
+        pit={"id": pit_id, "keep_alive": Config.PIT_KEEP_ALIVE}, search_after=search_after
+    ))
+    pit_id = result.get('pit_id', pit_id)
+    response = format_search_response(result)
+    hits = result['hits']['hits']
+    if len(hits) == size:
+        response["next_cursor"] = encode_cursor(pit_id, hits[-1]['sort'], binding, history_query)
+    else:
+        # 已到最后一页，及时释放 PIT
+        es.close_point_in_time(id=pit_id)
+        response["next_cursor"] = None
+    return response
 
 
 @app.route('/api/search/<user_id>', methods=['POST'])
@@ -163,183 +218,259 @@ def search(user_id):
         }
         store_history(history_data)
 
-        search_body = {
-            "should": [],
-            "filter": []
-        }
+        mode = search_mode(data, query)
         # 文档查询
-        if data.get("file_type"):
+        if mode == "doc":
+            cache_key = search_cache.make_key("doc", query)
+            cached = search_cache.get(cache_key)
+            if cached is not None:
+                return jsonify(cached)
             document_result = search_documents(query)
-            return jsonify({
+            response = {
                 "results": document_result,
                 "type": "doc"
-            })
-        # 通配查询
-        elif data.get('wildcard_type'):
-            search_body = {
-                "should": [
-                    {
-                        "wildcard": {
-                            "title": {
-                                "value": query
-                            }
-                        }
-                    },
-                    {
-                        "wildcard": {
-                            "keywords": {
-                                "value": query
-                            }
-                        }
-                    },
-                    {
-                        "wildcard": {
-                            "content": {
-                                "value": query
-                            }
-                        }
-                    }
-                ]
             }
-        # 短语查询
-        elif data.get("term_type"):
-            search_body["should"].append({
-                "multi_match": {
-                    "query": query,  # 查询的短语
-                    "fields": ["title", "keywords", "content"],  # 需要匹配的字段
-                    "type": "phrase",  # 短语匹配类型
-                    "analyzer": "ik_max_word"  # 使用 ik_max_word 分词器进行短语查询
-                }
-            })
-        # 普通查询
-        elif query:
-            search_body["should"].append({
-                "multi_match": {
-                    "query": query,
-                    "fields": ["title^3", "keywords^3", "content", "url"],
-                    "type": "best_fields",
-                    "analyzer": "ik_smart",
-                }
-            })
-            # 个性化查询
-            history_query=get_history(user_id).get_json()["history"][0]
-            if history_query:
-                search_body["should"].append({
-                    "multi_match": {
-                        "query": history_query,
-                        "fields": ["title^3", "keywords^3", "content", "url"],
-                        "type": "best_fields",
-                        "analyzer": "ik_smart",
-                        "boost": 0.1
-                    }
-                })
-
-        print(search_body)
+            # search_documents 出错时返回空列表，空结果不缓存
+            if document_result:
+                search_cache.set(cache_key, response)
+            return jsonify(response)
+
+        # 个性化查询词
+        history_query = ''
+        if mode == "normal":
+            history = recent_history.get(user_id)
+            history_query = history[0] if history else ''
+
+        sort = data.get('sort')
+        # 合并近似重复的新闻（按 dup_cluster 折叠）
+        collapse = bool(data.get('collapse_duplicates'))
+        try:
+            page, size = page_params(data, Config.DEFAULT_PAGE_SIZE, Config.MAX_PAGE_SIZE, Config.MAX_RESULT_WINDOW)
+            if mode == "wildcard":
+                wildcard_fragments(query)  # 片段过短或没有片段时返回 400
+            # 游标分页：请求带 cursor（后续页）或 paginate=cursor（第一页）
+            if data.get('cursor') or data.get('paginate') == 'cursor':
+                if collapse:
+                    raise ValueError("合并相似新闻不支持游标分页")
+                return jsonify(cursor_search(mode, query, history_query, size, sort, data.get('cursor')))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except NotFoundError:
+            return jsonify({"error": "游标已过期，请重新搜索"}), 410
+
+        # 个性化词会影响结果，需要作为缓存键的一部分
+        cache_key = search_cache.make_key(
+            mode, query, history=history_query or None,
+            page=page, size=size, sort=sort, collapse=collapse or None
+        )
+        cached = search_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(cached)
+
         # 执行搜索
         result = es.search(
             index=ES_INDEX,
-            query={"bool": search_body},
-            highlight={
-                "fields": {
-                    "content": {}
-                },
-                "pre_tags": ["<highlight>"],
-                "post_tags": ["</highlight>"]
-            },
-            from_=(int(data.get('page', 1)) - 1) * int(data.get('size', 10)),
-            size=int(data.get('size', 10)),
-            sort=[{"timestamp": "desc"}] if data.get('sort') == 'date' else None
+            **search_request(mode, query, history_query, page, size, sort, collapse=collapse)
         )
+        response = format_search_response(result)
+        search_cache.set(cache_key, response)
+        return jsonify(response)
 
-        # 处理结果（保持不变）
-        hits = []
-        for hit in result['hits']['hits']:
-            hits.append({
-                "id": hit['_id'],
-                "title": hit['_source'].get('title', ''),
-                "url": hit['_source'].get('url', ''),
-                "snippet": ''.join(hit.get('highlight', {}).get('content', [''])),
-                "timestamp": hit['_source'].get('timestamp', ''),
-                "content": hit['_source'].get('content', '')
-            })
+    except Exception as e:
+        app.logger.error(f"Search error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
 
 
-        return jsonify({
-            "total": result['hits']['total']['value'],
-            "results": hits,
-            "type": "normal"
-        })
+@app.route('/api/suggest', methods=['GET'])
+def suggest():
+    """输入联想：用户历史 + 标题前缀补全 + 热门查询"""
+    start = time.perf_counter()
+    prefix = normalize_query(request.args.get('prefix', ''))
+    user_id = request.args.get('user_id')
+    try:
+        size = suggest_size(request.args.get('size'), Config.SUGGEST_SIZE, Config.MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not prefix:
+        return jsonify({"suggestions": [], "took_ms": 0})
+
+    cache_key = suggest_cache.make_key("suggest", prefix, size=size)
+    titles = suggest_cache.get(cache_key)
+    if titles is None:
+        try:
+            result = es.options(request_timeout=Config.SUGGEST_TIMEOUT, max_retries=0).search(
+                index=ES_INDEX, **suggest_request(prefix, size)
+            )
+            titles = format_suggestions(result)
+            suggest_cache.set(cache_key, titles)
+        except Exception as e:
+            # 超时或出错时只返回历史和热门查询
+            app.logger.warning(f"联想查询失败: {str(e)}")
+            titles = []
+
+    # 只读内存中的历史，按键请求不访问 MySQL
+    history = (recent_history.cached(user_id) or []) if user_id else []
+    suggestions = merge_suggestions(prefix, history, titles, popular_queries.matching(prefix, size), size)
+    return jsonify({
+        "suggestions": suggestions,
+        "took_ms": round((time.perf_counter() - start) * 1000, 2)
+    })
+
+
+@app.route('/api/msearch', methods=['POST'])
+def msearch():
+    """一次请求执行多个 search / recommend / suggest，缓存未命中的查询合并为一个 ES _msearch，结果按请求顺序返回
+
+    {"user_id": "...", "requests": [{"type": "search", "query": ...}, {"type": "recommend", "from_result": 0}]}
+    """
+    start = time.perf_counter()
+    data = request.json or {}
+    user_id = data.get('user_id')
+    items = data.get('requests')
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "requests 不能为空"}), 400
+    if len(items) > Config.MSEARCH_MAX_REQUESTS:
+        return jsonify({"error": f"每次最多 {Config.MSEARCH_MAX_REQUESTS} 个请求"}), 400
+
+    batch = MultiSearch(ES_INDEX, Config.DOCUMENTS_INDEX, Config.RELATED_INDEX, search_cache, suggest_cache, related_cache,
+                        popular_queries)
+    for item in items:
+        item = item if isinstance(item, dict) else {}
+        kind = item.get('type')
+        if kind == 'search':
+            query = item.get('query', '')
+            if user_id and isinstance(query, str):
+                store_history({"user_id": user_id, "words": query})
+            mode = search_mode(item, query)
+            history_query = ''
+            if mode == "normal" and user_id:
+                history = recent_history.get(user_id)
+                history_query = history[0] if history else ''
+            batch.search(item, mode, history_query)
+        elif kind == 'recommend':
+            if 'from_result' in item:
+                batch.recommend_from(item['from_result'])
+            else:
+                batch.recommend(item.get('current_id'))
+        elif kind == 'suggest':
+            history = (recent_history.cached(user_id) or []) if user_id else []
+            batch.suggest(item.get('prefix', ''), item.get('size'), history)
+        else:
+            batch.error(f"不支持的请求类型: {kind}")
 
+    try:
+        # 新文章的推荐和依赖搜索结果的推荐需要再查询一轮
+        while batch.pending():
+            batch.resolve((es.msearch(searches=batch.take()))['responses'])
     except Exception as e:
-        app.logger.error(f"Search error: {str(e)}")
+        app.logger.error(f"批量查询失败: {str(e)}")
+        batch.fail(e)
+
+    return jsonify({
+        "responses": batch.results,
+        "es_requests": batch.round_trips,
+        "took_ms": round((time.perf_counter() - start) * 1000, 2)
+    })
+
+
+@app.route('/api/doc/<doc_id>', methods=['GET'])
+def get_document(doc_id):
+    """获取单篇新闻的完整内容（搜索结果只返回摘要）"""
+    try:
+        doc = es.get(index=ES_INDEX, id=doc_id)
+        return jsonify(dict(doc['_source'], id=doc['_id']))
+    except NotFoundError:
+        return jsonify({"error": "文档不存在"}), 404
+    except Exception as e:
+        app.logger.error(f"获取文档失败: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
+@app.after_request
+def compress_response(response):
+    """按 Accept-Encoding 压缩较大的 JSON 响应"""
+    if (not Config.RESPONSE_COMPRESSION or response.mimetype != 'application/json'
+            or 'Content-Encoding' in response.headers):
+        return response
+    encoded = compress_body(
+        response.get_data(), request.headers.get('Accept-Encoding', ''),
+        Config.COMPRESS_MIN_SIZE, Config.COMPRESS_LEVEL
+    )
+    if encoded:
+        encoding, body = encoded
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """搜索缓存命中/未命中/淘汰计数，用于评估缓存容量"""
+    return jsonify({"search": search_cache.stats(), "suggest": suggest_cache.stats(),
+                    "recommend": related_cache.stats()})
+
+
 @app.route('/api/snapshot', methods=['POST'])
 def get_snapshot():
+    """按新闻 URL 查找快照，返回图片和缩略图地址"""
     data = request.json
-    image_name = data.get('img_name', '')
-    print(image_name)
-    try:
-        # 指向 snapshot 文件夹中的 resized_snapshot_img
-        image_path = '../snapshot/snapshot_img/' + image_name + '.png'
+    url = data.get('url', '')
+    key = url_key(url)
+    if not url or snapshot_store.find(key) is None:
+        return jsonify({"success": False, "error": "快照不存在"}), 404
+    return jsonify(dict(snapshot_store.links(key), success=True))
 
-        # 打开图片
-        webbrowser.open('file://' + os.path.abspath(image_path))
-        print("完整路径:", os.path.abspath(image_path))
-        return jsonify({"success": True, })
 
-    except Exception as e:
-        return jsonify({"success": False, 'error': str(e)}), 500
+@app.route('/api/snapshot/<key>', methods=['GET'])
+def serve_snapshot(key):
+    """输出快照图片（?thumb=1 为缩略图），支持 ETag 条件请求和 Range"""
+    path = snapshot_store.find(key, thumb=request.args.get('thumb') == '1')
+    if path is None:
+        return jsonify({"error": "快照不存在"}), 404
+    return send_file(path, mimetype=mimetype(path), conditional=True, max_age=Config.SNAPSHOT_CACHE_MAX_AGE)
 
 
 @app.route('/api/history/<user_id>', methods=['GET'])
 def get_history(user_id):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute(
-            "SELECT words FROM history WHERE user_id = %s",
-            (user_id,)
-        )
-        history = cursor.fetchall()
-        search_history = []
-        for record in history:
-            if record['words']:
-                search_history.extend(record['words'].split(','))
-        return jsonify({"history": search_history})
+        return jsonify({"history": recent_history.get(user_id)})
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        if 'conn' in locals() and conn.is_connected():
-            cursor.close()
-            conn.close()
+
+
+@app.route('/api/history-writer/stats', methods=['GET'])
+def get_history_stats():
+    """后台历史写入队列的统计信息"""
+    return jsonify(history_writer.stats())
 
 
 # 在搜索接口后新增推荐功能
+def load_related(doc_id):
+    """预计算的相关文章（Code/index/related.py），新文章尚未预计算时实时执行 more_like_this"""
+    try:
+        resp = es.get(index=Config.RELATED_INDEX, id=doc_id)
+        return resp['_source']['related']
+    except NotFoundError:
+        result = es.search(index=ES_INDEX, **recommend_request(ES_INDEX, doc_id))
+        return format_recommendations(result)
+
+
 @app.route('/api/recommend', methods=['POST'])
 def get_recommendations():
     try:
         data = request.json
         current_doc_id = data.get('current_id')
         # 策略：基于搜索id的相关推荐
-        if current_doc_id:
-            suggest_result = es.search(
-                index=ES_INDEX,
-                query={
-                    "more_like_this": {
-                        "fields": ["title", "content", "keywords"],
-                        "like": [{"_index": ES_INDEX, "_id": current_doc_id}],
-                        "min_term_freq": 1,
-                        "max_query_terms": 12,
-                        "min_doc_freq": 1
-                    }
-                },
-                size=5
-            )
-            return jsonify([hit['_source'] for hit in suggest_result['hits']['hits']])
-        return jsonify([])
+        if not current_doc_id:
+            return jsonify([])
+        cache_key = related_cache.make_key("recommend", str(current_doc_id))
+        related = related_cache.get(cache_key)
+        if related is None:
+            related = load_related(current_doc_id)
+            related_cache.set(cache_key, related)
+        return jsonify(related)
 
     except Exception as e:
         app.logger.error(f"推荐失败: {str(e)}")
@@ -0,0 +1,513 @@
+"""
+ASGI search server
+异步搜索服务：与 app.py 提供相同接口，使用 AsyncElasticsearch 和 aiomysql 连接池，
+由 uvicorn 以多进程方式运行
+"""
+
+import os
+import sys
+import time
+import logging
+import threading
+from datetime import datetime
+from functools import wraps
+
+import aiomysql
+import uvicorn
+from quart import Quart, request, jsonify, send_file
+from quart_cors import cors
+from mysql.connector import pooling
+from elasticsearch import AsyncElasticsearch, NotFoundError
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+# Code/snapshot：快照存储
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'snapshot'))
+
+from config import Config
+from document_search import document_search_request, format_document_hits
+from search_cache import SearchCache, LRUCache, normalize_query
+from history_store import HistoryWriter, RecentHistory, HISTORY_SQL, history_from_records
+from search_query import (
+    search_mode, search_request, wildcard_fragments, format_search_response, recommend_request,
+    format_recommendations,
+    cursor_binding, encode_cursor, decode_cursor, page_params
+)
+from compression import compress_body
+from suggest import PopularQueries, suggest_request, suggest_size, format_suggestions, merge_suggestions
+from msearch import MultiSearch
+from snapshot_store import SnapshotStore, url_key, mimetype
+
+app = cors(Quart(__name__))
+
+ES_INDEX = Config.NEWS_INDEX
+DOCUMENTS_INDEX = Config.DOCUMENTS_INDEX
+
+# 连接在 before_serving 中创建，需要运行中的事件循环
+es = None
+db_pool = None
+
+search_cache = SearchCache.from_config()
+suggest_cache = SearchCache(
+    LRUCache(Config.SUGGEST_CACHE_SIZE, Config.SUGGEST_CACHE_TTL),
+    generation_check=Config.CACHE_GENERATION_CHECK
+)
+# 推荐结果缓存：预计算的相关文章或新文章的实时查询结果，重新预计算后随缓存代数失效
+related_cache = SearchCache(
+    LRUCache(Config.RELATED_CACHE_SIZE, Config.RELATED_CACHE_TTL),
+    generation_check=Config.CACHE_GENERATION_CHECK
+)
+
+# 历史写入在后台线程中执行，使用同步连接池，不占用事件循环
+history_pool = None
+
+
+def get_history_connection():
+    global history_pool
+    if history_pool is None:
+        history_pool = pooling.MySQLConnectionPool(**dict(Config.MYSQL_CONFIG, pool_name='history_pool', pool_size=2))
+    return history_pool.get_connection()
+
+
+history_writer = HistoryWriter(
+    get_history_connection,
+    batch_size=Config.HISTORY_BATCH_SIZE,
+    flush_interval=Config.HISTORY_FLUSH_INTERVAL,
+    max_queue=Config.HISTORY_QUEUE_SIZE,
+)
+# 不传同步连接：历史通过 user_history() 从异步连接池加载，不在事件循环中同步查询 MySQL
+recent_history = RecentHistory(
+    None,
+    max_users=Config.HISTORY_CACHE_USERS,
+    max_per_user=Config.HISTORY_CACHE_PER_USER,
+)
+popular_queries = PopularQueries()
+# 网页快照（snapshot.py 生成，按 URL 哈希存储）
+snapshot_store = SnapshotStore()
+
+
+@app.before_serving
+async def startup():
+    global es, db_pool
+    es = AsyncElasticsearch(**Config.get_elasticsearch_config())
+    db_pool = await aiomysql.create_pool(
+        host=Config.MYSQL_CONFIG['host'],
+        port=Config.MYSQL_CONFIG['port'],
+        user=Config.MYSQL_CONFIG['user'],
+        password=Config.MYSQL_CONFIG['password'],
+        db=Config.MYSQL_CONFIG['database'],
+        minsize=1,
+        maxsize=Config.ASYNC_MYSQL_POOL_SIZE,
+        autocommit=True,
+        charset='utf8mb4',
+    )
+    threading.Thread(target=popular_queries.load, args=(get_history_connection,), daemon=True).start()
+
+
+@app.after_serving
+async def shutdown():
+    await es.close()
+    db_pool.close()
+    await db_pool.wait_closed()
+    history_writer.close()
+
+
+async def fetch_one(sql, params):
+    async with db_pool.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(sql, params)
+            return await cursor.fetchone()
+
+
+async def fetch_all(sql, params):
+    async with db_pool.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(sql, params)
+            return await cursor.fetchall()
+
+
+async def user_history(user_id):
+    """读取用户最近历史，首次访问时通过异步连接池加载"""
+    history = recent_history.cached(user_id)
+    if history is not None:
+        return history
+    try:
+        records = await fetch_all(HISTORY_SQL, (user_id, recent_history.max_per_user))
+    except Exception as e:
+        logging.error(f"加载搜索历史失败 {user_id}: {e}")
+        records = []
+    return list(recent_history.seed(user_id, history_from_records(records)))
+
+
+# 密码验证函数
+def verify_password(plain_password, hashed_password):
+    return plain_password.encode('utf-8') == hashed_password.encode('utf-8')
+
+
+@app.route('/login', methods=['POST'])
+async def login():
+    data = await request.get_json()
+    user_id = data.get('username')
+    password = data.get('password')
+
+    if not user_id or not password:
+        return jsonify({"success": False, "message": "用户名和密码不能为空"}), 400
+
+    try:
+        user = await fetch_one("SELECT user_id, password FROM user WHERE user_id = %s", (user_id,))
+
+        if not user:
+            return jsonify({"success": False, "message": "用户不存在"}), 401
+
+        if not verify_password(password, user['password']):
+            return jsonify({"success": False, "message": "密码错误"}), 401
+
+        return jsonify({
+            "success": True,
+            "user": {
+                "user_id": user['user_id'],
+            }
+        })
+
+    except Exception as e:
+        print(f"数据库错误: {e}")
+        return jsonify({"success": False, "message": "服务器错误"}), 500
+
+
+# 日志配置
+logging.basicConfig(filename='search.log', level=logging.INFO)
+
+
+def log_search(func):
+    """记录搜索日志的装饰器"""
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        result = await func(*args, **kwargs)
+        data = await request.get_json()
+        log_entry = {
+            "timestamp": datetime.now().isoformat(),
+            "query": data.get('query'),
+            "params": data,
+            "client_ip": request.remote_addr
+        }
+        logging.info(str(log_entry))
+        return result
+
+    return wrapper
+
+
+async def store_history(user_id, words):
+    """记录搜索历史（不阻塞请求，由后台线程批量写入 MySQL）"""
+    if not words:
+        return
+    await user_history(user_id)
+    recent_history.add(user_id, words)
+    history_writer.record(user_id, words)
+    popular_queries.record(words)
+
+
+async def cursor_search(mode, query, history_query, size, sort, cursor=None):
+    """基于 point-in-time + search_after 的游标分页，深翻页代价与页码无关"""
+    binding = cursor_binding(mode, query, sort)
+    if cursor:
+        # 后续页沿用第一页的个性化词
+        pit_id, search_after, history_query = decode_cursor(cursor, binding)
+    else:
+        pit_id = (await es.open_point_in_time(index=ES_INDEX, keep_alive=Config.PIT_KEEP_ALIVE))['id']
+        search_after = None
+
+    result = await es.search(**search_request(
+        mode, query, history_query, size=size, sort=sort,
+        pit={"id": pit_id, "keep_alive": Config.PIT_KEEP_ALIVE}, search_after=search_after
+    ))
+    pit_id = result.get('pit_id', pit_id)
+    response = format_search_response(result)
+    hits = result['hits']['hits']
+    if len(hits) == size:
+        response["next_cursor"] = encode_cursor(pit_id, hits[-1]['sort'], binding, history_query)
+    else:
+        # 已到最后一页，及时释放 PIT
+        await es.close_point_in_time(id=pit_id)
+        response["next_cursor"] = None
+    return response
+
+
+@app.route('/api/search/<user_id>', methods=['POST'])
+@log_search
+async def search(user_id):
+    try:
+        data = await request.get_json()
+        query = data.get('query', '')
+
+        # 记录历史
+        await store_history(user_id, query)
+
+        mode = search_mode(data, query)
+        # 文档查询
+        if mode == "doc":
+            cache_key = search_cache.make_key("doc", query)
+            cached = search_cache.get(cache_key)
+            if cached is not None:
+                return jsonify(cached)
+            try:
+                result = await es.search(index=DOCUMENTS_INDEX, **document_search_request(query))
+                document_result = format_document_hits(result)
+            except Exception as e:
+                print(f"搜索失败: {e}")
+                document_result = []
+            response = {
+                "results": document_result,
+                "type": "doc"
+            }
+            if document_result:
+                search_cache.set(cache_key, response)
+            return jsonify(response)
+
+        # 个性化查询词
+        history_query = ''
+        if mode == "normal":
+            history = await user_history(user_id)
+            history_query = history[0] if history else ''
+
+        sort = data.get('sort')
+        # 合并近似重复的新闻（按 dup_cluster 折叠）
+        collapse = bool(data.get('collapse_duplicates'))
+        try:
+            page, size = page_params(data, Config.DEFAULT_PAGE_SIZE, Config.MAX_PAGE_SIZE, Config.MAX_RESULT_WINDOW)
+            if mode == "wildcard":
+                wildcard_fragments(query)  # 片段过短或没有片段时返回 400
+            # 游标分页：请求带 cursor（后续页）或 paginate=cursor（第一页）
+            if data.get('cursor') or data.get('paginate') == 'cursor':
+                if collapse:
+                    raise ValueError("合并相似新闻不支持游标分页")
+                return jsonify(await cursor_search(mode, query, history_query, size, sort, data.get('cursor')))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except NotFoundError:
+            return jsonify({"error": "游标已过期，请重新搜索"}), 410
+
+        cache_key = search_cache.make_key(
+            mode, query, history=history_query or None,
+            page=page, size=size, sort=sort, collapse=collapse or None
+        )
+        cached = search_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(cached)
+
+        result = await es.search(
+            index=ES_INDEX,
+            **search_request(mode, query, history_query, page, size, sort, collapse=collapse)
+        )
+        response = format_search_response(result)
+        search_cache.set(cache_key, response)
+        return jsonify(response)
+
+    except Exception as e:
+        app.logger.error(f"Search error: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/suggest', methods=['GET'])
+async def suggest():
+    """输入联想：用户历史 + 标题前缀补全 + 热门查询"""
+    start = time.perf_counter()
+    prefix = normalize_query(request.args.get('prefix', ''))
+    user_id = request.args.get('user_id')
+    try:
+        size = suggest_size(request.args.get('size'), Config.SUGGEST_SIZE, Config.MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not prefix:
+        return jsonify({"suggestions": [], "took_ms": 0})
+
+    cache_key = suggest_cache.make_key("suggest", prefix, size=size)
+    titles = suggest_cache.get(cache_key)
+    if titles is None:
+        try:
+            result = await es.options(request_timeout=Config.SUGGEST_TIMEOUT, max_retries=0).search(
+                index=ES_INDEX, **suggest_request(prefix, size)
+            )
+            titles = format_suggestions(result)
+            suggest_cache.set(cache_key, titles)
+        except Exception as e:
+            app.logger.warning(f"联想查询失败: {str(e)}")
+            titles = []
+
+    history = (recent_history.cached(user_id) or []) if user_id else []
+    suggestions = merge_suggestions(prefix, history, titles, popular_queries.matching(prefix, size), size)
+    return jsonify({
+        "suggestions": suggestions,
+        "took_ms": round((time.perf_counter() - start) * 1000, 2)
+    })
+
+
+@app.route('/api/msearch', methods=['POST'])
+async def msearch():
+    """一次请求执行多个 search / recommend / suggest，缓存未命中的查询合并为一个 ES _msearch，结果按请求顺序返回
+
+    {"user_id": "...", "requests": [{"type": "search", "query": ...}, {"type": "recommend", "from_result": 0}]}
+    """
+    start = time.perf_counter()
+    data = await request.get_json() or {}
+    user_id = data.get('user_id')
+    items = data.get('requests')
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "requests 不能为空"}), 400
+    if len(items) > Config.MSEARCH_MAX_REQUESTS:
+        return jsonify({"error": f"每次最多 {Config.MSEARCH_MAX_REQUESTS} 个请求"}), 400
+
+    batch = MultiSearch(ES_INDEX, DOCUMENTS_INDEX, Config.RELATED_INDEX, search_cache, suggest_cache, related_cache,
+                        popular_queries)
+    for item in items:
+        item = item if isinstance(item, dict) else {}
+        kind = item.get('type')
+        if kind == 'search':
+            query = item.get('query', '')
+            if user_id and isinstance(query, str):
+                await store_history(user_id, query)
+            mode = search_mode(item, query)
+            history_query = ''
+            if mode == "normal" and user_id:
+                history = await user_history(user_id)
+                history_query = history[0] if history else ''
+            batch.search(item, mode, history_query)
+        elif kind == 'recommend':
+            if 'from_result' in item:
+                batch.recommend_from(item['from_result'])
+            else:
+                batch.recommend(item.get('current_id'))
+        elif kind == 'suggest':
+            history = (recent_history.cached(user_id) or []) if user_id else []
+            batch.suggest(item.get('prefix', ''), item.get('size'), history)
+        else:
+            batch.error(f"不支持的请求类型: {kind}")
+
+    try:
+        # 新文章的推荐和依赖搜索结果的推荐需要再查询一轮
+        while batch.pending():
+            batch.resolve((await es.msearch(searches=batch.take()))['responses'])
+    except Exception as e:
+        app.logger.error(f"批量查询失败: {str(e)}")
+        batch.fail(e)
+
+    return jsonify({
+        "responses": batch.results,
+        "es_requests": batch.round_trips,
+        "took_ms": round((time.perf_counter() - start) * 1000, 2)
+    })
+
+
+@app.route('/api/doc/<doc_id>', methods=['GET'])
+async def get_document(doc_id):
+    """获取单篇新闻的完整内容（搜索结果只返回摘要）"""
+    try:
+        doc = await es.get(index=ES_INDEX, id=doc_id)
+        return jsonify(dict(doc['_source'], id=doc['_id']))
+    except NotFoundError:
+        return jsonify({"error": "文档不存在"}), 404
+    except Exception as e:
+        app.logger.error(f"获取文档失败: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.after_request
+async def compress_response(response):
+    """按 Accept-Encoding 压缩较大的 JSON 响应"""
+    if (not Config.RESPONSE_COMPRESSION or response.mimetype != 'application/json'
+            or 'Content-Encoding' in response.headers):
+        return response
+    encoded = compress_body(
+        await response.get_data(), request.headers.get('Accept-Encoding', ''),
+        Config.COMPRESS_MIN_SIZE, Config.COMPRESS_LEVEL
+    )
+    if encoded:
+        encoding, body = encoded
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+@app.route('/api/cache/stats', methods=['GET'])
+async def get_cache_stats():
+    """搜索缓存命中/未命中/淘汰计数，用于评估缓存容量"""
+    return jsonify({"search": search_cache.stats(), "suggest": suggest_cache.stats(),
+                    "recommend": related_cache.stats()})
+
+
+@app.route('/api/snapshot', methods=['POST'])
+async def get_snapshot():
+    """按新闻 URL 查找快照，返回图片和缩略图地址"""
+    data = await request.get_json()
+    url = data.get('url', '')
+    key = url_key(url)
+    if not url or snapshot_store.find(key) is None:
+        return jsonify({"success": False, "error": "快照不存在"}), 404
+    return jsonify(dict(snapshot_store.links(key), success=True))
+
+
+@app.route('/api/snapshot/<key>', methods=['GET'])
+async def serve_snapshot(key):
+    """输出快照图片（?thumb=1 为缩略图），支持 ETag 条件请求和 Range"""
+    path = snapshot_store.find(key, thumb=request.args.get('thumb') == '1')
+    if path is None:
+        return jsonify({"error": "快照不存在"}), 404
+    return await send_file(path, mimetype=mimetype(path), conditional=True,
+                           cache_timeout=Config.SNAPSHOT_CACHE_MAX_AGE)
+
+
+@app.route('/api/history/<user_id>', methods=['GET'])
+async def get_history(user_id):
+    try:
+        return jsonify({"history": await user_history(user_id)})
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/history-writer/stats', methods=['GET'])
+async def get_history_stats():
+    """后台历史写入队列的统计信息"""
+    return jsonify(history_writer.stats())
+
+
+async def load_related(doc_id):
+    """预计算的相关文章（Code/index/related.py），新文章尚未预计算时实时执行 more_like_this"""
+    try:
+        resp = await es.get(index=Config.RELATED_INDEX, id=doc_id)
+        return resp['_source']['related']
+    except NotFoundError:
+        result = await es.search(index=ES_INDEX, **recommend_request(ES_INDEX, doc_id))
+        return format_recommendations(result)
+
+
+@app.route('/api/recommend', methods=['POST'])
+async def get_recommendations():
+    try:
+        data = await request.get_json()
+        current_doc_id = data.get('current_id')
+        # 策略：基于搜索id的相关推荐
+        if not current_doc_id:
+            return jsonify([])
+        cache_key = related_cache.make_key("recommend", str(current_doc_id))
+        related = related_cache.get(cache_key)
+        if related is None:
+            related = await load_related(current_doc_id)
+            related_cache.set(cache_key, related)
+        return jsonify(related)
+
+    except Exception as e:
+        app.logger.error(f"推荐失败: {str(e)}")
+        return jsonify([])
+
+
+if __name__ == '__main__':
+    uvicorn.run(
+        "async_app:app",
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=Config.FLASK_HOST,
+        port=Config.ASYNC_PORT,
+        workers=Config.ASYNC_WORKERS,
+        log_level=Config.LOG_LEVEL.lower(),
+    )
@@ -0,0 +1,42 @@
+"""
+Response compression
+按 Accept-Encoding 压缩 JSON 响应，安装了 brotli 时优先使用 br，否则使用 gzip
+"""
+
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def accepted_encodings(accept_encoding):
+    """解析 Accept-Encoding，返回 q>0 的编码集合"""
+    encodings = set()
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+def compress_body(body, accept_encoding, min_size=1024, level=5):
+    """压缩响应体，返回 (编码, 压缩后数据)；不需要或不能压缩时返回 None"""
+    if len(body) < min_size:
+        return None
+    encodings = accepted_encodings(accept_encoding)
+    if brotli is not None and 'br' in encodings:
+        return 'br', brotli.compress(body, quality=level)
+    if 'gzip' in encodings or '*' in encodings:
+        return 'gzip', gzip.compress(body, compresslevel=level)
+    return None
@@ -11,38 +11,51 @@ es = Elasticsearch(
 )
 index_name = "documents_index"
 
+
+def document_search_request(query):
+    """文档搜索的 es.search 参数（不含 index）"""
+    return {
+        "query": {
+            "multi_match": {
+                "query": query,
+                "fields": ["content", "file_name"],
+                "type": "best_fields"
+            }
+        },
+        # 文档按段落块索引，每个文件只返回得分最高的块，高亮只作用于这一块
+        "collapse": {"field": "doc_id"},
+        "highlight": {
+            "fields": {
+                "content": {
+                    "pre_tags": ["<em>"],
+                    "post_tags": ["</em>"]
+                }
+            }
+        },
+        "size": 10
+    }
+
+
+def format_document_hits(result):
+    """把 ES 返回结果整理成前端需要的格式"""
+    hits = result.get('hits', {}).get('hits', [])
+    search_results = []
+    for hit in hits:
+        source = hit['_source']
+        search_results.append({
+            "file_name": source['file_name'],
+            "url": source['download_url'],
+            "page": source.get('page'),
+            "content": source['content'][:200] + "...",
+            "highlight": hit.get('highlight', {}).get('content', [])
+        })
+    return search_results
+
+
 def search_documents(query):
     try:
-        result = es.search(
-            index=index_name,
-            query={
-                "multi_match": {
-                    "query": query,
-                    "fields": ["content", "file_name"],
-                    "type": "best_fields"
-                }
-             },
-            highlight={
-                "fields": {
-                    "content": {
-                        "pre_tags": ["<em>"],
-                        "post_tags": ["</em>"]
-                    }
-                }
-            },
-            size = 10
-        )
-        hits = result.get('hits', {}).get('hits', [])
-        search_results = []
-        for hit in hits:
-            source = hit['_source']
-            search_results.append({
-                "file_name": source['file_name'],
-                "url": source['download_url'],
-                "content": source['content'][:200] + "...",
-                "highlight": hit.get('highlight', {}).get('content', [])
-            })
-        return search_results
+        result = es.search(index=index_name, **document_search_request(query))
+        return format_document_hits(result)
     except Exception as e:
         print(f"搜索失败: {e}")
         return []
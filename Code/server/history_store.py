@@ -0,0 +1,186 @@
+"""
+Search history storage off the request path
+搜索历史：后台线程批量写入 MySQL，按用户缓存最近的历史记录
+"""
+
+import time
+import queue
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+
+
+class HistoryWriter:
+    """异步批量写入搜索历史
+
+    请求线程只把记录放入队列，后台线程按批次（或按时间间隔）合并为一条
+    多行 INSERT ... ON DUPLICATE KEY UPDATE 写入 history 表
+    """
+
+    def __init__(self, get_connection, batch_size=100, flush_interval=1.0, max_queue=10000):
+        self.get_connection = get_connection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, user_id, words):
+        """记录一次搜索，队列已满时丢弃并计数，不阻塞请求"""
+        try:
+            self._queue.put_nowait((user_id, words))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _run(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch):
+        # 同一批次内去重，保持首次出现的顺序
+        rows = list(OrderedDict.fromkeys(batch))
+        sql = (
+            "INSERT INTO history (user_id, words) VALUES "
+            + ", ".join(["(%s, %s)"] * len(rows))
+            + " ON DUPLICATE KEY UPDATE search_time = CURRENT_TIMESTAMP"
+        )
+        params = [value for row in rows for value in row]
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            conn.commit()
+            cursor.close()
+            with self._lock:
+                self.written += len(rows)
+                self.flushes += 1
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            logging.error(f"写入搜索历史失败 ({len(rows)} 条): {e}")
+        finally:
+            if conn is not None and conn.is_connected():
+                conn.close()
+
+    def close(self, timeout=5):
+        """停止后台线程并写入队列中剩余的记录"""
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "written": self.written,
+                "dropped": self.dropped,
+                "flushes": self.flushes,
+                "errors": self.errors,
+            }
+
+
+HISTORY_SQL = "SELECT words FROM history WHERE user_id = %s ORDER BY search_time DESC LIMIT %s"
+
+
+def history_from_records(records):
+    """把按时间倒序查出的 history 行展开为旧的在前的搜索词列表"""
+    history = []
+    for record in reversed(records):
+        if record['words']:
+            history.extend(record['words'].split(','))
+    return history
+
+
+class RecentHistory:
+    """按用户缓存最近的搜索历史，顺序与 history 表一致（旧的在前）
+
+    每个用户首次访问时从 MySQL 加载一次，之后只读写内存；
+    异步服务传入 get_connection=None，先用 cached() 检查，未命中时自行异步加载后调用 seed()，
+    此时 get()/add() 不会在事件循环中同步访问数据库
+    """
+
+    def __init__(self, get_connection, max_users=10000, max_per_user=50):
+        self.get_connection = get_connection
+        self.max_users = max_users
+        self.max_per_user = max_per_user
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, user_id):
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(HISTORY_SQL, (user_id, self.max_per_user))
+            records = cursor.fetchall()
+            cursor.close()
+        except Exception as e:
+            logging.error(f"加载搜索历史失败 {user_id}: {e}")
+            return []
+        finally:
+            if conn is not None and conn.is_connected():
+                conn.close()
+        return history_from_records(records)
+
+    def cached(self, user_id):
+        """返回已缓存的历史副本，未缓存时返回 None（不访问数据库）"""
+        with self._lock:
+            history = self._users.get(user_id)
+            if history is None:
+                return None
+            self._users.move_to_end(user_id)
+            return list(history)
+
+    def seed(self, user_id, history):
+        """放入从数据库加载的历史；加载期间已有请求写入时保留已有记录"""
+        with self._lock:
+            history = self._users.setdefault(user_id, history[-self.max_per_user:])
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+            return history
+
+    def _entry(self, user_id):
+        with self._lock:
+            history = self._users.get(user_id)
+            if history is not None:
+                self._users.move_to_end(user_id)
+                return history
+        if self.get_connection is None:
+            return self.seed(user_id, [])
+        return self.seed(user_id, self._load(user_id))
+
+    def get(self, user_id):
+        """返回用户最近的搜索历史副本"""
+        history = self._entry(user_id)
+        with self._lock:
+            return list(history)
+
+    def add(self, user_id, words):
+        """把一次搜索追加到用户的历史中"""
+        history = self._entry(user_id)
+        with self._lock:
+            for word in words.split(','):
+                if word and word not in history:
+                    history.append(word)
+            del history[:-self.max_per_user]
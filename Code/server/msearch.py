@@ -0,0 +1,248 @@
+"""
+Batched multi-search shared by the Flask and ASGI servers
+/api/msearch：一次请求中的多个 search / recommend / suggest，缓存未命中的查询合并为一个 ES _msearch，
+结果按请求顺序返回，格式与单独调用各接口相同
+"""
+
+import os
+import sys
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from config import Config
+from document_search import document_search_request, format_document_hits
+from search_cache import normalize_query
+from search_query import (
+    search_request, format_search_response, recommend_request, format_recommendations,
+    wildcard_fragments, page_params
+)
+from suggest import suggest_request, suggest_size, format_suggestions, merge_suggestions
+
+# 尚未得到结果的条目
+PENDING = object()
+
+# es.search 关键字参数与 _msearch 请求体字段名不同的部分
+MSEARCH_KEYS = {"source": "_source", "from_": "from"}
+
+
+def msearch_item(index, params, **header):
+    """es.search 的参数转换为 _msearch 的 (header, body)"""
+    body = {MSEARCH_KEYS.get(key, key): value for key, value in params.items() if value is not None}
+    return dict(header, index=index), body
+
+
+def error_reason(response):
+    error = response.get('error')
+    if isinstance(error, dict):
+        return error.get('reason') or error.get('type') or str(error)
+    return str(error)
+
+
+class Followup:
+    """结果处理函数返回它表示同一条目还需要再查询一次（如新文章的推荐退回实时 more_like_this）"""
+
+    def __init__(self, index, params, on_result, on_error=None):
+        self.index = index
+        self.params = params
+        self.on_result = on_result
+        self.on_error = on_error
+
+
+class MultiSearch:
+    """一次 /api/msearch 请求
+
+    search / recommend / suggest 按请求顺序占位，缓存命中的直接给出结果，其余查询累积在 _searches 中；
+    调用方循环 take() -> es.msearch -> resolve(responses)，直到 pending() 为 False
+    """
+
+    def __init__(self, news_index, documents_index, related_index, search_cache, suggest_cache, related_cache,
+                 popular_queries):
+        self.news_index = news_index
+        self.documents_index = documents_index
+        self.related_index = related_index
+        self.search_cache = search_cache
+        self.suggest_cache = suggest_cache
+        self.related_cache = related_cache
+        self.popular_queries = popular_queries
+        self.results = []
+        self.round_trips = 0
+        self._searches = []
+        self._pending = []
+        self._deferred = []
+
+    # ---- 条目 ----
+
+    def search(self, data, mode, history_query=''):
+        """新闻/文档搜索，参数与 /api/search 相同（不支持游标分页）"""
+        query = data.get('query', '')
+        if not isinstance(query, str):
+            return self.error("query 必须是字符串")
+        if mode == "doc":
+            cache_key = self.search_cache.make_key("doc", query)
+            cached = self.search_cache.get(cache_key)
+            if cached is not None:
+                return self._done(cached)
+
+            def on_documents(response):
+                result = {"results": format_document_hits(response), "type": "doc"}
+                if result["results"]:
+                    self.search_cache.set(cache_key, result)
+                return result
+            return self._add(self.documents_index, document_search_request(query), on_documents,
+                             on_error=lambda: {"results": [], "type": "doc"})
+
+        if data.get('cursor') or data.get('paginate') == 'cursor':
+            return self.error("批量搜索不支持游标分页，请使用 /api/search")
+        sort = data.get('sort')
+        collapse = bool(data.get('collapse_duplicates'))
+        try:
+            page, size = page_params(data, Config.DEFAULT_PAGE_SIZE, Config.MAX_PAGE_SIZE, Config.MAX_RESULT_WINDOW)
+            if mode == "wildcard":
+                wildcard_fragments(query)
+        except ValueError as e:
+            return self.error(str(e))
+
+        cache_key = self.search_cache.make_key(
+            mode, query, history=history_query or None,
+            page=page, size=size, sort=sort, collapse=collapse or None
+        )
+        cached = self.search_cache.get(cache_key)
+        if cached is not None:
+            return self._done(cached)
+
+        def on_search(response):
+            result = format_search_response(response)
+            self.search_cache.set(cache_key, result)
+            return result
+        return self._add(self.news_index, search_request(mode, query, history_query, page, size, sort,
+                                                         collapse=collapse), on_search)
+
+    def recommend(self, doc_id, slot=None):
+        """相关文章：先查预计算结果，新文章退回实时 more_like_this，与 /api/recommend 相同"""
+        if doc_id is not None and (isinstance(doc_id, bool) or not isinstance(doc_id, (str, int))):
+            return self._done({"error": "current_id 必须是字符串"}, slot)
+        if not doc_id:
+            return self._done([], slot)
+        cache_key = self.related_cache.make_key("recommend", str(doc_id))
+        related = self.related_cache.get(cache_key)
+        if related is not None:
+            return self._done(related, slot)
+
+        def on_live(response):
+            result = format_recommendations(response)
+            self.related_cache.set(cache_key, result)
+            return result
+
+        def on_related(response):
+            hits = response['hits']['hits']
+            if not hits:
+                return Followup(self.news_index, recommend_request(self.news_index, doc_id), on_live, list)
+            result = hits[0]['_source']['related']
+            self.related_cache.set(cache_key, result)
+            return result
+        # 相关文章索引尚未建立时按空结果处理，不报错
+        return self._add(self.related_index, {"query": {"ids": {"values": [str(doc_id)]}}, "size": 1},
+                         on_related, on_error=list, slot=slot, ignore_unavailable=True)
+
+    def recommend_from(self, source):
+        """为第 source 个 search 条目的第一条结果推荐，该条目有结果后再查询"""
+        if not isinstance(source, int) or not 0 <= source < len(self.results):
+            return self.error("from_result 必须是之前的 search 请求的序号")
+        slot = self._reserve()
+        self._deferred.append((source, slot))
+        self._run_deferred()
+        return slot
+
+    def suggest(self, prefix, size, history):
+        """输入联想，与 /api/suggest 相同；查询失败时只返回历史和热门查询
+
+        size 为请求中的原始值，不合法时只有这一项返回错误
+        """
+        if not isinstance(prefix, str):
+            return self.error("prefix 必须是字符串")
+        try:
+            size = suggest_size(size, Config.SUGGEST_SIZE, Config.MAX_PAGE_SIZE)
+        except ValueError as e:
+            return self.error(str(e))
+        prefix = normalize_query(prefix)
+        if not prefix:
+            return self._done({"suggestions": []})
+
+        def merged(titles):
+            popular = self.popular_queries.matching(prefix, size)
+            return {"suggestions": merge_suggestions(prefix, history, titles, popular, size)}
+
+        cache_key = self.suggest_cache.make_key("suggest", prefix, size=size)
+        titles = self.suggest_cache.get(cache_key)
+        if titles is not None:
+            return self._done(merged(titles))
+
+        def on_suggest(response):
+            result = format_suggestions(response)
+            self.suggest_cache.set(cache_key, result)
+            return merged(result)
+        return self._add(self.news_index, suggest_request(prefix, size), on_suggest, on_error=lambda: merged([]))
+
+    def error(self, message):
+        return self._done({"error": message})
+
+    # ---- 执行 ----
+
+    def pending(self):
+        return bool(self._pending)
+
+    def take(self):
+        """取出本轮要发送的 _msearch 请求体"""
+        searches, self._searches = self._searches, []
+        self.round_trips += 1
+        return searches
+
+    def resolve(self, responses):
+        """按顺序处理 _msearch 的 responses"""
+        pending, self._pending = self._pending, []
+        for (slot, on_result, on_error), response in zip(pending, responses):
+            if 'error' in response:
+                value = on_error() if on_error else {"error": error_reason(response)}
+            else:
+                value = on_result(response)
+            if isinstance(value, Followup):
+                self._add(value.index, value.params, value.on_result, on_error=value.on_error, slot=slot)
+            else:
+                self.results[slot] = value
+        self._run_deferred()
+
+    def fail(self, error):
+        """_msearch 整体失败时，未完成的条目都返回错误"""
+        for slot, value in enumerate(self.results):
+            if value is PENDING:
+                self.results[slot] = {"error": str(error)}
+        self._pending, self._searches, self._deferred = [], [], []
+
+    # ---- 内部 ----
+
+    def _reserve(self):
+        self.results.append(PENDING)
+        return len(self.results) - 1
+
+    def _done(self, value, slot=None):
+        if slot is None:
+            slot = self._reserve()
+        self.results[slot] = value
+        return slot
+
+    def _add(self, index, params, on_result, on_error=None, slot=None, **header):
+        if slot is None:
+            slot = self._reserve()
+        self._searches.extend(msearch_item(index, params, **header))
+        self._pending.append((slot, on_result, on_error))
+        return slot
+
+    def _run_deferred(self):
+        for source, slot in list(self._deferred):
+            value = self.results[source]
+            if value is PENDING:
+                continue
+            self._deferred.remove((source, slot))
+            hits = value.get("results") if isinstance(value, dict) else None
+            self.recommend(hits[0].get("id") if hits else None, slot)
@@ -0,0 +1,216 @@
+"""
+Search result cache
+搜索结果缓存：进程内 LRU + TTL，可选 Redis 共享后端，按索引代数失效
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from config import Config
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class LRUCache:
+    """线程安全的进程内 LRU 缓存，条目超过 ttl 秒后失效"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class RedisCache:
+    """多进程/多实例共享的 Redis 缓存，过期和淘汰交给 Redis 处理"""
+
+    def __init__(self, client, ttl, prefix="search:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        with self._lock:
+            if raw is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key, value):
+        self.client.setex(self.prefix + key, self.ttl, json.dumps(value, ensure_ascii=False))
+
+    def clear(self):
+        # 旧代数的键带有不同前缀，靠 TTL 自然过期
+        pass
+
+    def stats(self):
+        info = self.client.info("stats")
+        with self._lock:
+            return {
+                "backend": "redis",
+                "entries": self.client.dbsize(),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": info.get("evicted_keys", 0),
+                "expirations": info.get("expired_keys", 0),
+            }
+
+
+def get_redis_client():
+    """按配置创建 Redis 客户端，未配置或未安装 redis 时返回 None"""
+    if not Config.CACHE_REDIS_URL:
+        return None
+    if redis is None:
+        print("⚠ 未安装 redis，搜索缓存退回进程内 LRU")
+        return None
+    return redis.Redis.from_url(Config.CACHE_REDIS_URL)
+
+
+GENERATION_KEY = "search:generation"
+
+
+def read_generation(client=None):
+    """读取索引代数，索引程序每次写入后递增"""
+    if client is not None:
+        return int(client.get(GENERATION_KEY) or 0)
+    try:
+        with open(Config.CACHE_GENERATION_FILE, 'r') as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def bump_generation(client=None):
+    """递增索引代数，使所有已缓存的搜索结果失效"""
+    client = client if client is not None else get_redis_client()
+    if client is not None:
+        return int(client.incr(GENERATION_KEY))
+    generation = read_generation() + 1
+    tmp_path = Config.CACHE_GENERATION_FILE + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(str(generation))
+    os.replace(tmp_path, Config.CACHE_GENERATION_FILE)
+    return generation
+
+
+def normalize_query(query):
+    """规范化查询：去首尾空白、合并连续空白、转小写"""
+    return ' '.join((query or '').split()).lower()
+
+
+class SearchCache:
+    """搜索结果缓存，键包含规范化查询、搜索模式和分页排序参数"""
+
+    def __init__(self, backend, client=None, generation_check=1.0):
+        self.backend = backend
+        self.client = client
+        self.generation_check = generation_check
+        self._generation = read_generation(client)
+        self._checked_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls):
+        client = get_redis_client()
+        if client is not None:
+            backend = RedisCache(client, Config.CACHE_TTL)
+        else:
+            backend = LRUCache(Config.CACHE_MAX_ENTRIES, Config.CACHE_TTL)
+        return cls(backend, client, Config.CACHE_GENERATION_CHECK)
+
+    def generation(self):
+        """读取索引代数（最多每 generation_check 秒读取一次），代数变化时清空本地缓存"""
+        now = time.monotonic()
+        if now - self._checked_at < self.generation_check:
+            return self._generation
+        with self._lock:
+            if now - self._checked_at >= self.generation_check:
+                generation = read_generation(self.client)
+                if generation != self._generation:
+                    self.backend.clear()
+                    self._generation = generation
+                self._checked_at = now
+        return self._generation
+
+    def make_key(self, mode, query, **params):
+        """生成缓存键，params 中的 None 值会被忽略"""
+        payload = {
+            "mode": mode,
+            "query": normalize_query(query),
+            "params": {k: v for k, v in sorted(params.items()) if v is not None},
+        }
+        digest = hashlib.sha1(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+        return f"{self.generation()}:{digest}"
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, value):
+        self.backend.set(key, value)
+
+    def stats(self):
+        stats = self.backend.stats()
+        stats["generation"] = self._generation
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
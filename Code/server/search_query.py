@@ -0,0 +1,245 @@
+"""
+Elasticsearch query builders shared by the Flask and ASGI servers
+新闻搜索/推荐的查询构造与结果处理，供同步和异步服务共用
+"""
+
+import re
+import json
+import base64
+import hashlib
+
+from search_cache import normalize_query
+
+# 结果列表只需要的字段，正文通过 /api/doc/<id> 单独获取
+RESULT_SOURCE_FIELDS = ["title", "url", "ctime"]
+# 近似重复簇 id（Code/index/near_dup.py），collapse_duplicates 时每簇只返回得分最高的一篇
+DUP_CLUSTER_FIELD = "dup_cluster"
+# 按发布时间排序（news 映射中的日期字段为 ctime），缺少日期的文章排在最后
+DATE_SORT = [{"ctime": {"order": "desc", "missing": "_last"}}]
+
+# 通配查询使用的中缀子字段及权重（见 elasticsearch_config.INFIX_FIELD）
+WILDCARD_FIELDS = {"title.infix": 3, "keywords.infix": 3, "content.infix": 1}
+# 中缀子字段按二元组索引，片段至少需要两个字符
+MIN_FRAGMENT_LENGTH = 2
+
+
+def search_mode(data, query):
+    """根据请求参数判断搜索模式：doc / wildcard / term / normal / empty"""
+    if data.get("file_type"):
+        return "doc"
+    if data.get('wildcard_type'):
+        return "wildcard"
+    if data.get("term_type"):
+        return "term"
+    if query:
+        return "normal"
+    return "empty"
+
+
+def wildcard_fragments(query):
+    """把通配模式按 * 和 ? 拆成字面片段
+
+    过短的片段无法在二元组上匹配，丢弃会让查询匹配远多于模式要求的文章：
+    任一片段不足 MIN_FRAGMENT_LENGTH 个字符或没有片段时抛出 ValueError
+    """
+    fragments = [f for f in re.split(r'[*?]+', query.strip().lower()) if f]
+    if not fragments or any(len(f) < MIN_FRAGMENT_LENGTH for f in fragments):
+        raise ValueError(f"通配查询中 * 和 ? 之间的每个片段至少需要 {MIN_FRAGMENT_LENGTH} 个连续字符")
+    return fragments
+
+
+def infix_query(field, fragments):
+    """片段在 field 中依次出现：每个片段的二元组必须相邻（连续子串），片段之间允许任意间隔"""
+    intervals = [
+        {"match": {"query": fragment, "max_gaps": 0, "ordered": True}}
+        for fragment in fragments
+    ]
+    rule = dict(intervals[0]) if len(intervals) == 1 else {"all_of": {"intervals": intervals, "ordered": True}}
+    rule["boost"] = WILDCARD_FIELDS[field]
+    return {"intervals": {field: rule}}
+
+
+def build_search_body(mode, query, history_query=''):
+    """构造 bool 查询体"""
+    search_body = {
+        "should": [],
+        "filter": []
+    }
+    # 通配查询：在二元中缀子字段上按顺序匹配各个字面片段
+    if mode == "wildcard":
+        fragments = wildcard_fragments(query)
+        search_body = {
+            "should": [
+                infix_query(field, fragments) for field in WILDCARD_FIELDS
+            ],
+            "minimum_should_match": 1
+        }
+    # 短语查询
+    elif mode == "term":
+        search_body["should"].append({
+            "multi_match": {
+                "query": query,  # 查询的短语
+                "fields": ["title", "keywords", "content"],  # 需要匹配的字段
+                "type": "phrase",  # 短语匹配类型
+                "analyzer": "ik_max_word"  # 使用 ik_max_word 分词器进行短语查询
+            }
+        })
+    # 普通查询
+    elif mode == "normal":
+        search_body["should"].append({
+            "multi_match": {
+                "query": query,
+                "fields": ["title^3", "keywords^3", "content", "url"],
+                "type": "best_fields",
+                "analyzer": "ik_smart",
+            }
+        })
+        # 个性化查询
+        if history_query:
+            search_body["should"].append({
+                "multi_match": {
+                    "query": history_query,
+                    "fields": ["title^3", "keywords^3", "content", "url"],
+                    "type": "best_fields",
+                    "analyzer": "ik_smart",
+                    "boost": 0.1
+                }
+            })
+    return search_body
+
+
+def search_request(mode, query, history_query='', page=1, size=10, sort=None, pit=None, search_after=None,
+                   full_content=False, collapse=False):
+    """es.search 的参数
+
+    不传 pit 时按 from/size 分页（需要另外指定 index）；
+    传入 pit 时使用 point-in-time + search_after 游标分页，不能再指定 index。
+    默认只返回列表需要的字段和摘要，full_content=True 时返回完整 _source；
+    collapse=True 时按近似重复簇折叠，只支持 from/size 分页
+    """
+    request = {
+        "query": {"bool": build_search_body(mode, query, history_query)},
+        "highlight": {
+            "fields": {
+                # 未命中正文时 no_match_size 返回正文开头作为摘要
+                "content": {} if full_content else {"fragment_size": 100, "number_of_fragments": 2, "no_match_size": 200}
+            },
+            "pre_tags": ["<highlight>"],
+            "post_tags": ["</highlight>"]
+        },
+        "size": size,
+    }
+    if not full_content:
+        request["source"] = RESULT_SOURCE_FIELDS
+    if collapse:
+        if pit is not None:
+            # ES 的 collapse 与 search_after 一起使用时只能按折叠字段排序
+            raise ValueError("合并相似新闻不支持游标分页")
+        request["collapse"] = {"field": DUP_CLUSTER_FIELD}
+    if pit is None:
+        request["from_"] = (page - 1) * size
+        request["sort"] = DATE_SORT if sort == 'date' else None
+    else:
+        # _shard_doc 作为唯一的决胜排序键，保证 search_after 翻页不重不漏
+        request["pit"] = pit
+        request["sort"] = (DATE_SORT if sort == 'date' else [{"_score": "desc"}]) + [{"_shard_doc": "asc"}]
+        if search_after:
+            request["search_after"] = search_after
+    return request
+
+
+def cursor_binding(mode, query, sort):
+    """游标绑定的查询指纹：同一个游标只能用于生成它的查询、模式和排序"""
+    key = json.dumps([mode, normalize_query(query), sort or None], ensure_ascii=False)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def encode_cursor(pit_id, search_after, binding, history_query=''):
+    """把 PIT id、最后一条结果的排序值、查询指纹和个性化词编码为不透明的游标
+
+    个性化词随游标传递，翻页期间用户历史变化不会改变得分和排序
+    """
+    payload = json.dumps({"pit": pit_id, "after": search_after, "q": binding, "h": history_query},
+                         separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, binding):
+    """解析游标，返回 (pit_id, search_after, history_query)；格式错误或与当前查询不匹配时抛出 ValueError"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        pit_id, search_after, bound = payload["pit"], payload["after"], payload["q"]
+        history_query = payload.get("h") or ''
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"无效的游标: {e}")
+    if bound != binding:
+        raise ValueError("游标与当前的查询、搜索模式或排序不匹配，请重新搜索")
+    return pit_id, search_after, history_query
+
+
+def page_params(data, default_size, max_size, max_result_window):
+    """解析并校验分页参数，size 限制在 [1, max_size]
+
+    from/size 分页超过 max_result_window 时抛出 ValueError，应改用游标分页
+    """
+    try:
+        page = max(1, int(data.get('page', 1)))
+        size = min(max(1, int(data.get('size', default_size))), max_size)
+    except (TypeError, ValueError):
+        raise ValueError("page 和 size 必须是整数")
+    if page * size > max_result_window:
+        raise ValueError(f"页码过深（超过 {max_result_window} 条），请使用 cursor 分页")
+    return page, size
+
+
+def format_search_response(result, full_content=False):
+    """把 ES 返回结果整理成前端需要的格式"""
+    hits = []
+    for hit in result['hits']['hits']:
+        item = {
+            "id": hit['_id'],
+            "title": hit['_source'].get('title', ''),
+            "url": hit['_source'].get('url', ''),
+            "snippet": '...'.join(hit.get('highlight', {}).get('content', [''])),
+            "timestamp": hit['_source'].get('ctime', ''),
+        }
+        if full_content:
+            item["content"] = hit['_source'].get('content', '')
+        hits.append(item)
+    return {
+        "total": result['hits']['total']['value'],
+        "results": hits,
+        "type": "normal"
+    }
+
+
+def recommend_request(index, doc_id, size=5):
+    """基于文档 id 的 more_like_this 推荐查询参数"""
+    return {
+        "query": {
+            "more_like_this": {
+                "fields": ["title", "content", "keywords"],
+                "like": [{"_index": index, "_id": doc_id}],
+                "min_term_freq": 1,
+                "max_query_terms": 12,
+                "min_doc_freq": 1
+            }
+        },
+        "size": size,
+        "source": RESULT_SOURCE_FIELDS,
+    }
+
+
+def recommend_msearch_body(index, doc_ids, size=5):
+    """多篇文档的 more_like_this 查询，供 _msearch 一次发送（离线预计算相关文章）"""
+    searches = []
+    for doc_id in doc_ids:
+        request = recommend_request(index, doc_id, size)
+        searches.append({"index": index})
+        searches.append({"query": request["query"], "size": size, "_source": RESULT_SOURCE_FIELDS})
+    return searches
+
+
+def format_recommendations(result):
+    """推荐结果：相关文章的 id、标题、链接和时间"""
+    return [dict(hit['_source'], id=hit['_id']) for hit in result['hits']['hits']]
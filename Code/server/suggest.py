@@ -0,0 +1,121 @@
+"""
+Search-as-you-type suggestions
+输入联想：合并用户历史、title.autocomplete 前缀匹配和热门查询，ES 结果按前缀缓存
+"""
+
+import time
+import logging
+import threading
+from collections import Counter
+
+from search_cache import normalize_query
+
+
+class PopularQueries:
+    """进程内热门查询统计，只保留计数最高的 max_keys 个查询"""
+
+    def __init__(self, max_keys=50000, top_size=1000, refresh_interval=10.0):
+        self.max_keys = max_keys
+        self.top_size = top_size
+        self.refresh_interval = refresh_interval
+        self._counts = Counter()
+        self._top = []
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, query, count=1):
+        query = normalize_query(query)
+        if not query:
+            return
+        with self._lock:
+            self._counts[query] += count
+            # 超过上限时裁掉长尾，保持内存有界
+            if len(self._counts) > self.max_keys * 2:
+                self._counts = Counter(dict(self._counts.most_common(self.max_keys)))
+
+    def load(self, get_connection, limit=None):
+        """从 history 表加载热门查询作为初始计数"""
+        conn = None
+        try:
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT words, COUNT(*) FROM history GROUP BY words ORDER BY COUNT(*) DESC LIMIT %s",
+                (limit or self.top_size,)
+            )
+            for words, count in cursor.fetchall():
+                self.record(words, count)
+            cursor.close()
+        except Exception as e:
+            logging.error(f"加载热门查询失败: {e}")
+        finally:
+            if conn is not None and conn.is_connected():
+                conn.close()
+
+    def top(self):
+        """按热度排序的热门查询（每 refresh_interval 秒重新排序一次）"""
+        now = time.monotonic()
+        if now - self._refreshed_at >= self.refresh_interval:
+            with self._lock:
+                self._top = [query for query, _ in self._counts.most_common(self.top_size)]
+                self._refreshed_at = now
+        return self._top
+
+    def matching(self, prefix, size):
+        return [query for query in self.top() if query.startswith(prefix)][:size]
+
+
+def suggest_size(value, default, max_size):
+    """解析联想条数，限制在 [1, max_size]；不是整数时抛出 ValueError"""
+    if value is None or value == '':
+        return default
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("size 必须是整数")
+    return min(max(1, size), max_size)
+
+
+def suggest_request(prefix, size):
+    """title.autocomplete 前缀匹配查询参数（不含 index）
+
+    索引时 autocomplete 分析器生成 edge_ngram，查询时用 ik_smart 避免查询词也被切成 n-gram
+    """
+    return {
+        "query": {
+            "match": {
+                "title.autocomplete": {
+                    "query": prefix,
+                    "analyzer": "ik_smart",
+                    "operator": "and"
+                }
+            }
+        },
+        "source": ["title"],
+        "size": size,
+        "track_total_hits": False,
+    }
+
+
+def format_suggestions(result):
+    titles = []
+    for hit in result['hits']['hits']:
+        title = hit['_source'].get('title')
+        if title and title not in titles:
+            titles.append(title)
+    return titles
+
+
+def merge_suggestions(prefix, history, titles, popular, size):
+    """按 用户历史 > 标题补全 > 热门查询 的顺序合并去重"""
+    merged = []
+    seen = set()
+    own = [query for query in reversed(history) if normalize_query(query).startswith(prefix)]
+    for text in own + titles + popular:
+        key = normalize_query(text)
+        if key and key not in seen:
+            seen.add(key)
+            merged.append(text)
+        if len(merged) >= size:
+            break
+    return merged
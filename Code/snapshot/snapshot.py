@@ -1,101 +1,177 @@
-from selenium import webdriver
-import mysql.connector
-import time
 import os
-from datetime import datetime
-import threading
-
-# 连接到 MySql
-db_connection = mysql.connector.connect(
-    host="localhost",
-    user="root",
-    password="Qwe248931",
-    database="web_search"
-)
-cursor = db_connection.cursor(dictionary=True)
+import sys
+import time
+import random
+import argparse
+import tempfile
 
-# 存储快照的目录
-snapshot_dir = "./snapshot_img"
+import mysql.connector
 
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-# 删除旧的快照目录（如果存在），然后创建一个新目录
-# if os.path.exists(snapshot_dir):
-#     shutil.rmtree(snapshot_dir)
-# os.makedirs(snapshot_dir)
+from config import Config
+from snapshot_pool import SnapshotPool, print_snapshot_stats
+from snapshot_store import SnapshotStore
+from snapshot_scheduler import (
+    SnapshotManifest, SnapshotScheduler, DIGEST_SQL, row_digest, print_schedule_stats
+)
 
-def webshot(url, saveImgName, total_page):
-    options = webdriver.ChromeOptions()
-    options.add_argument('--headless')
-    options.add_argument('--disable-gpu')
-    options.add_argument('--no-sandbox')
+# 旧版本按标题保存 PNG 的目录（--migrate 迁移到 SnapshotStore）
+legacy_snapshot_dir = "./snapshot_img"
 
-    driver = webdriver.Chrome(options=options)
-    driver.maximize_window()
+FIXTURE_PAGE = """<html><head><meta charset="utf-8"><title>{title}</title></head>
+<body style="font-size:18px; width:900px; margin:0 auto;"><h1>{title}</h1>{paragraphs}</body></html>"""
+# 发布时间取 nankai_news 中同一 url 的发稿时间 ctime；没有对应行或发稿时间未解析出来（爬虫写入的 2000-01-01）时
+# 退回 nankai_news_mtnk.created_at，即爬虫写入时间
+PUBLISHED_SQL = (
+    "COALESCE(NULLIF((SELECT ctime FROM nankai_news WHERE nankai_news.url = nankai_news_mtnk.url LIMIT 1), "
+    "'2000-01-01 00:00:00'), created_at)"
+)
 
+FIXTURE_WORDS = ["南开大学", "学术会议", "人工智能", "研究生", "图书馆", "科研成果", "国际交流", "志愿服务"]
+
+
+def get_connection():
+    """MySQL 连接（不走连接池）"""
+    db_config = {
+        k: v for k, v in Config.MYSQL_CONFIG.items()
+        if k not in ('pool_name', 'pool_size', 'buffered')
+    }
+    return mysql.connector.connect(**db_config)
+
+
+class SnapshotSaver:
+    """保存截图并累计压缩前后的大小"""
+
+    def __init__(self, store):
+        self.store = store
+        self.png_bytes = 0
+        self.stored_bytes = 0
+        self.thumb_bytes = 0
+
+    def __call__(self, url, png):
+        info = self.store.save(url, png)
+        self.png_bytes += info["png_bytes"]
+        self.stored_bytes += info["bytes"]
+        self.thumb_bytes += info["thumb_bytes"]
+
+    def report(self):
+        if self.png_bytes:
+            print(f"✓ PNG {self.png_bytes / 1024 / 1024:.1f} MB -> {self.store.fmt.upper()} "
+                  f"{self.stored_bytes / 1024 / 1024:.1f} MB ({self.stored_bytes / self.png_bytes:.0%})，"
+                  f"缩略图 {self.thumb_bytes / 1024 / 1024:.2f} MB")
+
+
+def migrate_legacy(store, pages):
+    """把旧版按标题保存的 PNG 转存到 SnapshotStore，返回迁移数"""
+    saver = SnapshotSaver(store)
+    migrated = 0
+    for url, name in pages:
+        path = os.path.join(legacy_snapshot_dir, f"{name}.png")
+        if not os.path.exists(path) or store.exists(url):
+            continue
+        with open(path, 'rb') as f:
+            saver(url, f.read())
+        migrated += 1
+    saver.report()
+    return migrated
+
+
+def write_fixtures(directory, count, paragraphs=60, edit=0):
+    """生成本地 HTML 测试页面（已存在的不重写），随机修改其中 edit 个，
+    返回与 news_rows 格式相同的行，第 i 个页面发布于 i 小时前
+    """
+    rows = []
+    now = time.time()
+    edited = set(random.sample(range(count), min(edit, count)))
+    for i in range(count):
+        path = os.path.join(directory, f"fixture_{i}.html")
+        if os.path.exists(path) and i not in edited:
+            with open(path, 'r', encoding='utf-8') as f:
+                html = f.read()
+        else:
+            rng = random.Random(i)
+            body = ''.join(f"<p>{''.join(rng.choice(FIXTURE_WORDS) for _ in range(40))}</p>"
+                           for _ in range(paragraphs))
+            if i in edited:
+                body += f"<p>更新于 {time.strftime('%Y-%m-%d %H:%M:%S')}</p>"
+            html = FIXTURE_PAGE.format(title=f"测试页面 {i}", paragraphs=body)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(html)
+        rows.append({
+            "url": 'file://' + os.path.abspath(path),
+            "title": f"fixture_{i}",
+            "content_hash": row_digest(f"fixture_{i}", html),
+            "published": now - i * 3600,
+        })
+    return rows
+
+
+def news_rows():
+    """nankai_news_mtnk 中的 url、标题、内容哈希（在 MySQL 中计算）和发布时间（见 PUBLISHED_SQL）"""
+    conn = get_connection()
     try:
-        driver.get(url)
-        time.sleep(1)  # 等待页面初步加载
-
-        # 获取页面总高度
-        total_height = driver.execute_script("return document.body.parentNode.scrollHeight")
-
-        # 循环滚动并截图
-        for i in range(1, int(total_height / 500) + 2):
-            driver.execute_script(f"window.scrollTo(0, {(i * 500)});")
-            time.sleep(0.01)  # 稍微等待页面加载
-
-        # 调整窗口捕获整个页面
-        driver.set_window_size(driver.execute_script("return document.body.scrollWidth;"), total_height)
-        driver.save_screenshot(os.path.join(snapshot_dir, f"{saveImgName}.png"))
-
-        now = datetime.now()
-        current_time = now.strftime("%H:%M:%S")
-        print(f"Saved screenshot for {url} as {saveImgName}.png, {total_page}, {current_time}")
-        total_page += 1
-    except Exception as e:
-        print(f"Error capturing {url}: {e}")
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            f"SELECT url, title, {DIGEST_SQL} AS content_hash, {PUBLISHED_SQL} AS published FROM nankai_news_mtnk"
+        )
+        rows = cursor.fetchall()
+        cursor.close()
     finally:
-        driver.quit()
-
-
-def snapshot_thread(url, name, total_page):
-    snapshot_path = os.path.join(snapshot_dir, f"{name}.png")
-    if os.path.exists(snapshot_path):
-        print(f"Snapshot for {name} already exists, skipping.", total_page)
-    else:
-        webshot(url, name, total_page)
+        conn.close()
+    return rows
 
 
 if __name__ == '__main__':
-    try:
-        total_page = 0
-        threads = []
-
-        # 从MySQL数据库中获取数据
-        cursor.execute("SELECT url, title FROM nankai_news_mtnk")
-        documents = cursor.fetchall()
-
-        for document in documents:
-            total_page += 1
-            url = document.get("url")
-            name = document.get("title")
-            # 创建一个线程
-            thread = threading.Thread(target=snapshot_thread, args=(url, name, total_page))
-            threads.append(thread)
-            thread.start()
-
-            if len(threads) >= 8:  # 如果已经有八个线程在运行，等待它们完成
-                for t in threads:
-                    t.join()
-                threads = []  # 清空线程列表，准备下一轮
-            if total_page==5:
-                break
-
-        # 等待最后一批线程完成
-        for t in threads:
-            t.join()
-
-    finally:
-        # 关闭数据库连接
-        cursor.close()
-        db_connection.close()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="网页快照：只截取新增或内容变化的页面，复用固定数量的无头浏览器")
+    parser.add_argument('--workers', type=int, default=Config.SNAPSHOT_WORKERS, help="浏览器（工作线程）数量")
+    parser.add_argument('--recycle-after', type=int, default=Config.SNAPSHOT_RECYCLE_AFTER,
+                        help="每个浏览器处理多少页后重启，1 相当于每页启动一个浏览器")
+    parser.add_argument('--page-timeout', type=float, default=Config.SNAPSHOT_PAGE_TIMEOUT, help="单页加载/滚动超时(秒)")
+    parser.add_argument('--limit', type=int, help="本次最多截图数，按发布时间从新到旧，其余留到下次")
+    parser.add_argument('--full', action='store_true', help="忽略截图记录，重新截取全部页面")
+    parser.add_argument('--fixture', type=int, metavar='PAGES', help="对生成的本地 HTML 页面截图，用于测量吞吐")
+    parser.add_argument('--fixture-edit', type=int, default=0, metavar='PAGES',
+                        help="截图前随机修改多少个测试页面，用于测量增量截图")
+    parser.add_argument('--format', choices=['webp', 'jpeg', 'png'], default=Config.SNAPSHOT_FORMAT, help="保存格式")
+    parser.add_argument('--quality', type=int, default=Config.SNAPSHOT_QUALITY, help="WebP/JPEG 质量")
+    parser.add_argument('--migrate', action='store_true', help=f"把 {legacy_snapshot_dir} 中按标题保存的 PNG 转存后退出")
+    args = parser.parse_args()
+
+    if args.fixture:
+        # 固定目录，多次运行之间保留截图记录
+        fixture_dir = os.path.join(tempfile.gettempdir(), "snapshot_fixture")
+        os.makedirs(fixture_dir, exist_ok=True)
+        rows = write_fixtures(fixture_dir, args.fixture, edit=args.fixture_edit)
+        store = SnapshotStore(os.path.join(fixture_dir, "img"), args.format, args.quality)
+    else:
+        rows = news_rows()
+        store = SnapshotStore(fmt=args.format, quality=args.quality)
+
+    if args.migrate:
+        before = sum(os.path.getsize(os.path.join(legacy_snapshot_dir, name))
+                     for name in os.listdir(legacy_snapshot_dir) if name.endswith('.png'))
+        migrated = migrate_legacy(store, [(row["url"], row["title"]) for row in rows])
+        print(f"✓ 迁移 {migrated} 张，原目录 {before / 1024 / 1024:.1f} MB")
+    else:
+        os.makedirs(store.root, exist_ok=True)
+        manifest = SnapshotManifest(os.path.join(store.root, "manifest.db"))
+        scheduler = SnapshotScheduler(store, manifest, full=args.full)
+        try:
+            scheduler.plan(rows)
+            saver = SnapshotSaver(store)
+            pool = SnapshotPool(scheduler.on_capture(saver), workers=args.workers,
+                                recycle_after=args.recycle_after, page_timeout=args.page_timeout)
+            if scheduler.drain(pool.start(), args.limit):
+                stats = pool.join()
+                print_snapshot_stats(stats)
+                saver.report()
+            else:
+                pool.join()
+            print_schedule_stats(scheduler.stats)
+        finally:
+            manifest.close()
+    usage = store.usage()
+    print(f"✓ 快照目录 {store.root}: {usage['files']} 张 {usage['bytes'] / 1024 / 1024:.1f} MB，"
+          f"缩略图 {usage['thumbs']} 张 {usage['thumb_bytes'] / 1024 / 1024:.2f} MB")
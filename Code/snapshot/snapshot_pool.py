@@ -0,0 +1,179 @@
+"""
+Pooled webpage snapshot workers
+固定数量的长驻无头浏览器：任务从队列中取出，每个工作线程复用自己的浏览器，
+处理 recycle_after 个页面或出错后重启浏览器，单页有加载/脚本超时，并统计进度和吞吐
+"""
+
+import time
+import queue
+import logging
+import threading
+
+try:
+    from selenium import webdriver
+except ImportError:
+    webdriver = None
+
+# 逐屏滚动到底部触发懒加载，每帧滚动一次，不使用 sleep；完成后回到顶部并返回页面高度
+SCROLL_SCRIPT = """
+const done = arguments[arguments.length - 1];
+const step = arguments[0];
+let y = 0;
+function next() {
+    const height = document.documentElement.scrollHeight;
+    if (y >= height) {
+        window.scrollTo(0, 0);
+        done(height);
+        return;
+    }
+    window.scrollTo(0, y);
+    y += step;
+    requestAnimationFrame(next);
+}
+next();
+"""
+
+WINDOW_WIDTH = 1280
+WINDOW_HEIGHT = 900
+SCROLL_STEP = 800
+# 截图高度上限，超长页面只截取前面部分（WebP 单边最大 16383 像素）
+MAX_HEIGHT = 16383
+
+
+def new_driver():
+    """创建无头 Chrome"""
+    if webdriver is None:
+        raise RuntimeError("未安装 selenium，无法生成快照")
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless=new')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--hide-scrollbars')
+    options.add_argument(f'--window-size={WINDOW_WIDTH},{WINDOW_HEIGHT}')
+    return webdriver.Chrome(options=options)
+
+
+def capture(driver, url, page_timeout):
+    """打开页面、滚动到底部后截取整页，返回 PNG 字节"""
+    driver.set_page_load_timeout(page_timeout)
+    driver.set_script_timeout(page_timeout)
+    driver.set_window_size(WINDOW_WIDTH, WINDOW_HEIGHT)
+    driver.get(url)
+    height = driver.execute_async_script(SCROLL_SCRIPT, SCROLL_STEP)
+    width = driver.execute_script("return document.documentElement.scrollWidth;")
+    driver.set_window_size(max(width, WINDOW_WIDTH), min(max(height, WINDOW_HEIGHT), MAX_HEIGHT))
+    return driver.get_screenshot_as_png()
+
+
+class SnapshotPool:
+    """快照工作池
+
+    submit(url, key) 把任务放入队列；每个工作线程截图后调用 on_capture(url, key, png)
+    保存结果，然后继续取下一个任务
+    """
+
+    def __init__(self, on_capture, workers=4, recycle_after=50, page_timeout=30, driver_factory=new_driver,
+                 progress_every=20):
+        self.on_capture = on_capture
+        self.workers = workers
+        self.recycle_after = recycle_after
+        self.page_timeout = page_timeout
+        self.driver_factory = driver_factory
+        self.progress_every = progress_every
+        self._queue = queue.Queue(maxsize=workers * 4)
+        self._threads = []
+        self._lock = threading.Lock()
+        self.stats = {"submitted": 0, "captured": 0, "failed": 0, "browser_starts": 0, "bytes": 0,
+                      "capture_sec": 0.0}
+        self._start = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        self._threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def submit(self, url, key):
+        """放入一个任务，队列满时等待"""
+        self.stats["submitted"] += 1
+        self._queue.put((url, key))
+
+    def _new_driver(self):
+        driver = self.driver_factory()
+        with self._lock:
+            self.stats["browser_starts"] += 1
+        return driver
+
+    def _worker(self):
+        driver = None
+        pages = 0
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                url, key = item
+                start = time.perf_counter()
+                try:
+                    if driver is None:
+                        driver = self._new_driver()
+                        pages = 0
+                    png = capture(driver, url, self.page_timeout)
+                    pages += 1
+                    self.on_capture(url, key, png)
+                    self._record(time.perf_counter() - start, len(png))
+                except Exception as e:
+                    logging.error(f"快照失败 {url}: {str(e)[:200]}")
+                    self._record(time.perf_counter() - start, None)
+                    # 出错后浏览器可能处于异常状态（超时、崩溃），直接重启
+                    pages = self.recycle_after
+                if driver is not None and pages >= self.recycle_after:
+                    self._quit(driver)
+                    driver = None
+        finally:
+            if driver is not None:
+                self._quit(driver)
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.warning(f"关闭浏览器失败: {e}")
+
+    def _record(self, seconds, size):
+        with self._lock:
+            self.stats["capture_sec"] += seconds
+            if size is None:
+                self.stats["failed"] += 1
+            else:
+                self.stats["captured"] += 1
+                self.stats["bytes"] += size
+            done = self.stats["captured"] + self.stats["failed"]
+        if self.progress_every and done % self.progress_every == 0:
+            elapsed = time.perf_counter() - self._start
+            print(f"已完成 {done}/{self.stats['submitted']}，{done / elapsed:.2f} pages/sec")
+
+    def join(self):
+        """等待队列中的任务全部完成并关闭浏览器，返回统计"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        elapsed = time.perf_counter() - self._start
+        done = self.stats["captured"] + self.stats["failed"]
+        return {
+            **self.stats,
+            "elapsed": round(elapsed, 2),
+            "pages_per_sec": round(done / elapsed, 2) if elapsed else 0.0,
+            "avg_capture_sec": round(self.stats["capture_sec"] / done, 2) if done else 0.0,
+        }
+
+
+def print_snapshot_stats(stats):
+    """打印快照统计"""
+    print(f"✓ 快照 {stats['captured']} 张，失败 {stats['failed']}，启动浏览器 {stats['browser_starts']} 次，"
+          f"共 {stats['bytes'] / 1024 / 1024:.1f} MB")
+    print(f"✓ 耗时 {stats['elapsed']}s，{stats['pages_per_sec']} pages/sec，单页平均 {stats['avg_capture_sec']}s")
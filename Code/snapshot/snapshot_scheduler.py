@@ -0,0 +1,131 @@
+"""
+Incremental snapshot scheduler
+增量快照调度：记录每个 URL 截图时的内容哈希，只重新截取内容变化或新增的页面，
+待截取的页面按发布时间排入优先队列，最新的新闻先截图
+"""
+
+import time
+import heapq
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+
+MANIFEST_SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    url TEXT PRIMARY KEY,
+    content_hash TEXT,
+    captured_at REAL
+);
+"""
+
+# 与 row_digest 相同的哈希，在 MySQL 中计算，不必把 content 全文传到客户端
+DIGEST_SQL = "SHA1(CONCAT_WS('\\n', title, content))"
+
+
+def row_digest(title, content):
+    """新闻行的内容哈希（标题 + 正文），与 DIGEST_SQL 一致"""
+    return hashlib.sha1('\n'.join(part for part in (title, content) if part is not None).encode('utf-8')).hexdigest()
+
+
+class SnapshotManifest:
+    """基于 SQLite 的截图记录：URL -> 截图时的内容哈希，每 commit_every 条提交一次"""
+
+    def __init__(self, path, commit_every=50):
+        self.path = path
+        self.commit_every = commit_every
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(MANIFEST_SCHEMA)
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def load(self):
+        """{url: content_hash}"""
+        with self._lock:
+            return dict(self.conn.execute("SELECT url, content_hash FROM captures"))
+
+    def record(self, url, digest):
+        """截图保存后调用（在快照工作线程中）"""
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO captures (url, content_hash, captured_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET content_hash = excluded.content_hash, "
+                "captured_at = excluded.captured_at",
+                (url, digest, time.time())
+            )
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self.conn.commit()
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            self.conn.commit()
+            self.conn.close()
+
+
+def published_ts(value):
+    """发布时间转为时间戳，缺失时视为最旧"""
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value or 0)
+
+
+class SnapshotScheduler:
+    """plan(rows) 比较内容哈希并把待截图页面放入优先队列，drain(pool) 按优先级提交
+
+    rows 为 {"url", "content_hash", "published"}；截图成功后才更新记录，失败的页面下次重试
+    """
+
+    def __init__(self, store, manifest, full=False):
+        self.store = store
+        self.manifest = manifest
+        self.full = full
+        self._heap = []
+        self.stats = {"rows": 0, "new": 0, "changed": 0, "unchanged": 0, "adopted": 0,
+                      "submitted": 0, "deferred": 0}
+
+    def plan(self, rows):
+        """返回本次需要截图的页面数"""
+        captured = {} if self.full else self.manifest.load()
+        for seq, row in enumerate(rows):
+            url, digest = row["url"], row["content_hash"]
+            self.stats["rows"] += 1
+            previous = captured.get(url)
+            if previous == digest and self.store.exists(url):
+                self.stats["unchanged"] += 1
+                continue
+            if previous is None and not self.full and self.store.exists(url):
+                # 记录表建立之前已有的快照，视为当前内容的截图，不重新截取
+                self.manifest.record(url, digest)
+                self.stats["adopted"] += 1
+                continue
+            self.stats["new" if previous is None else "changed"] += 1
+            # 最小堆：发布时间越新越先出队，同一时间按原顺序
+            heapq.heappush(self._heap, (-published_ts(row.get("published")), seq, url, digest))
+        return len(self._heap)
+
+    def on_capture(self, save):
+        """包装 save(url, png) 为工作池的 on_capture(url, digest, png)：保存成功后记录内容哈希"""
+        def handler(url, digest, png):
+            save(url, png)
+            self.manifest.record(url, digest)
+        return handler
+
+    def drain(self, pool, limit=None):
+        """按优先级提交到快照工作池，limit 为本次最多截图数，其余留到下次"""
+        while self._heap and (limit is None or self.stats["submitted"] < limit):
+            _, _, url, digest = heapq.heappop(self._heap)
+            pool.submit(url, digest)
+            self.stats["submitted"] += 1
+        self.stats["deferred"] = len(self._heap)
+        return self.stats["submitted"]
+
+
+def print_schedule_stats(stats):
+    """打印调度统计"""
+    print(f"✓ 新闻 {stats['rows']} 条：新增 {stats['new']}，内容变化 {stats['changed']}，"
+          f"未变化 {stats['unchanged']}，沿用已有快照 {stats['adopted']}")
+    print(f"✓ 提交截图 {stats['submitted']} 张，留到下次 {stats['deferred']} 张"
+          + (f"（{stats['submitted'] / stats['rows']:.0%} 的页面）" if stats['rows'] else ""))
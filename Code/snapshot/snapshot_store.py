@@ -0,0 +1,154 @@
+"""
+Compressed snapshot store
+网页快照存储：按 URL 哈希命名，整页截图压缩为 WebP/JPEG 并生成缩略图，
+由 app.py / async_app.py 的 GET /api/snapshot/<key> 读取
+"""
+
+import io
+import os
+import sys
+import hashlib
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Add project root to path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(PROJECT_ROOT)
+
+from config import Config
+
+FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "png": ("PNG", "image/png"),
+}
+EXTENSIONS = {"webp": ".webp", "jpeg": ".jpg", "png": ".png"}
+MIMETYPES = {ext: FORMATS[fmt][1] for fmt, ext in EXTENSIONS.items()}
+# WebP 单边最大 16383 像素
+WEBP_MAX_SIZE = 16383
+
+
+def url_key(url):
+    """快照文件名：URL 的 sha1，与标题无关，同名新闻不会互相覆盖"""
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+
+def snapshot_root():
+    """SNAPSHOT_FOLDER 为相对路径时相对于项目根目录，爬虫和服务读写同一目录"""
+    folder = Config.SNAPSHOT_FOLDER
+    return folder if os.path.isabs(folder) else os.path.join(PROJECT_ROOT, folder)
+
+
+class SnapshotStore:
+    """<root>/<key 前两位>/<key>.<ext> 为整页图，<key>.thumb.<ext> 为缩略图"""
+
+    def __init__(self, root=None, fmt=None, quality=None, thumb_width=None):
+        self.root = root or snapshot_root()
+        self.fmt = (fmt or Config.SNAPSHOT_FORMAT).lower()
+        if self.fmt not in FORMATS:
+            raise ValueError(f"不支持的快照格式: {self.fmt}")
+        if Image is None and self.fmt != "png":
+            # 没有 Pillow 时无法转码，原样保存 PNG，也不生成缩略图
+            self.fmt = "png"
+        self.quality = quality or Config.SNAPSHOT_QUALITY
+        self.thumb_width = Config.SNAPSHOT_THUMB_WIDTH if thumb_width is None else thumb_width
+
+    def _path(self, key, thumb, fmt):
+        name = f"{key}.thumb{EXTENSIONS[fmt]}" if thumb else f"{key}{EXTENSIONS[fmt]}"
+        return os.path.join(self.root, key[:2], name)
+
+    def find(self, key, thumb=False):
+        """返回已保存的文件路径（可能是以其它格式保存的旧文件），不存在时返回 None"""
+        if len(key) != 40 or not all(c in '0123456789abcdef' for c in key):
+            return None
+        for fmt in [self.fmt] + [fmt for fmt in EXTENSIONS if fmt != self.fmt]:
+            path = self._path(key, thumb, fmt)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _encode(self, image):
+        buffer = io.BytesIO()
+        if self.fmt == "jpeg":
+            image = image.convert("RGB")
+        options = {"quality": self.quality}
+        if self.fmt == "webp":
+            options["method"] = 4
+        elif self.fmt == "jpeg":
+            options.update(optimize=True, progressive=True)
+        image.save(buffer, FORMATS[self.fmt][0], **options)
+        return buffer.getvalue()
+
+    def encode(self, png):
+        """把 PNG 截图转为 (整页图, 缩略图)，没有 Pillow 时返回 (png, None)"""
+        if Image is None or self.fmt == "png" and not self.thumb_width:
+            return png, None
+        with Image.open(io.BytesIO(png)) as image:
+            image.load()
+            if self.fmt == "webp" and image.height > WEBP_MAX_SIZE:
+                image = image.crop((0, 0, image.width, WEBP_MAX_SIZE))
+            full = png if self.fmt == "png" else self._encode(image)
+            thumb = None
+            if self.thumb_width:
+                # 缩略图取页面顶部一屏的比例（宽:高 = 4:3）
+                top = image.crop((0, 0, image.width, min(image.height, image.width * 3 // 4)))
+                top.thumbnail((self.thumb_width, self.thumb_width))
+                thumb = self._encode(top)
+        return full, thumb
+
+    def save(self, url, png):
+        """保存截图，返回 {"key", "png_bytes", "bytes", "thumb_bytes"}"""
+        key = url_key(url)
+        full, thumb = self.encode(png)
+        os.makedirs(os.path.join(self.root, key[:2]), exist_ok=True)
+        # 删除以其它格式保存的旧文件
+        for thumb_flag in (False, True):
+            old = self.find(key, thumb_flag)
+            if old and old != self._path(key, thumb_flag, self.fmt):
+                os.remove(old)
+        self._write(self._path(key, False, self.fmt), full)
+        if thumb is not None:
+            self._write(self._path(key, True, self.fmt), thumb)
+        return {"key": key, "png_bytes": len(png), "bytes": len(full), "thumb_bytes": len(thumb or b'')}
+
+    @staticmethod
+    def _write(path, data):
+        # 先写临时文件再替换，服务端不会读到写了一半的图片
+        tmp = path + ".tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def links(self, key, prefix="/api/snapshot/"):
+        """快照图片和缩略图的访问地址"""
+        links = {"key": key, "image": prefix + key}
+        if self.find(key, thumb=True):
+            links["thumbnail"] = f"{prefix}{key}?thumb=1"
+        return links
+
+    def exists(self, url):
+        return self.find(url_key(url)) is not None
+
+    def usage(self):
+        """磁盘占用：{"files", "bytes", "thumbs", "thumb_bytes"}"""
+        usage = {"files": 0, "bytes": 0, "thumbs": 0, "thumb_bytes": 0}
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if os.path.splitext(name)[1] not in MIMETYPES:
+                    # 跳过临时文件和截图记录表（manifest.db）
+                    continue
+                size = os.path.getsize(os.path.join(directory, name))
+                if ".thumb." in name:
+                    usage["thumbs"] += 1
+                    usage["thumb_bytes"] += size
+                else:
+                    usage["files"] += 1
+                    usage["bytes"] += size
+        return usage
+
+
+def mimetype(path):
+    return MIMETYPES.get(os.path.splitext(path)[1], "application/octet-stream")
@@ -0,0 +1,305 @@
+"""
+Async crawler for news.nankai.edu.cn
+基于 asyncio + aiohttp 的并发新闻爬虫：有界协程池、按主机限制并发和速率、长连接复用、超时与重试
+
+用法:
+    python async_crawler.py <起始列表页> [--max-pages 10] [--concurrency 16]   # 只测量吞吐，不保存结果
+    python async_crawler.py --fixture 20      # 抓取进程内的本地测试站点，用于测量 pages/sec
+保存结果请使用 nankai_news.py --mode async
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import logging
+import argparse
+from functools import partial
+from collections import OrderedDict
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from config import Config
+from nankai_news import parse_news_links, related_links, get_next_page_url
+from parse_pool import ParsePool, parse_page
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+# 可重试的 HTTP 状态码
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class HostLimiter:
+    """单个主机的并发上限和最小请求间隔（rate 为每秒请求数，0 表示不限）"""
+
+    def __init__(self, concurrency, rate):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class AsyncCrawler:
+    """列表页按顺序翻页，文章链接放入有界队列，由 concurrency 个工作协程并发抓取和解析"""
+
+    def __init__(self, concurrency=None, per_host=None, rate=None, timeout=None, max_retries=None,
+                 queue_size=None, parse_executor=None, frontier=None, skip_seen=False):
+        self.concurrency = concurrency or Config.CRAWL_CONCURRENCY
+        self.per_host = per_host or Config.CRAWL_PER_HOST
+        self.rate = Config.CRAWL_RATE if rate is None else rate
+        self.timeout = timeout or Config.CRAWL_TIMEOUT
+        self.max_retries = Config.CRAWL_MAX_RETRIES if max_retries is None else max_retries
+        self.queue_size = queue_size or self.concurrency * 4
+        # 解析在线程池（默认）或传入的执行器（如 ParsePool 的进程池）中进行，避免阻塞事件循环
+        self.parse_executor = parse_executor
+        # 抓取记录（frontier.CrawlFrontier）：条件请求、跳过未变化页面、断点续爬
+        self.frontier = frontier
+        self.skip_seen = skip_seen
+        # 输出（handle_record 写入 sink，攒满一批时同步写 MySQL/ES）和抓取记录的读写（提交前会刷出 sink）
+        # 都是阻塞调用，在一个单独的线程中按顺序执行，不阻塞事件循环，sink 也只会被一个线程访问
+        self._output = None
+        self._pages = OrderedDict()
+        self._checkpoint_name = None
+        self._limiters = {}
+        self.stats = {"list_pages": 0, "articles": 0, "errors": 0, "retries": 0, "bytes": 0}
+
+    async def _io(self, func, *args):
+        """在输出线程中执行阻塞调用"""
+        return await asyncio.get_running_loop().run_in_executor(self._output, partial(func, *args))
+
+    def _limiter(self, url):
+        host = urlparse(url).netloc
+        if host not in self._limiters:
+            self._limiters[host] = HostLimiter(self.per_host, self.rate)
+        return self._limiters[host]
+
+    async def fetch(self, session, url, headers=None):
+        """GET 页面，返回 (状态码, 内容, 响应头)，304 也视为成功；可重试的错误按指数退避重试，最终失败返回 None"""
+        limiter = self._limiter(url)
+        for attempt in range(self.max_retries + 1):
+            async with limiter.semaphore:
+                await limiter.wait()
+                try:
+                    async with session.get(url, headers=headers) as response:
+                        body = await response.read()
+                        if response.status in (200, 304):
+                            self.stats["bytes"] += len(body)
+                            return response.status, body, response.headers
+                        if response.status not in RETRY_STATUSES:
+                            logging.warning(f"抓取失败 HTTP {response.status}: {url}")
+                            break
+                        reason = f"HTTP {response.status}"
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    reason = repr(e)
+            if attempt < self.max_retries:
+                self.stats["retries"] += 1
+                logging.info(f"重试 {url} ({reason})")
+                await asyncio.sleep(min(2 ** attempt, 30) * (0.5 + random.random() / 2))
+        self.stats["errors"] += 1
+        return None
+
+    async def _article(self, session, url, page_links, handle_record):
+        """抓取一篇文章；未变化（304 或内容哈希相同）时不解析也不输出"""
+        headers = None
+        if self.frontier:
+            if self.skip_seen and await self._io(self.frontier.seen, url):
+                await self._io(self.frontier.skip, url)
+                return
+            headers = await self._io(self.frontier.conditional_headers, url)
+        result = await self.fetch(session, url, headers)
+        if result is None:
+            return
+        status, body, response_headers = result
+        if self.frontier:
+            if status == 304:
+                await self._io(self.frontier.not_modified, url)
+                return
+            if not await self._io(self.frontier.changed, url, body):
+                return
+        loop = asyncio.get_running_loop()
+        # 解码也在执行器中完成，进程池模式下事件循环只负责网络 I/O
+        record = await loop.run_in_executor(self.parse_executor, parse_page, body, url, page_links)
+        self.stats["articles"] += 1
+        await self._io(self._store, handle_record, record, url, body, response_headers)
+
+    def _store(self, handle_record, record, url, body, headers):
+        """（输出线程）记录交给 sink 之后才写抓取记录；提交前 frontier 会先刷出 sink（before_commit）"""
+        handle_record(record)
+        if self.frontier:
+            self.frontier.record(url, body, headers)
+
+    async def _worker(self, session, queue, handle_record):
+        while True:
+            item = await queue.get()
+            try:
+                if item is None:
+                    return
+                url, page_links, page_url = item
+                try:
+                    await self._article(session, url, page_links, handle_record)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    logging.error(f"处理 {url} 失败: {e}")
+                # 被取消（中断）的文章不计为完成，断点不会越过它
+                await self._article_done(page_url)
+            finally:
+                queue.task_done()
+
+    async def _article_done(self, page_url):
+        """某个列表页的文章全部处理完且之前的列表页也都完成时，把断点推进到它的下一页"""
+        self._pages[page_url][0] -= 1
+        await self._advance_checkpoint()
+
+    async def _advance_checkpoint(self):
+        checkpoint = None
+        while self._pages:
+            page_url, (remaining, next_url, listed) = next(iter(self._pages.items()))
+            if remaining > 0 or not listed:
+                break
+            self._pages.popitem(last=False)
+            checkpoint = next_url
+        if checkpoint is not None and self.frontier and self._checkpoint_name:
+            # 输出线程按提交顺序执行，断点写入排在之前文章的记录之后
+            await self._io(self.frontier.set_checkpoint, self._checkpoint_name, checkpoint)
+
+    async def crawl(self, start_url, handle_record, max_pages=None):
+        """从 start_url 开始抓取，每篇文章的记录（与 get_news_content 相同的 dict）交给 handle_record
+
+        返回抓取统计，包括 pages_per_sec
+        """
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._output = ThreadPoolExecutor(max_workers=1)
+        if self.frontier:
+            # 断点按起始页区分，存在时从断点继续
+            self._checkpoint_name = f"news:{start_url}"
+            resume_url = await self._io(self.frontier.get_checkpoint, self._checkpoint_name)
+            if resume_url:
+                print(f"从断点继续: {resume_url}")
+                start_url = resume_url
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency, limit_per_host=self.per_host,
+            keepalive_timeout=30, ttl_dns_cache=300
+        )
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        start = time.perf_counter()
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         headers={'User-Agent': USER_AGENT}) as session:
+            workers = [
+                asyncio.create_task(self._worker(session, queue, handle_record))
+                for _ in range(self.concurrency)
+            ]
+            try:
+                page_url = start_url
+                pages = 0
+                while page_url and (max_pages is None or pages < max_pages):
+                    result = await self.fetch(session, page_url)
+                    pages += 1
+                    next_url = get_next_page_url(page_url)
+                    # [待处理文章数, 下一页, 链接是否已全部入队]
+                    self._pages[page_url] = [0, next_url, False]
+                    if result is not None:
+                        self.stats["list_pages"] += 1
+                        news_links = parse_news_links(result[1].decode('utf-8', errors='replace'), page_url)
+                        for link in news_links:
+                            self._pages[page_url][0] += 1
+                            # 队列满时在这里等待，列表页不会领先文章抓取太多
+                            await queue.put((link, related_links(news_links), page_url))
+                    self._pages[page_url][2] = True
+                    await self._advance_checkpoint()
+                    page_url = next_url
+
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
+                # 正常结束（包括达到 max_pages）时清除断点，只有异常中断才从断点继续
+                if self.frontier and self._checkpoint_name:
+                    await self._io(self.frontier.set_checkpoint, self._checkpoint_name, None)
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                # 等待已提交到输出线程的写入完成
+                await asyncio.get_running_loop().run_in_executor(None, self._output.shutdown)
+
+        elapsed = time.perf_counter() - start
+        pages = self.stats["list_pages"] + self.stats["articles"]
+        return {
+            **self.stats,
+            "elapsed": elapsed,
+            "pages_per_sec": pages / elapsed if elapsed else 0.0,
+        }
+
+
+def print_stats(stats):
+    """打印抓取统计"""
+    print(f"✓ 列表页 {stats['list_pages']}，文章 {stats['articles']}，"
+          f"失败 {stats['errors']}，重试 {stats['retries']}，下载 {stats['bytes'] / 1024 / 1024:.1f} MB")
+    print(f"✓ 耗时 {stats['elapsed']:.1f}s，{stats['pages_per_sec']:.1f} pages/sec")
+
+
+async def crawl_fixture(list_pages, per_page, latency, failure_rate, paragraphs=8, **kwargs):
+    """启动本地测试站点并抓取，返回统计"""
+    from fixture_server import start_fixture_server
+
+    runner, start_url = await start_fixture_server(
+        list_pages=list_pages, per_page=per_page, latency=latency, failure_rate=failure_rate, paragraphs=paragraphs
+    )
+    try:
+        return await AsyncCrawler(**kwargs).crawl(start_url, lambda record: None)
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="南开新闻网异步爬虫")
+    parser.add_argument('url', nargs='?', help="起始列表页")
+    parser.add_argument('--max-pages', type=int, help="最多抓取的列表页数")
+    parser.add_argument('--concurrency', type=int, default=Config.CRAWL_CONCURRENCY, help="并发抓取协程数")
+    parser.add_argument('--per-host', type=int, default=Config.CRAWL_PER_HOST, help="单个主机的最大并发连接数")
+    parser.add_argument('--rate', type=float, default=Config.CRAWL_RATE, help="单个主机每秒请求数，0 表示不限")
+    parser.add_argument('--parse-workers', type=int, default=Config.CRAWL_PARSE_WORKERS,
+                        help="解析/分词进程数，0 表示使用线程池")
+    parser.add_argument('--fixture', type=int, metavar='PAGES', help="抓取进程内的本地测试站点（列表页数）")
+    parser.add_argument('--per-page', type=int, default=20, help="测试站点每个列表页的文章数")
+    parser.add_argument('--latency', type=float, default=0.05, help="测试站点每个请求的模拟延迟(秒)")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="测试站点随机返回 503 的比例")
+    parser.add_argument('--paragraphs', type=int, default=8, help="测试站点每篇文章的段落数（调节解析开销）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    if not args.fixture and not args.url:
+        parser.error("需要指定起始列表页或 --fixture")
+
+    with ParsePool(args.parse_workers) as parse_pool:
+        parse_pool.warm_up()
+        kwargs = dict(concurrency=args.concurrency, per_host=args.per_host, rate=args.rate,
+                      parse_executor=parse_pool.executor)
+        if args.fixture:
+            stats = asyncio.run(crawl_fixture(
+                args.fixture, args.per_page, args.latency, args.failure_rate, args.paragraphs, **kwargs
+            ))
+            expected = args.fixture * args.per_page
+            print(f"{'✓' if stats['articles'] == expected else '✗'} 抓取文章 {stats['articles']}/{expected}")
+        else:
+            stats = asyncio.run(AsyncCrawler(**kwargs).crawl(args.url, lambda record: None, max_pages=args.max_pages))
+    print_stats(stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+"""
+Pipelined document ingester
+文档抓取流水线：下载线程池（按主机限制并发和请求间隔）→ 文本提取进程（单个文件超时后终止并重启）→ 批量索引线程，
+各阶段之间是有界队列，统计每个阶段的耗时、吞吐和队列深度
+
+用法（见 docment.py）:
+    pipeline = DocumentPipeline(download, extract, index_batch, on_failed=cleanup)
+    pipeline.submit(url)
+    pipeline.mark(next_page_url)   # 之前提交的文档全部处理完后回调 on_checkpoint
+    stats = pipeline.close()
+"""
+
+import time
+import queue
+import logging
+import threading
+import multiprocessing
+from functools import partial
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+class HostThrottle:
+    """按主机限制并发数和请求间隔（rate 为每秒请求数，0 表示不限），替代全局 sleep"""
+
+    def __init__(self, per_host=2, rate=2.0):
+        self.per_host = per_host
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = [threading.Semaphore(self.per_host), 0.0]
+            return self._hosts[host]
+
+    @contextmanager
+    def slot(self, url):
+        state = self._host(url)
+        with state[0]:
+            if self.interval:
+                with self._lock:
+                    now = time.monotonic()
+                    delay = state[1] - now
+                    state[1] = max(now, state[1]) + self.interval
+                if delay > 0:
+                    time.sleep(delay)
+            yield
+
+
+class StageMetrics:
+    """单个阶段的处理数、累计耗时和队列深度"""
+
+    def __init__(self, name):
+        self.name = name
+        self.ok = 0
+        self.failed = 0
+        self.skipped = 0
+        self.busy = 0.0
+        self.depth = 0
+        self.max_depth = 0
+        self._depth_sum = 0
+        self._samples = 0
+        self._lock = threading.Lock()
+
+    def enqueue(self):
+        with self._lock:
+            self.depth += 1
+            self.max_depth = max(self.max_depth, self.depth)
+            self._depth_sum += self.depth
+            self._samples += 1
+
+    def dequeue(self):
+        with self._lock:
+            self.depth -= 1
+
+    def record(self, seconds, ok=True):
+        """ok 为 None 表示跳过（如文件未变化）"""
+        with self._lock:
+            self.busy += seconds
+            if ok is None:
+                self.skipped += 1
+            elif ok:
+                self.ok += 1
+            else:
+                self.failed += 1
+
+    def report(self, elapsed):
+        done = self.ok + self.failed + self.skipped
+        return {
+            "ok": self.ok,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "busy_sec": round(self.busy, 2),
+            "avg_ms": round(self.busy / done * 1000, 1) if done else 0.0,
+            "per_sec": round(done / elapsed, 2) if elapsed else 0.0,
+            "max_queue": self.max_depth,
+            "avg_queue": round(self._depth_sum / self._samples, 1) if self._samples else 0.0,
+        }
+
+
+def _extract_worker(conn, extract):
+    """提取进程：逐个接收文件路径，回传 (是否成功, 结果或错误信息)，收到 None 或管道关闭时退出"""
+    while True:
+        try:
+            path = conn.recv()
+        except EOFError:
+            return
+        if path is None:
+            return
+        try:
+            conn.send((True, extract(path)))
+        except Exception as e:
+            conn.send((False, f"{type(e).__name__}: {e}"))
+
+
+def _raise(error):
+    raise error
+
+
+class ExtractorPool:
+    """固定数量的提取进程，每个进程由一个监督线程派发任务
+
+    ProcessPoolExecutor 无法终止单个任务，卡在某个文件上的进程会一直占用工作进程；
+    这里单个文件超过 timeout 秒没有返回（或进程崩溃）时终止该进程并启动新进程，结果为 TimeoutError
+    """
+
+    def __init__(self, extract, workers=2, timeout=None):
+        self.extract = extract
+        self.timeout = timeout
+        self.restarts = 0
+        self._lock = threading.Lock()
+        self._tasks = queue.Queue()
+        self._threads = [threading.Thread(target=self._supervise, daemon=True) for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, path, callback):
+        """提交一个文件，完成后在监督线程中调用 callback(result)，result() 返回提取结果或抛出异常"""
+        self._tasks.put((path, callback))
+
+    def _spawn(self):
+        conn, child = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=_extract_worker, args=(child, self.extract), daemon=True)
+        process.start()
+        child.close()
+        return process, conn
+
+    def _supervise(self):
+        process, conn = self._spawn()
+        try:
+            while True:
+                task = self._tasks.get()
+                if task is None:
+                    return
+                path, callback = task
+                try:
+                    conn.send(path)
+                    if not conn.poll(self.timeout):
+                        raise TimeoutError(f"提取超过 {self.timeout}s，已终止提取进程")
+                    ok, value = conn.recv()
+                    result = (lambda value=value: value) if ok else partial(_raise, RuntimeError(value))
+                except (TimeoutError, EOFError, OSError) as e:
+                    # 超时或进程崩溃：换一个新进程继续处理后面的文件
+                    process.kill()
+                    process.join()
+                    conn.close()
+                    if not isinstance(e, TimeoutError):
+                        e = RuntimeError(f"提取进程异常退出 (exitcode {process.exitcode})")
+                    result = partial(_raise, e)
+                    with self._lock:
+                        self.restarts += 1
+                    process, conn = self._spawn()
+                callback(result)
+        finally:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            process.join(timeout=5)
+            if process.is_alive():
+                process.kill()
+            conn.close()
+
+    def shutdown(self):
+        """等待已提交的文件全部处理完，结束提取进程"""
+        for _ in self._threads:
+            self._tasks.put(None)
+        for thread in self._threads:
+            thread.join()
+
+
+class DocumentPipeline:
+    """三阶段文档流水线
+
+    download(url) -> 本地路径或 None（下载失败或文件未变化；在下载线程中调用，已持有主机限流槽位）
+    extract(path) -> 提取结果或 None（在提取进程中调用，必须可以 pickle；超过 extract_timeout 秒的文件按失败处理）
+    index_batch([(url, path, content)]) -> 失败的 url 集合（在索引线程中按批调用）
+    on_indexed(url, path)：文档索引成功后调用（写入抓取记录等），在 on_checkpoint 之前
+    on_failed(url, path)：提取或索引失败后的清理（删除文件、删除抓取记录等）
+    on_checkpoint(value)：mark() 之前提交的文档全部完成后调用
+    """
+
+    def __init__(self, download, extract, index_batch, on_indexed=None, on_failed=None, on_checkpoint=None,
+                 download_workers=4, extract_workers=2, batch_size=50, queue_size=32,
+                 throttle=None, flush_interval=2.0, extract_timeout=None):
+        self.download = download
+        self.extract = extract
+        self.index_batch = index_batch
+        self.on_indexed = on_indexed
+        self.on_failed = on_failed
+        self.on_checkpoint = on_checkpoint
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.throttle = throttle or HostThrottle()
+        self.metrics = {name: StageMetrics(name) for name in ("download", "extract", "index")}
+
+        self._download_queue = queue.Queue(maxsize=queue_size)
+        self._index_queue = queue.Queue()
+        # 限制等待提取的文档数，下载线程在此等待，内存占用有上界
+        self._extract_slots = threading.Semaphore(queue_size)
+        # extract_workers 为 0 时在下载线程中提取，不受 extract_timeout 限制
+        self._extractor = ExtractorPool(extract, extract_workers, extract_timeout) if extract_workers > 0 else None
+
+        # 断点：文档按提交顺序编号，编号小于 low 的文档都已完成
+        self._lock = threading.Lock()
+        self._next_seq = 0
+        self._low = 0
+        self._done = set()
+        self._marks = []
+
+        self._start = time.perf_counter()
+        self._downloaders = [
+            threading.Thread(target=self._download_loop, daemon=True) for _ in range(download_workers)
+        ]
+        self._indexer = threading.Thread(target=self._index_loop, daemon=True)
+        for thread in self._downloaders + [self._indexer]:
+            thread.start()
+
+    # ---- 提交 ----
+
+    def submit(self, url):
+        """提交一个文档下载地址，下载队列满时阻塞"""
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+        self.metrics["download"].enqueue()
+        self._download_queue.put((seq, url))
+
+    def mark(self, value):
+        """之前提交的文档全部完成后以 value 调用 on_checkpoint"""
+        with self._lock:
+            self._marks.append((self._next_seq, value))
+        self._advance_checkpoint()
+
+    # ---- 阶段 ----
+
+    def _download_loop(self):
+        while True:
+            item = self._download_queue.get()
+            if item is None:
+                return
+            seq, url = item
+            self.metrics["download"].dequeue()
+            start = time.perf_counter()
+            try:
+                with self.throttle.slot(url):
+                    path = self.download(url)
+            except Exception as e:
+                logging.error(f"下载失败 {url}: {e}")
+                path = None
+            self.metrics["download"].record(time.perf_counter() - start, ok=True if path else None)
+            if path is None:
+                # 下载失败或文件未变化
+                self._finish(seq)
+                continue
+            self._extract_slots.acquire()
+            self.metrics["extract"].enqueue()
+            submitted = time.perf_counter()
+            if self._extractor is None:
+                self._extracted(seq, url, path, submitted, lambda: self.extract(path))
+                continue
+            self._extractor.submit(path, partial(self._extracted, seq, url, path, submitted))
+
+    def _extracted(self, seq, url, path, submitted, result):
+        self._extract_slots.release()
+        self.metrics["extract"].dequeue()
+        try:
+            content = result()
+        except Exception as e:
+            logging.error(f"内容提取失败 {path}: {e}")
+            content = None
+        # 提取进程中的耗时包含排队时间，单个文档的提取耗时以提交到完成计
+        self.metrics["extract"].record(time.perf_counter() - submitted, ok=bool(content))
+        if not content:
+            self._failed(seq, url, path)
+            return
+        self.metrics["index"].enqueue()
+        self._index_queue.put((seq, url, path, content))
+
+    def _index_loop(self):
+        batch = []
+        stopping = False
+        while not stopping or batch:
+            try:
+                item = self._index_queue.get(timeout=self.flush_interval) if not stopping else None
+            except queue.Empty:
+                item = False
+            if item is None:
+                stopping = True
+            elif item:
+                self.metrics["index"].dequeue()
+                batch.append(item)
+            # 攒够一批、空闲超过 flush_interval 或即将结束时写入
+            if batch and (len(batch) >= self.batch_size or item is False or stopping):
+                self._flush(batch)
+                batch = []
+
+    def _flush(self, batch):
+        start = time.perf_counter()
+        try:
+            failed = self.index_batch([(url, path, content) for _, url, path, content in batch])
+        except Exception as e:
+            logging.error(f"批量索引失败 ({len(batch)} 个文档): {e}")
+            failed = {url for _, url, _, _ in batch}
+        # 批量耗时平均分摊到批内每个文档
+        share = (time.perf_counter() - start) / len(batch)
+        for seq, url, path, _ in batch:
+            if url in failed:
+                self.metrics["index"].record(share, ok=False)
+                self._failed(seq, url, path)
+            else:
+                self.metrics["index"].record(share)
+                self._indexed(seq, url, path)
+
+    # ---- 完成与断点 ----
+
+    def _indexed(self, seq, url, path):
+        if self.on_indexed:
+            try:
+                self.on_indexed(url, path)
+            except Exception as e:
+                logging.error(f"索引完成回调失败 {url}: {e}")
+        self._finish(seq)
+
+    def _failed(self, seq, url, path):
+        if self.on_failed:
+            try:
+                self.on_failed(url, path)
+            except Exception as e:
+                logging.error(f"清理失败 {url}: {e}")
+        self._finish(seq)
+
+    def _finish(self, seq):
+        with self._lock:
+            self._done.add(seq)
+            while self._low in self._done:
+                self._done.discard(self._low)
+                self._low += 1
+        self._advance_checkpoint()
+
+    def _advance_checkpoint(self):
+        value = None
+        reached = False
+        with self._lock:
+            while self._marks and self._marks[0][0] <= self._low:
+                value = self._marks.pop(0)[1]
+                reached = True
+        if reached and self.on_checkpoint:
+            self.on_checkpoint(value)
+
+    # ---- 结束 ----
+
+    def close(self):
+        """等待所有文档处理完毕，返回各阶段统计"""
+        for _ in self._downloaders:
+            self._download_queue.put(None)
+        for thread in self._downloaders:
+            thread.join()
+        if self._extractor is not None:
+            # 等待提取完成（完成回调会把结果放入索引队列）
+            self._extractor.shutdown()
+        self._index_queue.put(None)
+        self._indexer.join()
+        return self.stats()
+
+    def stats(self):
+        elapsed = time.perf_counter() - self._start
+        return {
+            "elapsed": round(elapsed, 2),
+            "documents": self._next_seq,
+            "extract_restarts": self._extractor.restarts if self._extractor is not None else 0,
+            **{name: metric.report(elapsed) for name, metric in self.metrics.items()},
+        }
+
+
+def print_pipeline_stats(stats):
+    """打印各阶段统计"""
+    print(f"✓ 文档 {stats['documents']} 个，耗时 {stats['elapsed']}s")
+    for name in ("download", "extract", "index"):
+        stage = stats[name]
+        print(f"  {name:<8} 成功 {stage['ok']:>5}  失败 {stage['failed']:>4}  跳过 {stage['skipped']:>4}  "
+              f"平均 {stage['avg_ms']:>8.1f} ms  {stage['per_sec']:>6.2f}/s  "
+              f"队列 最大 {stage['max_queue']} 平均 {stage['avg_queue']}")
+    if stats['extract_restarts']:
+        print(f"⚠ 提取超时或崩溃，重启提取进程 {stats['extract_restarts']} 次")
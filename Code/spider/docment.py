@@ -1,13 +1,26 @@
 import os
+import sys
+import json
+import hashlib
 import requests
 from bs4 import BeautifulSoup
 import re
 from urllib.parse import urljoin, urlparse
 import time
-from elasticsearch import Elasticsearch
-from docx import Document
+import zipfile
+import argparse
+from functools import partial
+from xml.etree import ElementTree
+from elasticsearch import Elasticsearch, helpers
+from openpyxl import load_workbook
 import fitz  # PyMuPDF
-import pandas as pd
+import xlrd
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from elasticsearch_config import DOCUMENTS_INDEX_SETTINGS, DOCUMENTS_INDEX_MAPPINGS, DOCUMENT_CHUNK_PROPERTIES
+from doc_pipeline import DocumentPipeline, HostThrottle, print_pipeline_stats
 
 # 配置
 DOWNLOAD_FOLDER = r"D:\searcher\lab4\Code\document"
@@ -21,130 +34,515 @@ es = Elasticsearch(
     meta_header=False,
 )
 index_name = "documents_index"
+# 抓取记录（ETag/Last-Modified、内容哈希、断点），见 frontier.py
+FRONTIER_DB = "crawl_frontier.db"
+# 流水线：并发下载数、单个主机的并发数和每秒请求数、提取进程数、每批索引的文档数
+DOWNLOAD_WORKERS = 4
+PER_HOST = 2
+HOST_RATE = 2.0
+EXTRACT_WORKERS = 2
+INDEX_BATCH_SIZE = 50
+# 文本提取上限：超过大小的文件不处理，超过页数/行数/字符数或耗时的部分截断
+MAX_FILE_MB = 200
+MAX_PAGES = 2000
+MAX_ROWS = 200000
+MAX_TEXT_CHARS = 5000000
+EXTRACT_TIMEOUT = 120
+# 超过 EXTRACT_TIMEOUT 后仍卡在单页/单行解析中的文件，再等这么久就终止提取进程
+EXTRACT_KILL_GRACE = 30
+
+# DOCX 正文 XML 中的标签
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+W_P, W_T, W_TAB, W_BR, W_CR = (W_NS + tag for tag in ("p", "t", "tab", "br", "cr"))
+
+
+# 文档按页/段落切分成不超过 CHUNK_CHARS 个字符的段落块，每块是一条索引记录（映射见 elasticsearch_config.py）
+CHUNK_CHARS = 2000
 
 
 def setup_index():
-    """创建Elasticsearch索引（如果不存在）"""
+    """创建Elasticsearch索引（如果不存在），已有索引补充段落块字段的映射"""
     if not es.indices.exists(index=index_name):
-        mapping = {
-            "mappings": {
-                "properties": {
-                    "file_name": {"type": "keyword"},
-                    "content": {"type": "text", "analyzer": "ik_max_word"},
-                    "file_path": {"type": "keyword"},
-                    "download_url": {"type": "keyword"},
-                    "timestamp": {"type": "date"}
-                }
-            }
-        }
-        es.indices.create(index=index_name, body=mapping)
+        es.indices.create(index=index_name, settings=DOCUMENTS_INDEX_SETTINGS, mappings=DOCUMENTS_INDEX_MAPPINGS)
+    else:
+        es.indices.put_mapping(index=index_name, properties=DOCUMENT_CHUNK_PROPERTIES)
 
 
-def download_file(url, save_path):
-    """下载文件并保存到指定路径"""
+def head_unchanged(url, page, headers):
+    """已抓取过的文件先发 HEAD：ETag 或 Last-Modified + Content-Length 与记录一致时视为未变化
+
+    用于不支持条件 GET 的服务器，避免完整下载
+    """
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'Referer': urlparse(url).netloc
-        }
+        r = requests.head(url, headers=headers, timeout=30, allow_redirects=True)
+    except requests.RequestException:
+        return False
+    if r.status_code == 304:
+        return True
+    if r.status_code != 200:
+        return False
+    if page['etag'] and r.headers.get('ETag') == page['etag']:
+        return True
+    length = r.headers.get('Content-Length')
+    if length is not None:
+        try:
+            if int(length) != page['size']:
+                return False
+        except ValueError:
+            # 无法解析的 Content-Length 不能证明未变化，继续发送条件 GET
+            return False
+    return bool(page['last_modified']) and r.headers.get('Last-Modified') == page['last_modified']
+
+
+def content_path(digest, filename):
+    """按内容寻址的存储路径：DOWNLOAD_FOLDER/<哈希前两位>/<哈希>/<原文件名>"""
+    return os.path.join(DOWNLOAD_FOLDER, digest[:2], digest, filename)
+
+
+def download_file(url, frontier=None, pending=None):
+    """下载文件，按 sha256 存入内容寻址目录，返回存储路径
+
+    传入 frontier 时：
+    - 已抓取过的文件先发 HEAD 再发条件 GET，未变化（304、HEAD 校验一致或内容哈希相同）时返回 None
+    - 相同内容已由其它地址下载并索引时只记录对应关系，返回 None，不再提取和索引
+    - 需要提取和索引的文件只比较不写入抓取记录，校验信息放入 pending[url]，索引成功后由 record_document 写入，
+      中断后这些文件下次会重新下载
+    """
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+        'Referer': urlparse(url).netloc
+    }
+    tmp_path = None
+    try:
+        page = frontier.get(url) if frontier else None
+        if page and page['content_hash']:
+            if head_unchanged(url, page, headers):
+                frontier.not_modified(url, head=True)
+                print(f"未修改 (HEAD)，跳过: {url}")
+                return None
+            headers.update(frontier.conditional_headers(url))
 
         with requests.get(url, headers=headers, stream=True, timeout=30) as r:
+            if r.status_code == 304:
+                frontier.not_modified(url)
+                print(f"未修改，跳过: {url}")
+                return None
             r.raise_for_status()
             # 从Content-Disposition或URL中获取真实文件名
-            filename = re.findall('filename="?(.+)"?',
+            filename = re.findall('filename="?([^";]+)"?',
                                   r.headers.get('Content-Disposition', ''))[0] \
-                if 'Content-Disposition' in r.headers \
+                if 'filename' in r.headers.get('Content-Disposition', '') \
                 else os.path.basename(urlparse(url).path)
 
-            final_path = os.path.join(os.path.dirname(save_path), filename)
-
-            with open(final_path, 'wb') as f:
+            # 先写入临时文件，哈希算完后再移动到内容寻址目录
+            tmp_path = os.path.join(DOWNLOAD_FOLDER, f".{hashlib.sha1(url.encode('utf-8')).hexdigest()}.part")
+            digest = hashlib.sha256()
+            size = 0
+            with open(tmp_path, 'wb') as f:
                 for chunk in r.iter_content(chunk_size=8192):
                     if chunk:
                         f.write(chunk)
-
-            print(f"下载成功: {filename}")
-            return final_path  # 返回实际存储路径
+                        digest.update(chunk)
+                        size += len(chunk)
+            digest = digest.hexdigest()
+
+            if frontier and not frontier.changed(url, digest=digest):
+                print(f"内容未变化，跳过: {filename}")
+                return None
+            validators = {name: r.headers[name] for name in ('ETag', 'Last-Modified') if name in r.headers}
+
+        final_path = content_path(digest, filename)
+        if frontier:
+            doc_id = hashlib.sha1(url.encode('utf-8')).hexdigest()
+            if page and page['content_hash'] and page['content_hash'] != digest:
+                # 同一地址的内容变化：旧内容转给仍在使用它的重复地址，没有重复地址时删除旧文件
+                for old_path in frontier.release_doc_contents(doc_id):
+                    if os.path.exists(old_path):
+                        os.remove(old_path)
+            # 同一内容只由第一个地址提取和索引，其它地址记为重复
+            owner = frontier.claim_content(digest, doc_id, url, final_path, size)
+            if owner is not None:
+                # 重复地址不再提取和索引，直接写入抓取记录
+                frontier.record(url, headers=validators, digest=digest, size=size)
+                print(f"内容重复，跳过: {url} (与 {owner['url']} 相同)")
+                return None
+            if pending is not None:
+                pending[url] = dict(headers=validators, digest=digest, size=size)
+            else:
+                frontier.record(url, headers=validators, digest=digest, size=size)
+
+        if os.path.exists(final_path):
+            # 相同内容的文件已存在，不再重复存储
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+        tmp_path = None
+        print(f"下载成功: {filename}")
+        return final_path  # 返回实际存储路径
 
     except Exception as e:
         print(f"下载失败 {url} | 错误: {str(e)[:200]}")
         return None
-
-
-def extract_content(file_path):
-    """提取文档内容"""
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def iter_docx(file_path):
+    """逐段落读取 DOCX：流式解析 word/document.xml，不构建完整文档树（表格中的段落也会读出）"""
+    with zipfile.ZipFile(file_path) as archive, archive.open('word/document.xml') as xml:
+        # 文本框里的段落嵌套在外层段落中，各自收集文本
+        paragraphs = []
+        for event, elem in ElementTree.iterparse(xml, events=('start', 'end')):
+            if elem.tag == W_P:
+                if event == 'start':
+                    paragraphs.append([])
+                    continue
+                text = ''.join(paragraphs.pop())
+                elem.clear()
+                yield None, text
+            elif event == 'end' and paragraphs:
+                if elem.tag == W_T:
+                    paragraphs[-1].append(elem.text or '')
+                elif elem.tag == W_TAB:
+                    paragraphs[-1].append('\t')
+                elif elem.tag in (W_BR, W_CR):
+                    paragraphs[-1].append('\n')
+
+
+def iter_pdf(file_path, max_pages=MAX_PAGES):
+    """逐页读取 PDF，超过 max_pages 的页不再读取"""
+    with fitz.open(file_path) as pdf:
+        for number, page in enumerate(pdf, 1):
+            if number > max_pages:
+                print(f"⚠ 超过 {max_pages} 页，已截断: {file_path}")
+                return
+            yield number, page.get_text()
+
+
+def iter_xlsx(file_path, max_rows=MAX_ROWS):
+    """只读模式逐行读取 XLSX 所有工作表，单元格以制表符分隔，超过 max_rows 的行不再读取"""
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = 0
+        for sheet in workbook.worksheets:
+            for row in sheet.iter_rows(values_only=True):
+                cells = [str(value) for value in row if value is not None]
+                if not cells:
+                    continue
+                rows += 1
+                if rows > max_rows:
+                    print(f"⚠ 超过 {max_rows} 行，已截断: {file_path}")
+                    return
+                yield None, '\t'.join(cells)
+    finally:
+        workbook.close()
+
+
+def iter_xls(file_path, max_rows=MAX_ROWS):
+    """旧版 XLS 用 xlrd 按需加载工作表，逐行读取所有工作表，读完的工作表立即释放，超过 max_rows 的行不再读取"""
+    workbook = xlrd.open_workbook(file_path, on_demand=True)
+    try:
+        rows = 0
+        for index in range(workbook.nsheets):
+            sheet = workbook.sheet_by_index(index)
+            for number in range(sheet.nrows):
+                cells = [str(value) for value in sheet.row_values(number) if value not in ('', None)]
+                if not cells:
+                    continue
+                rows += 1
+                if rows > max_rows:
+                    print(f"⚠ 超过 {max_rows} 行，已截断: {file_path}")
+                    return
+                yield None, '\t'.join(cells)
+            workbook.unload_sheet(index)
+    finally:
+        workbook.release_resources()
+
+
+def extract_units(file_path, max_pages=MAX_PAGES, max_rows=MAX_ROWS):
+    """按页（PDF）、段落（DOCX）或行（表格）逐个产出文本，返回 (页码或 None, 文本) 的迭代器"""
     extension = os.path.splitext(file_path)[1].lower()
-    content = ""
-
+    if extension == ".docx":
+        return iter_docx(file_path)
+    if extension == ".pdf":
+        return iter_pdf(file_path, max_pages)
+    if extension == ".xlsx":
+        return iter_xlsx(file_path, max_rows)
+    if extension == ".xls":
+        return iter_xls(file_path, max_rows)
+    raise ValueError(f"不支持的文件类型: {extension}")
+
+
+def split_passages(units, max_chars=CHUNK_CHARS):
+    """把连续的文本单元合并成不超过 max_chars 的段落块，逐块产出 {"page", "content"}
+
+    超长的单元（如一整页 PDF）在 max_chars 处切开，page 为块起始所在的页码
+    """
+    parts, size, start_page = [], 0, None
+    for page, text in units:
+        text = text.strip()
+        while text:
+            if size and size + len(text) + 1 > max_chars:
+                chunk = "\n".join(parts).strip()
+                if chunk:
+                    yield {"page": start_page, "content": chunk}
+                parts, size = [], 0
+            piece, text = text[:max_chars], text[max_chars:]
+            if not parts:
+                start_page = page
+            parts.append(piece)
+            size += len(piece) + 1
+    chunk = "\n".join(parts).strip()
+    if chunk:
+        yield {"page": start_page, "content": chunk}
+
+
+def iter_passages(file_path, max_pages=MAX_PAGES, max_rows=MAX_ROWS, max_chars=MAX_TEXT_CHARS,
+                  timeout=EXTRACT_TIMEOUT):
+    """边读取边切分，内存中只保留当前页/段落和当前块；总字符数或耗时超过上限时截断"""
+    deadline = time.monotonic() + timeout if timeout else None
+
+    def bounded_units():
+        total = 0
+        for page, text in extract_units(file_path, max_pages, max_rows):
+            if deadline is not None and time.monotonic() > deadline:
+                print(f"⚠ 提取超过 {timeout}s，已截断: {file_path}")
+                return
+            if total + len(text) > max_chars:
+                yield page, text[:max_chars - total]
+                print(f"⚠ 超过 {max_chars} 字符，已截断: {file_path}")
+                return
+            total += len(text)
+            yield page, text
+
+    return split_passages(bounded_units())
+
+
+def spool_path(file_path):
+    """段落块暂存文件（JSON Lines），与下载的文件放在同一目录"""
+    return file_path + ".passages.jsonl"
+
+
+def read_spool(spool):
+    """逐块读出暂存的段落块"""
+    with open(spool, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def extract_content(file_path, max_file_mb=MAX_FILE_MB, **limits):
+    """提取文档内容，段落块边切分边写入暂存文件，返回 (暂存文件路径, 块数)；失败或没有文本时返回 None
+
+    提取在子进程中进行，段落块不整体放在内存里、也不经进程间传递，索引时从暂存文件逐块读出（见 index_documents）
+    """
+    spool = spool_path(file_path)
+    count = 0
     try:
-        if extension == ".docx":
-            doc = Document(file_path)
-            content = "\n".join([para.text for para in doc.paragraphs])
-        elif extension == ".pdf":
-            pdf = fitz.open(file_path)
-            for page in pdf:
-                content += page.get_text() + "\n"
-            pdf.close()
-        elif extension in [".xls", ".xlsx"]:
-            df = pd.read_excel(file_path)
-            content = df.to_string(index=False)
-        else:
-            print(f"不支持的文件类型: {extension}")
+        size_mb = os.path.getsize(file_path) / 1024 / 1024
+        if max_file_mb and size_mb > max_file_mb:
+            print(f"⚠ 文件 {size_mb:.0f} MB 超过 {max_file_mb} MB，跳过: {file_path}")
             return None
-        return content.strip()
+        with open(spool, 'w', encoding='utf-8') as f:
+            for passage in iter_passages(file_path, **limits):
+                f.write(json.dumps(passage, ensure_ascii=False) + '\n')
+                count += 1
     except Exception as e:
         print(f"内容提取失败 {file_path}: {e}")
-        return None
+        count = 0
+    if count:
+        return spool, count
+    if os.path.exists(spool):
+        os.remove(spool)
+    return None
 
 
-def index_document(file_path, download_url):
-    """将单个文档索引到Elasticsearch"""
-    content = extract_content(file_path)
-    if not content:
-        return False
+def document_id(download_url):
+    """文件级 id：以下载地址的 sha1 作为 id，文件更新后重新索引会覆盖旧的段落块"""
+    return hashlib.sha1(download_url.encode('utf-8')).hexdigest()
+
+
+def chunk_ids(doc_id, count):
+    """文件各段落块的 id：<文件 id>-<序号>"""
+    return [f"{doc_id}-{number}" for number in range(count)]
+
 
-    doc = {
+def document_actions(file_path, download_url, chunks, count, timestamp=None):
+    """逐个构造一个文件所有段落块的 bulk 操作，chunks 可以是迭代器，count 为块数"""
+    doc_id = document_id(download_url)
+    metadata = {
+        "doc_id": doc_id,
         "file_name": os.path.basename(file_path),
-        "content": content,
         "file_path": file_path,
         "download_url": download_url,
-        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        "chunks": count,
+        "timestamp": timestamp or time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
     }
+    for number, chunk in enumerate(chunks):
+        yield {
+            "_index": index_name,
+            "_id": f"{doc_id}-{number}",
+            "_source": {**metadata, "chunk": number, "page": chunk["page"], "content": chunk["content"]}
+        }
+
 
+def delete_stale_chunks(doc_ids, keep_ids, legacy_ids=()):
+    """删除这些文件不再存在的段落块（文件变短后多出的块、切分前整篇索引的旧文档）"""
+    es.delete_by_query(index=index_name, query={
+        "bool": {
+            "should": [{"terms": {"doc_id": doc_ids}}, {"ids": {"values": doc_ids + list(legacy_ids)}}],
+            "minimum_should_match": 1,
+            "must_not": [{"ids": {"values": keep_ids}}]
+        }
+    }, conflicts="proceed")
+
+
+def index_documents(batch):
+    """批量索引 [(download_url, file_path, (暂存文件, 块数))]，返回失败的下载地址集合
+
+    段落块从暂存文件逐块读出交给 helpers.bulk，按请求分批发送，不整体读入内存；处理完删除暂存文件
+    """
+    urls = {document_id(url): url for url, _, _ in batch}
+    counts = {document_id(url): count for url, _, (_, count) in batch}
+    actions = (
+        action for url, path, (spool, count) in batch
+        for action in document_actions(path, url, read_spool(spool), count)
+    )
     try:
-        es.index(index=index_name, document=doc)
-        print(f"已索引: {file_path}")
-        return True
-    except Exception as e:
-        print(f"索引失败 {file_path}: {e}")
-        return False
+        success, errors = helpers.bulk(es, actions, raise_on_error=False, raise_on_exception=False)
+    finally:
+        for _, _, (spool, _) in batch:
+            if os.path.exists(spool):
+                os.remove(spool)
+    failed = set()
+    for error in errors:
+        result = next(iter(error.values()))
+        url = urls.get(result.get('_id', '').rsplit('-', 1)[0])
+        print(f"索引失败 {url}: {str(result.get('error'))[:200]}")
+        failed.add(url)
+    indexed = [doc_id for doc_id, url in urls.items() if url not in failed]
+    if indexed:
+        delete_stale_chunks(indexed, [chunk_id for doc_id in indexed for chunk_id in chunk_ids(doc_id, counts[doc_id])])
+        print(f"已索引 {len(indexed)} 个文档，{success} 个段落块")
+    return failed
+
+
+def rechunk_legacy_documents(batch_size=INDEX_BATCH_SIZE):
+    """把切分前整篇索引的文档改写为段落块（不重新下载，PDF 页码信息无法恢复），返回处理的文档数"""
+    setup_index()
+    legacy = helpers.scan(es, index=index_name, query={"query": {"bool": {"must_not": {"exists": {"field": "doc_id"}}}}})
+    count = 0
+    batch = []
+
+    def flush():
+        actions = [action for _, _, actions in batch for action in actions]
+        helpers.bulk(es, actions)
+        delete_stale_chunks([doc_id for doc_id, _, _ in batch], [action["_id"] for action in actions],
+                            legacy_ids=[hit_id for _, hit_id, _ in batch])
+        batch.clear()
+
+    for hit in legacy:
+        source = hit['_source']
+        chunks = list(split_passages([(None, source.get('content') or '')]))
+        if not chunks or not source.get('download_url'):
+            continue
+        actions = list(document_actions(source['file_path'], source['download_url'], chunks, len(chunks),
+                                        source.get('timestamp')))
+        batch.append((document_id(source['download_url']), hit['_id'], actions))
+        count += 1
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    es.indices.refresh(index=index_name)
+    return count
+
+
+def record_document(frontier, pending, download_url, file_path):
+    """文档索引成功后写入下载时暂存的抓取记录（ETag/Last-Modified、内容哈希）"""
+    validators = pending.pop(download_url, None)
+    if validators:
+        frontier.record(download_url, **validators)
+
+
+def discard_document(frontier, download_url, file_path, pending=None):
+    """提取或索引失败时删除下载的文件和段落块暂存文件，并删除抓取记录和内容记录以便下次重试"""
+    for path in (file_path, spool_path(file_path)):
+        if os.path.exists(path):
+            os.remove(path)
+    if pending is not None:
+        pending.pop(download_url, None)
+    if frontier:
+        frontier.forget(download_url)
+        # 路径的上一级目录名就是内容哈希
+        frontier.release_content(os.path.basename(os.path.dirname(file_path)))
+
+
+def seed_frontier(frontier):
+    """抓取记录为空时，把索引中已有的下载地址写入记录，避免重复下载"""
+    if frontier.count() == 0:
+        frontier.mark_seen(
+            hit['_source']['download_url']
+            for hit in helpers.scan(es, index=index_name, query={"query": {"match_all": {}}},
+                                    _source=["download_url"])
+            if hit['_source'].get('download_url')
+        )
 
 
-def crawl_and_index(base_url, max_pages=5):
-    """爬取文档并自动索引到Elasticsearch"""
+def crawl_and_index(base_url, max_pages=5, frontier=None, download_workers=DOWNLOAD_WORKERS,
+                    extract_workers=EXTRACT_WORKERS, per_host=PER_HOST, rate=HOST_RATE, batch_size=INDEX_BATCH_SIZE,
+                    extract_limits=None):
+    """爬取文档并自动索引到Elasticsearch
+
+    列表页在当前线程中顺序翻页，文档交给 DocumentPipeline 并发下载、在提取进程中提取、批量索引
+    extract_limits 透传给 extract_content（max_file_mb、max_pages、max_rows、max_chars、timeout）；
+    超过 timeout 时在页/段落之间截断，超过 timeout + EXTRACT_KILL_GRACE 仍未返回时终止提取进程，该文件按失败处理
+    frontier 记录已索引的文档和已完成的列表页，异常中断后从断点继续；
+    文档的抓取记录在索引成功后才写入，中断时仍在流水线中的文档下次重新下载
+    返回流水线各阶段的统计
+    """
     os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
     setup_index()
 
     visited_urls = set()
-    downloaded_files = set()
+    checkpoint = f"documents:{base_url}"
     current_url = base_url
     page_count = 0
 
-    # 检查已索引的文件，避免重复处理
-    existing_files = set()
-    res = es.search(index=index_name, query={"match_all": {}}, size=1000)
-    for hit in res['hits']['hits']:
-        existing_files.add(hit['_source']['download_url'])
-
-    while current_url and page_count < max_pages:
-        if current_url in visited_urls:
-            break
-        visited_urls.add(current_url)
+    if frontier:
+        seed_frontier(frontier)
+        current_url = frontier.get_checkpoint(checkpoint) or base_url
+
+    # 列表页和文档共用按主机的限流，替代原来每个文档后的 sleep(1)
+    throttle = HostThrottle(per_host, rate)
+    timeout = (extract_limits or {}).get('timeout', EXTRACT_TIMEOUT)
+    # 已下载、尚未索引完成的文档的校验信息 {url: {"headers", "digest", "size"}}
+    pending = {}
+    pipeline = DocumentPipeline(
+        download=partial(download_file, frontier=frontier, pending=pending if frontier else None),
+        extract=partial(extract_content, **(extract_limits or {})),
+        index_batch=index_documents,
+        on_indexed=partial(record_document, frontier, pending) if frontier else None,
+        on_failed=partial(discard_document, frontier, pending=pending),
+        # 某个列表页的文档全部处理完后才把断点推进到下一页
+        on_checkpoint=partial(frontier.set_checkpoint, checkpoint) if frontier else None,
+        download_workers=download_workers, extract_workers=extract_workers,
+        batch_size=batch_size, throttle=throttle,
+        extract_timeout=timeout + EXTRACT_KILL_GRACE if timeout else None,
+    )
+
+    completed = False
+    try:
+        while current_url and page_count < max_pages:
+            if current_url in visited_urls:
+                break
+            visited_urls.add(current_url)
 
-        print(f"\n正在爬取页面: {current_url}")
+            print(f"\n正在爬取页面: {current_url}")
 
-        try:
-            response = requests.get(current_url, timeout=10)
+            with throttle.slot(current_url):
+                response = requests.get(current_url, timeout=10)
             response.encoding = 'utf-8'
             soup = BeautifulSoup(response.text, 'html.parser')
 
@@ -159,32 +557,34 @@ def crawl_and_index(base_url, max_pages=5):
                     if full_url not in doc_links and not full_url.endswith(('#', '/')):
                         doc_links.append(full_url)
 
-            # 下载并索引文档
+            # 交给流水线下载并索引
             for doc_url in doc_links:
-                if doc_url in existing_files:
+                # 已抓取但没有 ETag/Last-Modified 的文档无法廉价地判断是否变化，直接跳过
+                page = frontier.get(doc_url) if frontier else None
+                if page and not (page['etag'] or page['last_modified']):
+                    frontier.skip(doc_url)
                     print(f"已跳过（已索引）: {doc_url}")
                     continue
-
-                filename = os.path.basename(doc_url)
-                save_path = os.path.join(DOWNLOAD_FOLDER, filename)
-
-                if download_file(doc_url, save_path):
-                    if index_document(save_path, doc_url):
-                        downloaded_files.add(doc_url)
-                    else:
-                        # 索引失败时删除下载的文件
-                        if os.path.exists(save_path):
-                            os.remove(save_path)
-
-                time.sleep(1)  # 礼貌延迟
+                pipeline.submit(doc_url)
 
             # 查找下一页
             current_url = find_next_page(current_url,soup)
             page_count += 1
+            pipeline.mark(current_url)
+        completed = True
+
+    except Exception as e:
+        # 保留断点，下次从最后一个完整处理的页面继续
+        print(f"页面爬取失败: {current_url} | 错误: {e}")
+    finally:
+        stats = pipeline.close()
 
-        except Exception as e:
-            print(f"页面爬取失败: {current_url} | 错误: {e}")
-            break
+    # 正常结束时清除断点，下次从第一页重新检查
+    if completed and frontier:
+        frontier.set_checkpoint(checkpoint, None)
+    if stats["index"]["ok"]:
+        es.indices.refresh(index=index_name)
+    return stats
 
 
 def find_next_page(current_url,soup):
@@ -215,6 +615,8 @@ def search_documents(query):
                     "type": "best_fields"
                 }
              },
+            # 每个文件只返回得分最高的段落块
+            collapse={"field": "doc_id"},
             highlight={
                 "fields": {
                     "content": {
@@ -233,6 +635,7 @@ def search_documents(query):
                 "file_name": source['file_name'],
                 "file_path": source['file_path'],
                 "url": source['download_url'],
+                "page": source.get('page'),
                 "content": source['content'][:200] + "...",
                 "highlight": hit.get('highlight', {}).get('content', [])
             })
@@ -243,7 +646,37 @@ def search_documents(query):
 
 
 if __name__ == "__main__":
+    from frontier import CrawlFrontier, print_frontier_stats
+
+    parser = argparse.ArgumentParser(description="文档爬虫：并发下载、提取进程提取文本、批量索引到 documents_index")
     # 示例URL（替换为实际目标URL）
-    base_url = "https://www.nankai.edu.cn/157/list1.htm"
+    parser.add_argument('url', nargs='?', default="https://www.nankai.edu.cn/157/list1.htm", help="起始列表页")
+    parser.add_argument('--max-pages', type=int, default=20, help="最多抓取的列表页数")
+    parser.add_argument('--download-workers', type=int, default=DOWNLOAD_WORKERS, help="并发下载线程数")
+    parser.add_argument('--extract-workers', type=int, default=EXTRACT_WORKERS, help="文本提取进程数，0 表示在下载线程中提取")
+    parser.add_argument('--per-host', type=int, default=PER_HOST, help="单个主机的最大并发请求数")
+    parser.add_argument('--rate', type=float, default=HOST_RATE, help="单个主机每秒请求数，0 表示不限")
+    parser.add_argument('--batch-size', type=int, default=INDEX_BATCH_SIZE, help="每个 bulk 请求的文档数")
+    parser.add_argument('--max-file-mb', type=float, default=MAX_FILE_MB, help="超过该大小的文件不提取")
+    parser.add_argument('--max-doc-pages', type=int, default=MAX_PAGES, help="每个 PDF 最多提取的页数")
+    parser.add_argument('--max-rows', type=int, default=MAX_ROWS, help="每个表格最多提取的行数")
+    parser.add_argument('--max-chars', type=int, default=MAX_TEXT_CHARS, help="每个文件最多提取的字符数")
+    parser.add_argument('--extract-timeout', type=float, default=EXTRACT_TIMEOUT, help="单个文件的提取时间上限(秒)")
+    parser.add_argument('--rechunk', action='store_true', help="只把已有的整篇文档改写为段落块，不抓取")
+    args = parser.parse_args()
+
+    if args.rechunk:
+        print(f"✓ 已改写 {rechunk_legacy_documents(args.batch_size)} 个文档")
+        raise SystemExit(0)
+
     # 爬取并索引文档
-    crawl_and_index(base_url, max_pages=20)
+    frontier = CrawlFrontier(FRONTIER_DB)
+    stats = crawl_and_index(
+        args.url, max_pages=args.max_pages, frontier=frontier, download_workers=args.download_workers,
+        extract_workers=args.extract_workers, per_host=args.per_host, rate=args.rate, batch_size=args.batch_size,
+        extract_limits=dict(max_file_mb=args.max_file_mb, max_pages=args.max_doc_pages, max_rows=args.max_rows,
+                            max_chars=args.max_chars, timeout=args.extract_timeout)
+    )
+    print_pipeline_stats(stats)
+    print_frontier_stats(frontier.stats())
+    frontier.close()
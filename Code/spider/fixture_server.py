@@ -0,0 +1,109 @@
+"""
+Local fixture site for crawler tests
+模拟南开新闻网列表页/文章页结构的本地 HTTP 服务，可设置延迟和随机 503，文章页支持 ETag 条件请求，用于测试爬虫和测量吞吐
+
+用法:
+    python fixture_server.py --port 8800 --pages 50 --per-page 20 --latency 0.05
+    python nankai_news.py http://127.0.0.1:8800/xb/list_0049.shtml --mode async
+"""
+
+import re
+import random
+import hashlib
+import asyncio
+import argparse
+
+from aiohttp import web
+
+LIST_PAGE = """<html><head><meta charset="utf-8"><title>南开新闻</title></head><body>
+<ul>{items}</ul>
+</body></html>"""
+
+ARTICLE_PAGE = """<html><head><meta charset="utf-8"><meta name="wapurl" content="http://m.news.nankai.edu.cn{path}">
+<title>{title}</title></head><body>
+<table>
+<tr><td style="font-size:30px; font-weight:bold; text-align:center; padding:10px;">{title}</td></tr>
+<tr><td style="text-align:center; border-bottom:1px solid #ddd; padding-bottom:15px;">
+<span>来源：南开新闻网</span> <span>发稿时间：{ctime}</span></td></tr>
+<tr><td>{paragraphs}</td></tr>
+</table>
+<a class="page_link" href="/system/{page}/0.shtml">相关新闻</a>
+</body></html>"""
+
+WORDS = ["南开大学", "学术会议", "人工智能", "研究生", "图书馆", "科研成果", "国际交流", "志愿服务", "化学学院", "校庆"]
+
+
+def make_app(list_pages=50, per_page=20, latency=0.0, failure_rate=0.0, paragraphs=8):
+    """列表页 /xb/list_NNNN.shtml（NNNN 从 list_pages-1 递减到 0），文章页 /system/NNNN/i.shtml"""
+    app = web.Application()
+    app['requests'] = 0
+
+    async def delay():
+        app['requests'] += 1
+        if latency:
+            await asyncio.sleep(latency)
+        if failure_rate and random.random() < failure_rate:
+            raise web.HTTPServiceUnavailable()
+
+    async def list_page(request):
+        await delay()
+        match = re.fullmatch(r'list_(\d+)\.shtml', request.match_info['name'])
+        items = ''
+        # 范围外的页码和 index.shtml 返回空列表页
+        if match and int(match.group(1)) < list_pages:
+            page = match.group(1)
+            items = ''.join(
+                f'<li><a href="/system/{page}/{i}.shtml">新闻 {page}-{i}</a></li>' for i in range(per_page)
+            )
+        return web.Response(text=LIST_PAGE.format(items=items), content_type='text/html', charset='utf-8')
+
+    async def article_page(request):
+        await delay()
+        page, number = request.match_info['page'], int(request.match_info['number'])
+        if number >= per_page:
+            raise web.HTTPNotFound()
+        rng = random.Random(f"{page}-{number}")
+        title = f"{rng.choice(WORDS)}{rng.choice(WORDS)}新闻 {page}-{number}"
+        body = ''.join(
+            f"<p>{''.join(rng.choice(WORDS) for _ in range(30))}。</p>" for _ in range(paragraphs)
+        )
+        html = ARTICLE_PAGE.format(
+            title=title, path=request.path, page=page, paragraphs=body,
+            ctime=f"2024-{rng.randint(1, 12)}-{rng.randint(1, 28)} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}"
+        )
+        etag = '"' + hashlib.md5(html.encode('utf-8')).hexdigest() + '"'
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304, headers={'ETag': etag})
+        return web.Response(text=html, content_type='text/html', charset='utf-8', headers={'ETag': etag})
+
+    app.router.add_get('/xb/{name}', list_page)
+    app.router.add_get(r'/system/{page}/{number:\d+}.shtml', article_page)
+    return app
+
+
+async def start_fixture_server(host='127.0.0.1', port=8800, list_pages=50, per_page=20, latency=0.0, failure_rate=0.0,
+                               paragraphs=8):
+    """在当前事件循环中启动测试站点，返回 (runner, 起始列表页 URL)"""
+    runner = web.AppRunner(make_app(list_pages, per_page, latency, failure_rate, paragraphs))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner, f"http://{host}:{port}/xb/list_{list_pages - 1:04d}.shtml"
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="爬虫本地测试站点")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--pages', type=int, default=50, help="列表页数")
+    parser.add_argument('--per-page', type=int, default=20, help="每个列表页的文章数")
+    parser.add_argument('--latency', type=float, default=0.0, help="每个请求的模拟延迟(秒)")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="随机返回 503 的比例")
+    args = parser.parse_args()
+
+    print(f"起始列表页: http://{args.host}:{args.port}/xb/list_{args.pages - 1:04d}.shtml")
+    web.run_app(make_app(args.pages, args.per_page, args.latency, args.failure_rate), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
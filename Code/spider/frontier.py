@@ -0,0 +1,314 @@
+"""
+Persistent crawl frontier
+基于 SQLite 的抓取记录：已抓取 URL、ETag/Last-Modified、内容哈希和断点，
+重复抓取时发送条件请求、跳过未变化的页面，中断后从最后一个断点继续；
+文档还记录 内容哈希 -> 文档 id，相同内容只提取和索引一次，以及哪些地址是重复内容
+"""
+
+import time
+import sqlite3
+import hashlib
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT,
+    size INTEGER DEFAULT 0,
+    fetched_at REAL
+);
+CREATE TABLE IF NOT EXISTS contents (
+    content_hash TEXT PRIMARY KEY,
+    doc_id TEXT,
+    url TEXT,
+    file_path TEXT,
+    size INTEGER DEFAULT 0,
+    created_at REAL
+);
+CREATE TABLE IF NOT EXISTS duplicates (
+    url TEXT PRIMARY KEY,
+    doc_id TEXT,
+    content_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS duplicates_content_hash ON duplicates (content_hash);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    name TEXT PRIMARY KEY,
+    value TEXT,
+    updated_at REAL
+);
+"""
+
+
+def content_hash(body):
+    """页面内容的 sha256"""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return hashlib.sha256(body).hexdigest()
+
+
+class CrawlFrontier:
+    """抓取记录和断点，每 commit_every 次写入提交一次（写断点时立即提交）
+
+    before_commit 在每次提交前调用（通常是输出管道的 flush），返回写入失败的 URL，
+    这些 URL 的记录不提交，下次重新抓取；已提交的记录不会领先于已落盘的数据
+    """
+
+    def __init__(self, path, commit_every=100, before_commit=None):
+        self.path = path
+        self.commit_every = commit_every
+        self.before_commit = before_commit
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._pending = 0
+        # 统计在多个抓取线程中更新
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "new": 0, "changed": 0, "unchanged": 0, "not_modified": 0,
+            "skipped_seen": 0, "conditional_requests": 0, "bytes_saved": 0,
+            "head_not_modified": 0, "contents": 0, "duplicates": 0, "duplicate_bytes": 0,
+            "reassigned": 0,
+        }
+
+    def get(self, url):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT etag, last_modified, content_hash, size FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("etag", "last_modified", "content_hash", "size"), row))
+
+    def seen(self, url):
+        return self.get(url) is not None
+
+    def count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def conditional_headers(self, url):
+        """已抓取过的 URL 返回 If-None-Match / If-Modified-Since 请求头"""
+        page = self.get(url)
+        headers = {}
+        if page:
+            if page["etag"]:
+                headers["If-None-Match"] = page["etag"]
+            if page["last_modified"]:
+                headers["If-Modified-Since"] = page["last_modified"]
+        if headers:
+            self._count("conditional_requests")
+        return headers
+
+    def not_modified(self, url, head=False):
+        """服务端返回 304，或 head=True 时 HEAD 响应的校验信息与记录一致"""
+        page = self.get(url) or {}
+        self._count("not_modified", bytes_saved=page.get("size") or 0, head_not_modified=1 if head else 0)
+        self._touch(url)
+
+    def skip(self, url):
+        """已抓取过、本次不再请求"""
+        page = self.get(url) or {}
+        self._count("skipped_seen", bytes_saved=page.get("size") or 0)
+
+    def changed(self, url, body=None, digest=None):
+        """内容是否与记录不同（新页面也算变化），只比较不写入；未变化时更新抓取时间
+
+        内容有变化时，调用方在结果写入输出管道之后再调用 record()，
+        避免中断后记录显示"未变化"而数据从未落盘
+        """
+        digest = digest or content_hash(body)
+        page = self.get(url)
+        if page is None:
+            self._count("new")
+            return True
+        if page["content_hash"] == digest:
+            self._count("unchanged")
+            self._touch(url)
+            return False
+        self._count("changed")
+        return True
+
+    def record(self, url, body=None, headers=None, digest=None, size=None):
+        """写入一次成功抓取的校验信息和内容哈希
+
+        可以直接传入已经计算好的 digest 和 size，避免把大文件读入内存
+        """
+        headers = headers or {}
+        digest = digest or content_hash(body)
+        size = len(body) if size is None else size
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO pages (url, etag, last_modified, content_hash, size, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(url) DO UPDATE SET "
+                "etag = excluded.etag, last_modified = excluded.last_modified, "
+                "content_hash = excluded.content_hash, size = excluded.size, fetched_at = excluded.fetched_at",
+                (url, headers.get('ETag'), headers.get('Last-Modified'), digest, size, time.time())
+            )
+            self._maybe_commit()
+
+    def update(self, url, body=None, headers=None, digest=None, size=None):
+        """比较并立即写入记录，返回内容是否有变化（新页面也算变化）"""
+        digest = digest or content_hash(body)
+        changed = self.changed(url, digest=digest)
+        self.record(url, headers=headers, digest=digest, size=len(body) if size is None else size)
+        return changed
+
+    def forget(self, url):
+        """删除抓取记录（后续处理失败时调用，下次重新抓取）"""
+        with self._lock:
+            self.conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            self._maybe_commit()
+
+    def mark_seen(self, urls):
+        """把已知 URL 写入记录（没有校验信息），用于从已有索引迁移"""
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO pages (url, fetched_at) VALUES (?, ?)",
+                ((url, time.time()) for url in urls)
+            )
+            self.conn.commit()
+
+    def claim_content(self, digest, doc_id, url, file_path=None, size=0):
+        """登记内容哈希对应的文档
+
+        该内容尚未登记时登记为 doc_id 并返回 None；已登记（其它地址下载过相同内容）时
+        把 url 记为重复，返回已有的 {"doc_id", "url", "file_path"}，调用方不再提取和索引
+        """
+        with self._lock:
+            inserted = self.conn.execute(
+                "INSERT OR IGNORE INTO contents (content_hash, doc_id, url, file_path, size, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (digest, doc_id, url, file_path, size, time.time())
+            ).rowcount
+            row = None if inserted else self.conn.execute(
+                "SELECT doc_id, url, file_path FROM contents WHERE content_hash = ?", (digest,)
+            ).fetchone()
+            if row is None or row[0] == doc_id:
+                self.conn.execute("DELETE FROM duplicates WHERE url = ?", (url,))
+            else:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO duplicates (url, doc_id, content_hash) VALUES (?, ?, ?)",
+                    (url, doc_id, digest)
+                )
+            self._maybe_commit()
+        if row is None or row[0] == doc_id:
+            # 同一地址的内容被重新登记（如上次失败后重试）不算重复
+            self._count("contents")
+            return None
+        self._count("duplicates", duplicate_bytes=size or 0)
+        return dict(zip(("doc_id", "url", "file_path"), row))
+
+    def release_content(self, digest):
+        """删除内容登记（提取或索引失败时调用，下次重新处理）
+
+        这份内容从未被索引，重复地址的抓取记录一并删除，下次重新抓取
+        """
+        with self._lock:
+            self.conn.execute("DELETE FROM contents WHERE content_hash = ?", (digest,))
+            self.conn.execute(
+                "DELETE FROM pages WHERE url IN (SELECT url FROM duplicates WHERE content_hash = ?)", (digest,)
+            )
+            self.conn.execute("DELETE FROM duplicates WHERE content_hash = ?", (digest,))
+            self._maybe_commit()
+
+    def release_doc_contents(self, doc_id):
+        """同一地址的内容变化后调用，交出文档之前登记的内容，返回不再被任何地址使用的旧文件路径
+
+        旧内容还有重复地址时，登记转给其中一个地址并删除它的抓取记录：
+        下次抓取时它作为这份内容的所有者重新提取并以自己的文档 id 索引，其它重复地址仍指向它
+        """
+        paths = []
+        with self._lock:
+            owned = self.conn.execute(
+                "SELECT content_hash, file_path FROM contents WHERE doc_id = ?", (doc_id,)
+            ).fetchall()
+            for digest, file_path in owned:
+                heir = self.conn.execute(
+                    "SELECT url, doc_id FROM duplicates WHERE content_hash = ? AND doc_id != ? LIMIT 1",
+                    (digest, doc_id)
+                ).fetchone()
+                if heir is None:
+                    self.conn.execute("DELETE FROM contents WHERE content_hash = ?", (digest,))
+                    if file_path:
+                        paths.append(file_path)
+                    continue
+                url, heir_id = heir
+                self.conn.execute("UPDATE contents SET doc_id = ?, url = ? WHERE content_hash = ?",
+                                  (heir_id, url, digest))
+                self.conn.execute("DELETE FROM duplicates WHERE url = ?", (url,))
+                self.conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+                self._count("reassigned")
+            self._maybe_commit()
+        return paths
+
+    def _touch(self, url):
+        with self._lock:
+            self.conn.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time(), url))
+            self._maybe_commit()
+
+    def _maybe_commit(self):
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self._commit()
+
+    def _commit(self):
+        """提交前先让输出管道落盘，写入失败的 URL 删除记录（调用方持有 _lock）"""
+        if self.before_commit:
+            failed = list(self.before_commit() or ())
+            self.conn.executemany("DELETE FROM pages WHERE url = ?", ((url,) for url in failed))
+        self.conn.commit()
+        self._pending = 0
+
+    def _count(self, name=None, **amounts):
+        with self._stats_lock:
+            if name:
+                self._stats[name] += 1
+            for key, amount in amounts.items():
+                self._stats[key] += amount
+
+    def get_checkpoint(self, name):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM checkpoints WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_checkpoint(self, name, value):
+        """保存断点，同时提交之前的抓取记录"""
+        with self._lock:
+            if value is None:
+                self.conn.execute("DELETE FROM checkpoints WHERE name = ?", (name,))
+            else:
+                self.conn.execute(
+                    "INSERT INTO checkpoints (name, value, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+                    (name, value, time.time())
+                )
+            self._commit()
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["pages_skipped"] = stats["not_modified"] + stats["unchanged"] + stats["skipped_seen"]
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self.conn.close()
+
+
+def print_frontier_stats(stats):
+    """打印条件请求和跳过统计"""
+    print(f"✓ 新页面 {stats['new']}，内容变化 {stats['changed']}，"
+          f"跳过 {stats['pages_skipped']} (304 {stats['not_modified']}，内容未变 {stats['unchanged']}，"
+          f"已抓取 {stats['skipped_seen']})，节省下载 {stats['bytes_saved'] / 1024 / 1024:.1f} MB")
+    checked = stats['contents'] + stats['duplicates']
+    if checked:
+        # 只有文档爬虫登记内容哈希
+        print(f"✓ 内容去重: 重复 {stats['duplicates']}/{checked} ({stats['duplicates'] / checked:.1%})，"
+              f"HEAD 判定未变化 {stats['head_not_modified']}，"
+              f"避免提取和索引 {stats['duplicate_bytes'] / 1024 / 1024:.1f} MB")
+    if stats['reassigned']:
+        print(f"✓ 原地址内容变化，{stats['reassigned']} 份内容转给重复地址，下次抓取时重新索引")
@@ -1,15 +1,31 @@
+import os
+import sys
 import requests
 from bs4 import BeautifulSoup
 import random
-import json
 import jieba
 import re
+import argparse
+from itertools import islice
+from urllib.parse import urljoin
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from config import Config
+from news_extractor import extract_news_fields
+
+NON_HAN_PATTERN = re.compile(r'[^\u4e00-\u9fa5]')
 
 def clean_keywords(keywords):
     # 去除所有非汉字字符（包括符号，标点等）
-    cleaned_keywords = re.sub(r'[^\u4e00-\u9fa5]', '', keywords)
+    cleaned_keywords = NON_HAN_PATTERN.sub('', keywords)
     return cleaned_keywords
 
+# 使用jieba分词并选取前几个关键词
+def extract_keywords(title, count=3):
+    return ' '.join(islice(jieba.cut(clean_keywords(title)), count))
+
 
 # 翻页
 def get_next_page_url(current_url):
@@ -36,77 +52,78 @@ def get_next_page_url(current_url):
             return f"{base_url}/index.shtml"
     return None
 
-# 定义一个函数用于提取新闻列表
-def get_news_links(url):
-    response = requests.get(url)
-    response.encoding = 'utf-8'  # 设置正确的编码方式
-    soup = BeautifulSoup(response.text, 'html.parser')
+# 从列表页 HTML 中提取新闻链接
+def parse_news_links(html, page_url):
+    soup = BeautifulSoup(html, 'html.parser')
 
     # 提取所有新闻链接
     news_links = []
     for a_tag in soup.find_all('a', href=True):
         href = a_tag['href']
         if 'system' in href:
-            full_url = 'http://news.nankai.edu.cn' + href if href.startswith('/') else href
-            news_links.append(full_url)
+            news_links.append(urljoin(page_url, href))
 
     return news_links
 
-# 定义一个函数用于提取每篇新闻的详细内容
-def get_news_content(url,page_links):
-    response = requests.get(url)
-    response.encoding = 'utf-8'
-    soup = BeautifulSoup(response.text, 'html.parser')
-
-    # 提取各个字段，如果没有找到则填充为 "无"
-    # 提取新闻来源和发稿时间
-    source_time_td = soup.find('td', style="text-align:center; border-bottom:1px solid #ddd; padding-bottom:15px;")
-    if source_time_td:
-        # 提取新闻来源（南开新闻网）
-        media_name = source_time_td.find('span', text=re.compile('来源：')).get_text(strip=True).replace('来源：', '') if source_time_td.find('span', text=re.compile('来源：')) else "无"
-        # 提取发稿时间
-        ctime = source_time_td.find('span', text=re.compile('发稿时间：')).get_text(strip=True).replace('发稿时间：', '') if source_time_td.find('span', text=re.compile('发稿时间：')) else "无"
-    else:
-        media_name = "无来源"
-        ctime = "2000-1-1 00:00"
-
-    wapurl = soup.find('meta', {'name': 'wapurl'})  # 移动端 URL
-    wapurl = wapurl['content'] if wapurl else "www.none.cn"
-
-    # 提取新闻标题
-    # 提取新闻标题
-    title_td = soup.find('td', style=re.compile(r'font-size:30px.*font-weight:bold.*text-align:center.*'))
-    title = title_td.get_text(strip=True) if title_td else "无"
-
-    content = ''
-    for p in soup.find_all('p'):  # 新闻内容
-        content += p.get_text(strip=True) + ' '
-    content = content.strip() if content else "无内容"
-
-    page_link = soup.find('a', {'class': 'page_link'})  # 相关新闻
-    page_link = page_link['href'] if page_link else "无相关新闻"
+# 定义一个函数用于提取新闻列表
+def get_news_links(url):
+    response = requests.get(url, timeout=Config.CRAWL_TIMEOUT)
+    response.encoding = 'utf-8'  # 设置正确的编码方式
+    return parse_news_links(response.text, url)
 
-    # 使用jieba分词并选取前几个关键词
-    cleaned_title = clean_keywords(title)
-    keywords = ' '.join(list(jieba.cut(cleaned_title))[:3])  # 使用jieba分词并取前五个词
+# 随机选择 3 条同页新闻作为相关新闻
+def related_links(news_links):
+    if len(news_links) >= 3:
+        return random.sample(news_links, 3)
+    return news_links  # 如果新闻链接少于 3 条，则直接使用所有新闻链接
 
+# 从新闻页 HTML 中提取详细内容：单遍扫描，不构建文档树（见 news_extractor.py）
+def parse_news_content(html, url, page_links):
+    media_name, ctime, wapurl, title, content = extract_news_fields(html)
     return {
         'ctime': ctime,
         'url': url,
         'wapurl': wapurl,
         'title': title,
         'media_name': media_name,
-        'keywords': keywords,
+        'keywords': extract_keywords(title),
         'content': content,
         'page_link': page_links
     }
 
-# 定义主爬虫函数
-def crawl_nankai_news(url):
-    base_url = url
-    all_news = []
-    next_page_url = base_url
-    save_interval = 10000
+# 下载新闻页，返回 (原始内容 bytes, 响应头)
+# 传入 frontier 时发送条件请求，页面未变化（304 或内容哈希相同）返回 None；
+# 有变化的页面此时不写入抓取记录，结果写入 sink 后再调用 frontier.record
+def fetch_news_page(url, frontier=None):
+    headers = frontier.conditional_headers(url) if frontier else None
+    response = requests.get(url, headers=headers, timeout=Config.CRAWL_TIMEOUT)
+    if frontier:
+        if response.status_code == 304:
+            frontier.not_modified(url)
+            return None
+        if not frontier.changed(url, response.content):
+            return None
+    return response.content, response.headers
+
+# 定义一个函数用于提取每篇新闻的详细内容
+def get_news_content(url, page_links):
+    body, _ = fetch_news_page(url)
+    return parse_news_content(body.decode('utf-8', errors='replace'), url, page_links)
+
+# 结果写入 sink 后再写抓取记录，中断时未落盘的文章下次会重新抓取
+def write_news(sink, frontier, news_data, body, headers):
+    if not news_data:
+        return
+    sink.write(news_data)
+    if frontier:
+        frontier.record(news_data['url'], body, headers)
+
+# 定义主爬虫函数：每篇新闻抓取后立即写入 sink（见 sinks.py），不在内存中累积
+# 传入 frontier 时每完成一个列表页保存断点，下次从断点继续
+# 传入 parse_pool（parse_pool.ParsePool）时解析交给进程池，主线程继续下载下一篇
+def crawl_nankai_news(url, sink, frontier=None, skip_seen=False, parse_pool=None):
+    checkpoint = f"news:{url}"
+    next_page_url = (frontier.get_checkpoint(checkpoint) if frontier else None) or url
 
     while next_page_url:
         # 获取新闻链接
@@ -114,28 +131,82 @@ def crawl_nankai_news(url):
         news_links = get_news_links(next_page_url)
 
         # 遍历新闻链接，抓取详细内容
+        pending = []
         for link in news_links:
+            if frontier and skip_seen and frontier.seen(link):
+                frontier.skip(link)
+                continue
             print(f"正在抓取：{link}")
-            # 随机选择 3 条新闻链接
-            if len(news_links) >= 3:
-                page_links = random.sample(news_links, 3)
-            else:
-                page_links = news_links  # 如果新闻链接少于 3 条，则直接使用所有新闻链接
-            news_data = get_news_content(link,page_links)
-            all_news.append(news_data)
+            page = fetch_news_page(link, frontier)
+            if page is None:
+                continue
+            body, headers = page
+            if parse_pool is not None and parse_pool.executor is not None:
+                pending.append((parse_pool.submit(body, link, related_links(news_links)), body, headers))
+                continue
+            news_data = parse_news_content(body.decode('utf-8', errors='replace'), link, related_links(news_links))
+            write_news(sink, frontier, news_data, body, headers)
+        # 本页的解析结果全部写入后才保存断点（保存前 frontier 会先刷出 sink）
+        for future, body, headers in pending:
+            write_news(sink, frontier, future.result(), body, headers)
 
         # 获取下一页的 URL
         next_page_url = get_next_page_url(next_page_url)
-        if len(all_news) % save_interval == 0:
-            with open('nankai_news.json', 'w', encoding='utf-8') as f:
-                json.dump(all_news, f, ensure_ascii=False, indent=4)
+        if frontier:
+            frontier.set_checkpoint(checkpoint, next_page_url)
 
-    # 将抓取的数据保存为 JSON 文件
-    with open('nankai_news.json', 'w', encoding='utf-8') as f:
-        json.dump(all_news, f, ensure_ascii=False, indent=4)
+# 异步并发抓取
+def crawl_nankai_news_async(url, sink, max_pages=None, **kwargs):
+    import asyncio
+    from async_crawler import AsyncCrawler, print_stats
 
-    print("抓取完成，数据已保存到 nankai_news.json")
+    crawler = AsyncCrawler(**kwargs)
+    stats = asyncio.run(crawler.crawl(url, sink.write, max_pages=max_pages))
+    print_stats(stats)
 
 # 启动爬虫
 if __name__ == '__main__':
-    crawl_nankai_news()
+    from sinks import build_pipeline
+    from frontier import CrawlFrontier, print_frontier_stats
+    from parse_pool import ParsePool
+
+    parser = argparse.ArgumentParser(description="南开新闻网爬虫")
+    parser.add_argument('url', help="起始列表页（带页码的 .shtml 地址）")
+    parser.add_argument('--mode', choices=['sync', 'async'], default='sync', help="sync: 逐页顺序抓取; async: 并发抓取")
+    parser.add_argument('--max-pages', type=int, help="最多抓取的列表页数（仅 async）")
+    parser.add_argument('--concurrency', type=int, default=Config.CRAWL_CONCURRENCY, help="并发抓取协程数")
+    parser.add_argument('--per-host', type=int, default=Config.CRAWL_PER_HOST, help="单个主机的最大并发连接数")
+    parser.add_argument('--rate', type=float, default=Config.CRAWL_RATE, help="单个主机每秒请求数，0 表示不限")
+    parser.add_argument('--parse-workers', type=int, default=Config.CRAWL_PARSE_WORKERS,
+                        help="解析/分词进程数，0 表示在主进程（线程池）中解析")
+    parser.add_argument('--jsonl', default='nankai_news.jsonl', help="追加写入的 JSON Lines 文件，传空字符串关闭")
+    parser.add_argument('--mysql', action='store_true', help="批量 UPSERT 到 MySQL nankai_news 表")
+    parser.add_argument('--es', action='store_true', help="写入 MySQL 后批量推送到 Elasticsearch（需要 --mysql）")
+    parser.add_argument('--frontier', default=Config.CRAWL_FRONTIER_DB, help="抓取记录 SQLite 文件，传空字符串关闭")
+    parser.add_argument('--skip-seen', action='store_true', help="已抓取过的文章不再请求（默认发送条件请求）")
+    parser.add_argument('--restart', action='store_true', help="忽略断点，从起始页重新抓取")
+    args = parser.parse_args()
+    if args.es and not args.mysql:
+        parser.error("--es 需要同时指定 --mysql，文档 id 来自 MySQL")
+
+    frontier = CrawlFrontier(args.frontier) if args.frontier else None
+    if frontier and args.restart:
+        frontier.set_checkpoint(f"news:{args.url}", None)
+
+    with build_pipeline(jsonl=args.jsonl, mysql=args.mysql, es=args.es) as pipeline, \
+            ParsePool(args.parse_workers) as parse_pool:
+        if frontier:
+            # 抓取记录每次提交前先让 sink 落盘，写入失败的文章不提交记录
+            frontier.before_commit = pipeline.flush
+        if args.mode == 'async':
+            crawl_nankai_news_async(
+                args.url, pipeline, max_pages=args.max_pages, concurrency=args.concurrency,
+                per_host=args.per_host, rate=args.rate, frontier=frontier, skip_seen=args.skip_seen,
+                parse_executor=parse_pool.executor
+            )
+        else:
+            crawl_nankai_news(args.url, pipeline, frontier, args.skip_seen, parse_pool)
+    print(f"抓取完成: {pipeline.stats()}")
+    if frontier:
+        print_frontier_stats(frontier.stats())
+        frontier.close()
@@ -0,0 +1,214 @@
+"""
+Single-pass news page extractor
+基于标准库 html.parser 的单遍字段提取：不构建 BeautifulSoup 文档树，
+按 BeautifulSoup(html, 'html.parser') 的建树规则（未闭合标签、空元素、注释/script 文本）处理，
+提取结果与原 BeautifulSoup 实现（scripts/benchmark_parser.py 中的 parse_news_content_soup）相同
+"""
+
+import re
+from html import unescape
+from html.entities import html5
+from html.parser import HTMLParser
+
+# 新闻来源/发稿时间所在单元格的 style（与原实现一样要求完全相等）
+SOURCE_STYLE = "text-align:center; border-bottom:1px solid #ddd; padding-bottom:15px;"
+TITLE_STYLE = re.compile(r'font-size:30px.*font-weight:bold.*text-align:center.*')
+MEDIA_LABEL = '来源：'
+CTIME_LABEL = '发稿时间：'
+
+# BeautifulSoup 视为空元素的标签，开始标签即结束
+VOID_TAGS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link', 'menuitem', 'meta',
+    'param', 'source', 'track', 'wbr', 'basefont', 'bgsound', 'command', 'frame', 'image', 'isindex',
+    'nextid', 'spacer',
+])
+# 这些标签内的文本在 BeautifulSoup 中是 Script/Stylesheet 等特殊字符串，get_text() 不包含
+STRING_CONTAINER_TAGS = frozenset(['script', 'style', 'template', 'rt', 'rp'])
+
+
+class _Node:
+    """打开的标签：子节点计数用于计算 .string，texts 收集 get_text(strip=True) 的片段"""
+    __slots__ = ('tag', 'children', 'first', 'texts', 'string')
+
+    def __init__(self, tag, collect=False):
+        self.tag = tag
+        self.children = 0
+        self.first = None
+        self.texts = [] if collect else None
+        self.string = None
+
+
+class NewsPageExtractor(HTMLParser):
+    """一遍扫描提取来源、发稿时间、移动端 URL、标题和所有 <p> 的文本"""
+
+    def __init__(self):
+        # 与 BeautifulSoup 一样自行处理字符引用，保证相邻文本合并后再 strip
+        super().__init__(convert_charrefs=False)
+        self.stack = []
+        self.collecting = []
+        self.containers = 0
+        self.data = []
+        self.already_closed = []
+        self.wapurl_attrs = None
+        self.title_node = None
+        self.source_node = None
+        self.source_spans = []
+        self.paragraphs = []
+
+    # ---- 文本 ----
+
+    def handle_data(self, data):
+        self.data.append(data)
+
+    def handle_entityref(self, name):
+        character = html5.get(name + ';')
+        self.data.append(character if character is not None else '&' + name)
+
+    def handle_charref(self, name):
+        self.data.append(unescape(f'&#{name};'))
+
+    def _end_data(self, special=False):
+        """结束当前文本节点；special 为注释、声明等不计入 get_text() 的字符串"""
+        if not self.data:
+            return
+        text = ''.join(self.data)
+        self.data = []
+        if self.stack:
+            parent = self.stack[-1]
+            parent.children += 1
+            if parent.children == 1:
+                parent.first = text
+        if special or self.containers:
+            return
+        text = text.strip()
+        if text:
+            for node in self.collecting:
+                node.texts.append(text)
+
+    def _special(self, text):
+        self._end_data()
+        self.data.append(text)
+        self._end_data(special=True)
+
+    def handle_comment(self, data):
+        self._special(data)
+
+    def handle_decl(self, decl):
+        self._special(decl)
+
+    def handle_pi(self, data):
+        self._special(data)
+
+    def unknown_decl(self, data):
+        # CDATA 段与普通文本一样计入 get_text()，其它声明不计入
+        if data.upper().startswith('CDATA['):
+            self._end_data()
+            self.data.append(data[len('CDATA['):])
+            self._end_data()
+        else:
+            self._special(data)
+
+    # ---- 标签 ----
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, handle_empty_element=False)
+        self.handle_endtag(tag, check_already_closed=False)
+
+    def handle_starttag(self, tag, attrs, handle_empty_element=True):
+        self._end_data()
+        attrs = {key: '' if value is None else value for key, value in attrs}
+        collect = tag == 'p'
+        if tag == 'meta' and self.wapurl_attrs is None and attrs.get('name') == 'wapurl':
+            self.wapurl_attrs = attrs
+        elif tag == 'td':
+            style = attrs.get('style')
+            if self.title_node is None and style is not None and TITLE_STYLE.search(style):
+                collect = True
+                self.title_node = True
+            if self.source_node is None and style == SOURCE_STYLE:
+                self.source_node = True
+        elif tag == 'span' and self.source_node is not None and self.source_node in self.stack:
+            collect = True
+
+        node = _Node(tag, collect)
+        if self.stack:
+            parent = self.stack[-1]
+            parent.children += 1
+            if parent.children == 1:
+                parent.first = node
+        if self.title_node is True:
+            self.title_node = node
+        if self.source_node is True:
+            self.source_node = node
+        if collect:
+            self.collecting.append(node)
+            if tag == 'p':
+                self.paragraphs.append(node)
+            elif tag == 'span':
+                self.source_spans.append(node)
+        if tag in STRING_CONTAINER_TAGS:
+            self.containers += 1
+        self.stack.append(node)
+        if tag in VOID_TAGS and handle_empty_element:
+            self.handle_endtag(tag, check_already_closed=False)
+            # 之后出现的 </br> 之类的结束标签直接忽略（也不结束当前文本节点）
+            self.already_closed.append(tag)
+
+    def handle_endtag(self, tag, check_already_closed=True):
+        if check_already_closed and tag in self.already_closed:
+            self.already_closed.remove(tag)
+            return
+        self._end_data()
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i].tag == tag:
+                while len(self.stack) > i:
+                    self._pop()
+                return
+
+    def _pop(self):
+        node = self.stack.pop()
+        if node.texts is not None:
+            self.collecting.remove(node)
+        if node.tag in STRING_CONTAINER_TAGS:
+            self.containers -= 1
+        # 与 Tag.string 相同：只有一个子节点时取该子节点（或其 .string）
+        if node.children == 1:
+            node.string = node.first if isinstance(node.first, str) else node.first.string
+
+    def close(self):
+        super().close()
+        self._end_data()
+        while self.stack:
+            self._pop()
+
+    # ---- 结果 ----
+
+    def _source_field(self, label):
+        for span in self.source_spans:
+            if span.string is not None and label in span.string:
+                return ''.join(span.texts).replace(label, '')
+        return "无"
+
+    def fields(self):
+        """返回 (media_name, ctime, wapurl, title, content)，缺省值与原实现一致"""
+        if self.source_node is not None:
+            media_name = self._source_field(MEDIA_LABEL)
+            ctime = self._source_field(CTIME_LABEL)
+        else:
+            media_name = "无来源"
+            ctime = "2000-1-1 00:00"
+        wapurl = self.wapurl_attrs['content'] if self.wapurl_attrs is not None else "www.none.cn"
+        title = ''.join(self.title_node.texts) if self.title_node is not None else "无"
+        if self.paragraphs:
+            content = ' '.join(''.join(p.texts) for p in self.paragraphs).strip()
+        else:
+            content = "无内容"
+        return media_name, ctime, wapurl, title, content
+
+
+def extract_news_fields(html):
+    """解析新闻页 HTML，返回 (media_name, ctime, wapurl, title, content)"""
+    extractor = NewsPageExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return extractor.fields()
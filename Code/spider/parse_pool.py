@@ -0,0 +1,79 @@
+"""
+Process pool for the CPU stage of the news crawler
+抓取与解析分离：网络 I/O 留在主进程，HTML 解码、字段提取和 jieba 分词在进程池中进行，
+每个工作进程启动时加载一次 jieba 词典，解析吞吐不再受 GIL 限制
+
+用法:
+    with ParsePool(4) as pool:
+        AsyncCrawler(parse_executor=pool.executor).crawl(...)
+"""
+
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import jieba
+
+from nankai_news import parse_news_content
+
+
+def init_worker():
+    """工作进程初始化：提前加载 jieba 词典，避免每个任务或第一篇文章时加载"""
+    jieba.setLogLevel(logging.WARNING)
+    jieba.initialize()
+
+
+def parse_page(body, url, page_links):
+    """在工作进程中解码并解析文章页，返回与 parse_news_content 相同的 dict"""
+    if isinstance(body, bytes):
+        body = body.decode('utf-8', errors='replace')
+    return parse_news_content(body, url, page_links)
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+class ParsePool:
+    """解析进程池，任务经 ProcessPoolExecutor 的调用队列分发给工作进程
+
+    workers 为 0 时不创建进程，executor 为 None（run_in_executor 使用默认线程池）
+    """
+
+    def __init__(self, workers=None):
+        self.workers = default_workers() if workers is None else workers
+        self.executor = None
+        if self.workers > 0:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker)
+
+    def warm_up(self):
+        """等待所有工作进程启动并加载完词典，基准测试时不把启动时间计入吞吐"""
+        if self.executor is not None:
+            list(self.executor.map(_noop, range(self.workers * 2)))
+
+    def submit(self, body, url, page_links):
+        if self.executor is None:
+            raise RuntimeError("ParsePool 未启用工作进程")
+        return self.executor.submit(parse_page, body, url, page_links)
+
+    def map(self, items, chunksize=8):
+        """批量解析 (body, url, page_links)，按输入顺序返回结果"""
+        bodies, urls, links = zip(*items) if items else ((), (), ())
+        if self.executor is None:
+            return list(map(parse_page, bodies, urls, links))
+        return list(self.executor.map(parse_page, bodies, urls, links, chunksize=chunksize))
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _noop(_):
+    return os.getpid()
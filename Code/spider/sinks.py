@@ -0,0 +1,223 @@
+"""
+Streaming sinks for crawled news
+爬虫输出管道：逐条追加 JSON Lines、批量 UPSERT 到 MySQL nankai_news、批量推送到 Elasticsearch，内存占用与抓取规模无关
+"""
+
+import os
+import sys
+import json
+import logging
+from datetime import datetime
+
+# Add project root and Code/index to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'index'))
+
+from config import Config
+
+NEWS_COLUMNS = ('ctime', 'url', 'wapurl', 'title', 'media_name', 'keywords', 'content', 'page_link')
+
+# url 上有唯一键，重复抓取时更新已有行（updated_at 随之更新，增量索引也会拾取）
+UPSERT_SQL = (
+    f"INSERT INTO nankai_news ({', '.join(NEWS_COLUMNS)}) VALUES ({', '.join(['%s'] * len(NEWS_COLUMNS))}) "
+    "ON DUPLICATE KEY UPDATE "
+    + ', '.join(f"{column} = VALUES({column})" for column in NEWS_COLUMNS if column != 'url')
+)
+
+DEFAULT_CTIME = datetime(2000, 1, 1)
+
+
+def parse_ctime(value):
+    """发稿时间如 2024-3-5 09:30，无法解析时使用 2000-01-01 00:00（与爬虫的缺省值一致）"""
+    try:
+        return datetime.strptime(value.strip(), "%Y-%m-%d %H:%M")
+    except (AttributeError, ValueError):
+        return DEFAULT_CTIME
+
+
+def record_to_row(record):
+    """爬虫记录转换为 nankai_news 行参数"""
+    row = dict(record)
+    row['ctime'] = parse_ctime(record.get('ctime'))
+    if not isinstance(row.get('page_link'), str):
+        row['page_link'] = json.dumps(row.get('page_link') or [], ensure_ascii=False)
+    return tuple(row.get(column) for column in NEWS_COLUMNS)
+
+
+class JsonLinesSink:
+    """每条记录追加一行 JSON，每 flush_every 条刷新一次文件"""
+
+    def __init__(self, path, flush_every=100):
+        self.path = path
+        self.flush_every = flush_every
+        self.written = 0
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.written += 1
+        if self.written % self.flush_every == 0:
+            self._file.flush()
+
+    def flush(self):
+        if not self._file.closed:
+            self._file.flush()
+        return []
+
+    def close(self):
+        self._file.close()
+
+    def stats(self):
+        return {"jsonl": self.written}
+
+
+class MySQLSink:
+    """按 batch_size 批量 UPSERT 到 nankai_news
+
+    on_flush 收到本批写入后的完整行（含自增 id），用于继续推送到 ES
+    """
+
+    def __init__(self, get_connection, batch_size=None, on_flush=None):
+        self.get_connection = get_connection
+        self.batch_size = batch_size or Config.CRAWL_SINK_BATCH
+        self.on_flush = on_flush
+        self.conn = None
+        self.buffer = []
+        # 写入失败的 url，flush() 时交给抓取记录删除，下次重新抓取
+        self.unsaved = []
+        self.written = 0
+        self.failed = 0
+
+    def write(self, record):
+        self.buffer.append(record_to_row(record))
+        if len(self.buffer) >= self.batch_size:
+            self._write_buffer()
+
+    def flush(self):
+        """写入缓冲中的行，返回（包括之前自动刷出时）写入失败的 url"""
+        self._write_buffer()
+        unsaved, self.unsaved = self.unsaved, []
+        return unsaved
+
+    def _write_buffer(self):
+        if not self.buffer:
+            return
+        rows, self.buffer = self.buffer, []
+        try:
+            if self.conn is None or not self.conn.is_connected():
+                self.conn = self.get_connection()
+            cursor = self.conn.cursor()
+            cursor.executemany(UPSERT_SQL, rows)
+            self.conn.commit()
+            cursor.close()
+            self.written += len(rows)
+        except Exception as e:
+            self.failed += len(rows)
+            self.unsaved.extend(row[NEWS_COLUMNS.index('url')] for row in rows)
+            logging.error(f"写入 nankai_news 失败 ({len(rows)} 条): {e}")
+            return
+        if self.on_flush:
+            self.on_flush(self.fetch_rows([row[NEWS_COLUMNS.index('url')] for row in rows]))
+
+    def fetch_rows(self, urls):
+        """按 url 读回刚写入的行"""
+        cursor = self.conn.cursor(dictionary=True)
+        cursor.execute(
+            f"SELECT * FROM nankai_news WHERE url IN ({', '.join(['%s'] * len(urls))})", tuple(urls)
+        )
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+
+    def close(self):
+        self._write_buffer()
+        if self.conn is not None and self.conn.is_connected():
+            self.conn.close()
+
+    def stats(self):
+        return {"mysql": self.written, "mysql_failed": self.failed}
+
+
+class ElasticsearchSink:
+    """把 MySQLSink 写入的行批量推送到 ES，文档 _id 与 index.py 一样使用 MySQL id"""
+
+    def __init__(self, es=None, index_name=None):
+        from index import get_es
+        from near_dup import NearDupIndex
+        self.es = es or get_es()
+        self.index_name = index_name or Config.NEWS_INDEX
+        # 新抓取的文章与已索引的文章比较，查找近似重复（转载、同一新闻的不同页面）
+        self.near_dup = NearDupIndex(self.es, self.index_name)
+        self.indexed = 0
+        self.failed = 0
+
+    def write_rows(self, rows):
+        from index import bulk_index, row_to_action
+        report = bulk_index(
+            (row_to_action(row, self.index_name, self.near_dup) for row in rows),
+            es=self.es, workers=1, progress_every=0
+        )
+        self.indexed += report['indexed']
+        self.failed += report['failed']
+
+    def close(self):
+        if self.indexed:
+            from index import invalidate_search_cache
+            self.es.indices.refresh(index=self.index_name)
+            invalidate_search_cache()
+
+    def stats(self):
+        return {"es": self.indexed, "es_failed": self.failed, "es_near_duplicates": self.near_dup.stats["clustered"]}
+
+
+class Pipeline:
+    """把每条记录依次交给所有 sink"""
+
+    def __init__(self, sinks):
+        self.sinks = sinks
+
+    def write(self, record):
+        for sink in self.sinks:
+            if hasattr(sink, 'write'):
+                sink.write(record)
+
+    def flush(self):
+        """让所有 sink 落盘（抓取记录提交前调用），返回写入失败的 url"""
+        unsaved = []
+        for sink in self.sinks:
+            if hasattr(sink, 'flush'):
+                unsaved.extend(sink.flush())
+        return unsaved
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def stats(self):
+        stats = {}
+        for sink in self.sinks:
+            stats.update(sink.stats())
+        return stats
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def build_pipeline(jsonl=None, mysql=False, es=False):
+    """按参数组装输出管道；推送 ES 需要同时写 MySQL 以获得文档 id"""
+    sinks = []
+    if jsonl:
+        sinks.append(JsonLinesSink(jsonl))
+    if es and not mysql:
+        raise ValueError("推送 Elasticsearch 需要同时写入 MySQL (--mysql)")
+    if mysql:
+        from index import get_stream_connection
+        es_sink = ElasticsearchSink() if es else None
+        sinks.append(MySQLSink(get_stream_connection, on_flush=es_sink.write_rows if es_sink else None))
+        if es_sink:
+            # MySQLSink.close 会刷出最后一批，ES sink 必须在它之后关闭
+            sinks.append(es_sink)
+    return Pipeline(sinks)
@@ -16,6 +16,11 @@ document.querySelectorAll('[data-wildcard]').forEach(button => {
         this.classList.toggle('active-toggle');
     });
 });
+document.querySelectorAll('[data-collapse]').forEach(button => {
+    button.addEventListener('click', function() {
+        this.classList.toggle('active-toggle');
+    });
+});
 
 // 构建查询参数（界面模拟）
 function buildQueryParams(baseQuery) {
@@ -36,17 +41,20 @@ function buildQueryParams(baseQuery) {
                 type === 'prefix2' ? `?${query}` :
                 `${query}?`;
     });
+    // 合并近似重复的新闻（转载等）
+    const collapseDuplicates = document.querySelector('[data-collapse].active-toggle') !== null;
     let fullQuery={
         query: query,
         term_type: termType,
         wildcard_type: wildcardButtons,
         file_type: fileType,
+        collapse_duplicates: collapseDuplicates,
     }
     return fullQuery;
 }
 
 // 显示快照（模拟）
-async function showSnapshot(img_name) {
+async function showSnapshot(url) {
     try{
         const response = await fetch('http://localhost:3000/api/snapshot', {
             method: 'POST',
@@ -54,18 +62,33 @@ async function showSnapshot(img_name) {
                 'Content-Type': 'application/json'
             },
             body: JSON.stringify({
-                img_name:img_name
+                url: url
             })
         })
+        const data = await response.json();
         if (!response.ok) {
-            const errorData = await response.json();
-            throw new Error(errorData.error?.reason || '搜索请求失败');
+            throw new Error(data.error || '获取快照失败');
         }
+        // 图片由服务端直接输出（带缓存头），在新窗口中打开
+        window.open(`http://localhost:3000${data.image}`, '_blank');
     }catch (error) {
         alert("获取网页快照失败");
     }   
 }
 
+// 按需获取新闻全文（搜索结果只包含摘要）
+async function showFullContent(id, button) {
+    try {
+        const doc = await fetch(`http://localhost:3000/api/doc/${encodeURIComponent(id)}`).then(res => res.json());
+        if (doc.error) throw new Error(doc.error);
+        const snippet = button.parentElement.querySelector('.result-snippet');
+        snippet.textContent = doc.content || '';
+        button.remove();
+    } catch (error) {
+        alert("获取全文失败");
+    }
+}
+
 // 更新搜索历史
 async function getHistory() {
     try{
@@ -115,26 +138,38 @@ async function performSearch() {
     try {
         const baseQuery = document.getElementById('search-input').value.trim();
         const fullQuery = buildQueryParams(baseQuery);
-        const response = await fetch(`http://localhost:3000/api/search/${username}`, {
+        // 搜索和推荐合并为一次 /api/msearch 请求，推荐基于第一条搜索结果
+        const response = await fetch('http://localhost:3000/api/msearch', {
             method: 'POST',
             headers: {                
                 'Content-Type': 'application/json'
             },
             body: JSON.stringify({
-                query: fullQuery.query,
-                term_type:fullQuery.term_type,
-                file_type: fullQuery.file_type,
-                wildcard_type:fullQuery.wildcard_type
+                user_id: username,
+                requests: [
+                    {
+                        type: 'search',
+                        query: fullQuery.query,
+                        term_type:fullQuery.term_type,
+                        file_type: fullQuery.file_type,
+                        wildcard_type:fullQuery.wildcard_type,
+                        collapse_duplicates: fullQuery.collapse_duplicates
+                    },
+                    {type: 'recommend', from_result: 0}
+                ]
             })
         });
 
         if (!response.ok) {
             const errorData = await response.json();
-            throw new Error(errorData.error?.reason || '搜索请求失败');
+            throw new Error(errorData.error || '搜索请求失败');
         }
 
-        const data = await response.json();
-        getRecommendations(data.type=="normal"?data.results[0].id:"");
+        const [data, recommendations] = (await response.json()).responses;
+        if (data.error) {
+            throw new Error(data.error);
+        }
+        showRecommendations(Array.isArray(recommendations) ? recommendations : []);
         displayResults(data.results,data.type);
         getHistory();
     } catch (error) {
@@ -153,18 +188,14 @@ function displayResults(results,type) {
     if(type=="normal"){
         results.forEach(result => {
             const source = result;
-            const highlight = result.snippet || {};        
             const resultElement = document.createElement('div');
             resultElement.className = 'result-item';
             resultElement.innerHTML = `
                 <a href="${source.url}" class="result-title">${source.title}</a>
                 <div class="result-link">${source.url}</div>
-                <div class="result-snippet">${
-                    highlight.content ? 
-                    highlight.content.join('...') : 
-                    source.content?.substring(0, 200) + '...'
-                }</div>
-                <button onclick="showSnapshot('${source.title}')">查看快照</button>
+                <div class="result-snippet">${source.snippet || ''}...</div>
+                <button onclick="showFullContent('${source.id}', this)">查看全文</button>
+                <button onclick="showSnapshot('${source.url}')">查看快照</button>
             `;
             resultsContainer.appendChild(resultElement);
         });
@@ -175,9 +206,9 @@ function displayResults(results,type) {
             resultElement.className = 'result-item';
             resultElement.innerHTML = `
                 <a href="${source.url}" class="result-title">${source.file_name}</a>
-                <div class="result-link">${source.url}</div>
+                <div class="result-link">${source.url}${source.page ? ` (第 ${source.page} 页)` : ''}</div>
                 <div class="result-snippet">${
-                    source.content?.substring(0, 200) + '...'
+                    source.highlight?.length ? source.highlight.join(' ... ') : source.content?.substring(0, 200) + '...'
                 }</div>
             `;
             resultsContainer.appendChild(resultElement);
@@ -185,17 +216,8 @@ function displayResults(results,type) {
     }
 }
 
-// 在显示搜索结果后调用推荐
-async function getRecommendations(id) {
-
-    // 获取推荐（如果有当前查看的文档）
-    const recommendations = await fetch('http://localhost:3000/api/recommend', {
-        method: 'POST',
-        headers: {'Content-Type': 'application/json'},
-        body: JSON.stringify({
-            current_id: id,            
-        })
-    }).then(res => res.json());
+// 显示推荐结果
+function showRecommendations(recommendations) {
      const recContainer = document.getElementById('recommendations');
      recContainer.innerHTML='';
     // 显示推荐结果
@@ -209,6 +231,28 @@ async function getRecommendations(id) {
     }
 }
 
+// 输入联想（防抖，避免每次按键都发请求）
+let suggestTimer = null;
+async function getSuggestions(prefix) {
+    const datalist = document.getElementById('search-suggestions');
+    if (!prefix) {
+        datalist.innerHTML = '';
+        return;
+    }
+    try {
+        const params = new URLSearchParams({ prefix: prefix, user_id: username });
+        const data = await fetch(`http://localhost:3000/api/suggest?${params}`).then(res => res.json());
+        datalist.innerHTML = '';
+        (data.suggestions || []).forEach(text => {
+            const option = document.createElement('option');
+            option.value = text;
+            datalist.appendChild(option);
+        });
+    } catch (error) {
+        datalist.innerHTML = '';
+    }
+}
+
 const urlParams = new URLSearchParams(window.location.search);
 const username = urlParams.get('username');
 if(username==undefined)window.location.href='./login.html';
@@ -219,4 +263,8 @@ const resultsContainer = document.getElementById('results-container');
 document.getElementById('search-button').addEventListener('click', performSearch);
 document.getElementById('search-input').addEventListener('keypress', e => {
     if (e.key === 'Enter') performSearch();
+});
+document.getElementById('search-input').addEventListener('input', e => {
+    clearTimeout(suggestTimer);
+    suggestTimer = setTimeout(() => getSuggestions(e.target.value.trim()), 150);
 });
\ No newline at end of file
@@ -13,6 +13,7 @@ class Config:
     # Elasticsearch Index Names
     NEWS_INDEX = 'news_index'
     DOCUMENTS_INDEX = 'documents_index'
+    RELATED_INDEX = os.getenv('RELATED_INDEX', 'news_related')  # 预计算的相关文章（Code/index/related.py）
     
     # MySQL Database Configuration
     MYSQL_CONFIG = {
@@ -31,13 +32,84 @@ class Config:
     FLASK_PORT = int(os.getenv('FLASK_PORT', 3000))
     FLASK_DEBUG = os.getenv('FLASK_DEBUG', 'true').lower() == 'true'
     
+    # Response Compression Configuration
+    RESPONSE_COMPRESSION = os.getenv('RESPONSE_COMPRESSION', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 5))
+    
+    # Async (ASGI) Server Configuration
+    ASYNC_PORT = int(os.getenv('ASYNC_PORT', 3001))
+    ASYNC_WORKERS = int(os.getenv('ASYNC_WORKERS', 4))
+    ASYNC_MYSQL_POOL_SIZE = int(os.getenv('ASYNC_MYSQL_POOL_SIZE', 10))
+    
+    # Crawler Configuration
+    CRAWL_CONCURRENCY = int(os.getenv('CRAWL_CONCURRENCY', 16))
+    CRAWL_PER_HOST = int(os.getenv('CRAWL_PER_HOST', 8))
+    CRAWL_RATE = float(os.getenv('CRAWL_RATE', 10.0))  # 每个主机每秒请求数，0 表示不限
+    CRAWL_TIMEOUT = float(os.getenv('CRAWL_TIMEOUT', 15))
+    CRAWL_MAX_RETRIES = int(os.getenv('CRAWL_MAX_RETRIES', 3))
+    CRAWL_SINK_BATCH = int(os.getenv('CRAWL_SINK_BATCH', 200))
+    CRAWL_FRONTIER_DB = os.getenv('CRAWL_FRONTIER_DB', './crawl_frontier.db')
+    CRAWL_PARSE_WORKERS = int(os.getenv('CRAWL_PARSE_WORKERS', 0))  # 解析/分词进程数，0 表示不启用进程池
+    
     # File Storage Configuration
     DOWNLOAD_FOLDER = os.getenv('DOWNLOAD_FOLDER', './documents')
     SNAPSHOT_FOLDER = os.getenv('SNAPSHOT_FOLDER', './snapshots')
+    SNAPSHOT_WORKERS = int(os.getenv('SNAPSHOT_WORKERS', 4))
+    SNAPSHOT_RECYCLE_AFTER = int(os.getenv('SNAPSHOT_RECYCLE_AFTER', 50))  # 每个浏览器处理的页数，之后重启
+    SNAPSHOT_PAGE_TIMEOUT = float(os.getenv('SNAPSHOT_PAGE_TIMEOUT', 30))
+    SNAPSHOT_FORMAT = os.getenv('SNAPSHOT_FORMAT', 'webp')  # webp / jpeg / png
+    SNAPSHOT_QUALITY = int(os.getenv('SNAPSHOT_QUALITY', 75))
+    SNAPSHOT_THUMB_WIDTH = int(os.getenv('SNAPSHOT_THUMB_WIDTH', 320))  # 0 表示不生成缩略图
+    SNAPSHOT_CACHE_MAX_AGE = int(os.getenv('SNAPSHOT_CACHE_MAX_AGE', 3600))  # 重新截图后最迟在这段时间后刷新
     
     # Search Configuration
     DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', 10))
     MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 100))
+    MAX_RESULT_WINDOW = int(os.getenv('MAX_RESULT_WINDOW', 10000))
+    PIT_KEEP_ALIVE = os.getenv('PIT_KEEP_ALIVE', '2m')
+    
+    # Bulk Indexing Configuration
+    INDEX_BULK_DOCS = int(os.getenv('INDEX_BULK_DOCS', 500))
+    INDEX_BULK_BYTES = int(os.getenv('INDEX_BULK_BYTES', 10 * 1024 * 1024))
+    INDEX_BULK_WORKERS = int(os.getenv('INDEX_BULK_WORKERS', 4))
+    INDEX_BULK_MAX_RETRIES = int(os.getenv('INDEX_BULK_MAX_RETRIES', 5))
+    INDEX_FETCH_SIZE = int(os.getenv('INDEX_FETCH_SIZE', 1000))
+    INDEX_KEEP_VERSIONS = int(os.getenv('INDEX_KEEP_VERSIONS', 2))
+    # 重建索引时 forcemerge / 等待分片分配的超时（秒），大索引可能需要数分钟
+    INDEX_MAINTENANCE_TIMEOUT = int(os.getenv('INDEX_MAINTENANCE_TIMEOUT', 3600))
+    INDEX_STATE_FILE = os.getenv('INDEX_STATE_FILE', './index_state.json')
+    
+    # Search Cache Configuration
+    CACHE_TTL = int(os.getenv('CACHE_TTL', 60))
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 2000))
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', '')
+    CACHE_GENERATION_FILE = os.getenv(
+        'CACHE_GENERATION_FILE',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'search_generation')
+    )
+    CACHE_GENERATION_CHECK = float(os.getenv('CACHE_GENERATION_CHECK', 1.0))
+    
+    # Suggestion Configuration
+    SUGGEST_SIZE = int(os.getenv('SUGGEST_SIZE', 8))
+    SUGGEST_CACHE_SIZE = int(os.getenv('SUGGEST_CACHE_SIZE', 20000))
+    SUGGEST_CACHE_TTL = int(os.getenv('SUGGEST_CACHE_TTL', 300))
+    SUGGEST_TIMEOUT = float(os.getenv('SUGGEST_TIMEOUT', 0.015))
+    MSEARCH_MAX_REQUESTS = int(os.getenv('MSEARCH_MAX_REQUESTS', 10))  # /api/msearch 每次最多的子请求数
+    
+    # Related Articles Configuration
+    RELATED_TOP_K = int(os.getenv('RELATED_TOP_K', 5))
+    RELATED_BATCH_SIZE = int(os.getenv('RELATED_BATCH_SIZE', 50))  # 每个 _msearch 请求的文章数
+    RELATED_WORKERS = int(os.getenv('RELATED_WORKERS', 2))
+    RELATED_CACHE_SIZE = int(os.getenv('RELATED_CACHE_SIZE', 20000))
+    RELATED_CACHE_TTL = int(os.getenv('RELATED_CACHE_TTL', 3600))
+    
+    # Search History Configuration
+    HISTORY_BATCH_SIZE = int(os.getenv('HISTORY_BATCH_SIZE', 100))
+    HISTORY_FLUSH_INTERVAL = float(os.getenv('HISTORY_FLUSH_INTERVAL', 1.0))
+    HISTORY_QUEUE_SIZE = int(os.getenv('HISTORY_QUEUE_SIZE', 10000))
+    HISTORY_CACHE_USERS = int(os.getenv('HISTORY_CACHE_USERS', 10000))
+    HISTORY_CACHE_PER_USER = int(os.getenv('HISTORY_CACHE_PER_USER', 50))
     
     # Logging Configuration
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
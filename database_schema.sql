@@ -19,6 +19,7 @@ CREATE TABLE IF NOT EXISTS nankai_news (
     INDEX idx_title (title(255)),
     INDEX idx_ctime (ctime),
     INDEX idx_keywords (keywords(255)),
+    INDEX idx_updated_at (updated_at, id),
     FULLTEXT INDEX ft_content (content),
     FULLTEXT INDEX ft_title (title),
     UNIQUE KEY unique_url (url(255))
@@ -45,6 +46,16 @@ CREATE TABLE IF NOT EXISTS search_history (
     INDEX idx_search_time (search_time)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='搜索历史表';
 
+-- 创建用户搜索历史表（Code/server/app.py 使用，批量写入依赖 unique_user_words）
+CREATE TABLE IF NOT EXISTS history (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id VARCHAR(50) NOT NULL COMMENT '用户ID',
+    words VARCHAR(255) NOT NULL COMMENT '搜索词',
+    search_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '最近搜索时间',
+    UNIQUE KEY unique_user_words (user_id, words),
+    INDEX idx_user_time (user_id, search_time)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='用户搜索历史表';
+
 -- 创建搜索日志表
 CREATE TABLE IF NOT EXISTS search_logs (
     id INT AUTO_INCREMENT PRIMARY KEY,
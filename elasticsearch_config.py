@@ -7,10 +7,19 @@ NEWS_INDEX_SETTINGS = {
         "number_of_shards": 2
     },
     "analysis": {
+        "tokenizer": {
+            # 二元切分，供通配/中缀查询使用
+            "infix_bigram": {
+                "type": "ngram",
+                "min_gram": 2,
+                "max_gram": 2,
+                "token_chars": []
+            }
+        },
         "filter": {
             "autocomplete_filter": {
                 "type": "edge_ngram",
-                "min_gram": 2,
+                "min_gram": 1,
                 "max_gram": 20
             }
         },
@@ -27,11 +36,19 @@ NEWS_INDEX_SETTINGS = {
                 "type": "custom",
                 "tokenizer": "ik_max_word",
                 "filter": ["lowercase"]
+            },
+            "infix": {
+                "type": "custom",
+                "tokenizer": "infix_bigram",
+                "filter": ["lowercase"]
             }
         }
     }
 }
 
+# 中缀子字段：相邻位置的二元组依次匹配即为原文中的连续子串
+INFIX_FIELD = {"type": "text", "analyzer": "infix", "norms": False}
+
 NEWS_INDEX_MAPPINGS = {
     "properties": {
         "ctime": {"type": "date", "format": "yyyy-MM-dd HH:mm"},
@@ -44,12 +61,25 @@ NEWS_INDEX_MAPPINGS = {
                 "autocomplete": {
                     "type": "text",
                     "analyzer": "autocomplete"
-                }
+                },
+                "infix": INFIX_FIELD
             }
         },
         "media_name": {"type": "keyword"},
-        "keywords": {"type": "text", "analyzer": "ik_max_word"},
-        "content": {"type": "text", "analyzer": "ik_max_word"}
+        "keywords": {
+            "type": "text",
+            "analyzer": "ik_max_word",
+            "fields": {"infix": INFIX_FIELD}
+        },
+        "content": {
+            "type": "text",
+            "analyzer": "ik_max_word",
+            "fields": {"infix": INFIX_FIELD}
+        },
+        # 近似重复检测（Code/index/near_dup.py）：SimHash、LSH 分桶键和簇 id，搜索时按 dup_cluster 折叠
+        "simhash": {"type": "keyword", "index": False},
+        "simhash_bands": {"type": "keyword"},
+        "dup_cluster": {"type": "keyword"}
     }
 }
 
@@ -70,6 +100,15 @@ DOCUMENTS_INDEX_SETTINGS = {
     }
 }
 
+# 文档按段落块索引（Code/spider/docment.py），每块一条记录；块记录上的文件级字段，
+# 搜索时按 doc_id 折叠，每个文件只返回得分最高的块
+DOCUMENT_CHUNK_PROPERTIES = {
+    "doc_id": {"type": "keyword"},
+    "chunk": {"type": "integer"},
+    "chunks": {"type": "integer"},
+    "page": {"type": "integer"}
+}
+
 DOCUMENTS_INDEX_MAPPINGS = {
     "properties": {
         "file_name": {"type": "keyword"},
@@ -78,6 +117,7 @@ DOCUMENTS_INDEX_MAPPINGS = {
         "download_url": {"type": "keyword"},
         "timestamp": {"type": "date"},
         "file_type": {"type": "keyword"},
-        "file_size": {"type": "long"}
+        "file_size": {"type": "long"},
+        **DOCUMENT_CHUNK_PROPERTIES
     }
 }
\ No newline at end of file
@@ -218,12 +218,17 @@ def main():
         elif command == "crawl":
             # 运行爬虫
             print("启动爬虫...")
-            os.system(f"{sys.executable} Code/spider/nankai_news.py")
+            os.system(f"{sys.executable} Code/spider/nankai_news.py {' '.join(sys.argv[2:])}")
             
         elif command == "index":
             # 创建索引
             print("创建搜索索引...")
-            os.system(f"{sys.executable} Code/index/index.py")
+            os.system(f"{sys.executable} Code/index/index.py {' '.join(sys.argv[2:])}")
+            
+        elif command == "async":
+            # 启动异步 (ASGI) 搜索服务
+            print(f"启动异步搜索服务 (workers={Config.ASYNC_WORKERS})...")
+            os.system(f"{sys.executable} Code/server/async_app.py")
             
         elif command == "snapshot":
             # 生成快照
@@ -232,7 +237,7 @@ def main():
             
         else:
             print(f"未知命令: {command}")
-            print("可用命令: init, crawl, index, snapshot")
+            print("可用命令: init, crawl, index, async, snapshot")
     else:
         # 启动开发服务器
         start_development_server()
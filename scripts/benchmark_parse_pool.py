@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Parse/tokenize process pool scaling benchmark
+在本地回放语料上测量解析 + jieba 分词阶段随进程数的吞吐变化，并检查进程池输出与单进程一致
+
+用法:
+    python scripts/benchmark_parse_pool.py                       # 生成测试站点格式的语料，进程数 0,1,2,4..CPU 核数
+    python scripts/benchmark_parse_pool.py --corpus pages/       # 回放保存的新闻页 (*.html / *.shtml)
+    python scripts/benchmark_parse_pool.py --workers 1 2 4 8 --repeat 3
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Add Code/spider to path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'Code', 'spider'))
+
+from parse_pool import ParsePool, init_worker, default_workers
+from benchmark_parser import fixture_pages, load_golden
+
+
+def load_corpus(directory, count, paragraphs):
+    """返回 [(body, url, page_links)]，body 为 UTF-8 字节，与爬虫交给解析阶段的内容相同"""
+    if directory:
+        pages, _ = load_golden(directory)
+    else:
+        pages = fixture_pages(count, paragraphs)
+    return [(html.encode('utf-8'), name, []) for name, html in pages.items()]
+
+
+def measure(workers, corpus, repeat):
+    """返回 (pages/sec, 结果)；启动进程和加载词典的时间不计入"""
+    with ParsePool(workers) as pool:
+        pool.warm_up()
+        items = corpus * repeat
+        start = time.perf_counter()
+        results = pool.map(items, chunksize=max(1, len(items) // (max(workers, 1) * 16)))
+        elapsed = time.perf_counter() - start
+    return len(items) / elapsed, results[:len(corpus)]
+
+
+def main():
+    """主函数"""
+    cpus = default_workers()
+    levels = sorted({0, 1, cpus} | {n for n in (2, 4, 8, 16) if n < cpus})
+
+    parser = argparse.ArgumentParser(description="解析/分词进程池吞吐测试")
+    parser.add_argument('--corpus', help="保存的新闻页目录，不指定时生成测试站点格式的页面")
+    parser.add_argument('--pages', type=int, default=500, help="生成的页面数")
+    parser.add_argument('--paragraphs', type=int, default=12, help="生成页面的段落数")
+    parser.add_argument('--workers', type=int, nargs='+', default=levels, help="要测试的进程数，0 表示主进程内解析")
+    parser.add_argument('--repeat', type=int, default=2, help="语料重复次数")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus, args.pages, args.paragraphs)
+    if not corpus:
+        print("✗ 没有可用的页面")
+        sys.exit(1)
+    print(f"语料 {len(corpus)} 页，CPU 核数 {cpus}")
+
+    # 主进程内解析也先加载词典，与工作进程条件相同
+    init_worker()
+    baseline = None
+    expected = None
+    mismatches = 0
+    for workers in args.workers:
+        rate, results = measure(workers, corpus, args.repeat)
+        if expected is None:
+            expected = results
+        elif results != expected:
+            mismatches += 1
+        baseline = baseline or rate
+        label = "主进程" if workers == 0 else f"{workers} 进程"
+        print(f"{label:>8}: {rate:8.1f} pages/sec ({rate / baseline:.2f}x)")
+
+    print(f"{'✓' if not mismatches else '✗'} 各进程数的解析结果{'一致' if not mismatches else '不一致'}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+News parser golden check and microbenchmark
+对比单遍提取 (parse_news_content) 与 BeautifulSoup 原实现 (parse_news_content_soup) 的输出，并测量单核 pages/sec；
+原实现只保留在这里作为对照，爬虫不再使用
+
+用法:
+    python scripts/benchmark_parser.py                                  # 内置边界用例 + 本地测试站点页面
+    python scripts/benchmark_parser.py --golden tests/golden/news       # 逐字段对比保存的页面，不一致时退出码为 1
+    python scripts/benchmark_parser.py --golden pages/ --update-golden  # 用原实现为新保存的页面生成 .json 基准
+"""
+
+import os
+import sys
+import json
+import time
+import re
+import random
+import argparse
+
+import jieba
+from bs4 import BeautifulSoup
+
+# Add Code/spider to path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'Code', 'spider'))
+
+from nankai_news import parse_news_content, clean_keywords
+from fixture_server import ARTICLE_PAGE, WORDS
+
+# 基准文件保存的字段（news_extractor.extract_news_fields 的输出）
+GOLDEN_FIELDS = ('media_name', 'ctime', 'wapurl', 'title', 'content')
+
+SOURCE_TD = '<td style="text-align:center; border-bottom:1px solid #ddd; padding-bottom:15px;">'
+TITLE_TD = '<td style="font-size:30px; font-weight:bold; text-align:center;">'
+
+# 容易让两种实现产生差异的写法
+EDGE_CASES = {
+    "nested_p": f"<table><tr>{TITLE_TD}标题</td></tr></table><p>外层<p>内层</p>尾部</p><p>二<div>块</div></p>",
+    "unclosed": f"<html><body>{TITLE_TD}<b>未闭合标题<p>第一段<p>第二段<br>换行",
+    "comment_script": (
+        f"<table><tr>{SOURCE_TD}<span><!--注释-->来源：南开</span><span>发稿时间：2024-5-1 08:00</span></td></tr></table>"
+        "<p>正文<!-- 隐藏 -->可见<script>var x = '<p>';</script><style>p{}</style>结束</p>"
+    ),
+    "entities": (
+        f"<table><tr>{SOURCE_TD}<span>来源：&lt;南开&gt;&nbsp;新闻网</span><span>发稿时间：&#50;024-1-2 03:04</span>"
+        f"</td></tr></table><p>A &amp; B&nbsp;&copy &unknown; &#x4e2d;&#25991;</p><p>   </p><p></p>"
+    ),
+    "nested_span": (
+        f"<table><tr>{SOURCE_TD}<span><b>来源：</b></span><span><i>来源：天津日报</i></span>"
+        f"<span> 发稿时间：2024-6-1 10:00 </span></td></tr></table>"
+    ),
+    "empty_elements": f"<meta name='wapurl' content='http://m.example/1'><table><tr>{SOURCE_TD}<span><br>来源：X</span></td></tr></table>",
+    "no_fields": "<html><body><div>没有任何字段</div></body></html>",
+    "duplicate_attrs": "<td style='x' style='font-size:30px;font-weight:bold;text-align:center;'>重复属性</td><p/>",
+    "cdata_pi": f"{TITLE_TD}<![CDATA[隐藏]]><?pi 处理指令?>可见</td>",
+    "stray_void_end": "<p>换<br>行</br>不拆分</p><p>自闭合<br/>后</br>文本</p>",
+}
+
+
+def parse_news_content_soup(html, url, page_links):
+    """基于 BeautifulSoup 的原始实现（原 nankai_news.parse_news_content），作为单遍提取的对照"""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # 提取各个字段，如果没有找到则填充为 "无"
+    # 提取新闻来源和发稿时间
+    source_time_td = soup.find('td', style="text-align:center; border-bottom:1px solid #ddd; padding-bottom:15px;")
+    if source_time_td:
+        # 提取新闻来源（南开新闻网）
+        media_name = source_time_td.find('span', text=re.compile('来源：')).get_text(strip=True).replace('来源：', '') if source_time_td.find('span', text=re.compile('来源：')) else "无"
+        # 提取发稿时间
+        ctime = source_time_td.find('span', text=re.compile('发稿时间：')).get_text(strip=True).replace('发稿时间：', '') if source_time_td.find('span', text=re.compile('发稿时间：')) else "无"
+    else:
+        media_name = "无来源"
+        ctime = "2000-1-1 00:00"
+
+    wapurl = soup.find('meta', {'name': 'wapurl'})  # 移动端 URL
+    wapurl = wapurl['content'] if wapurl else "www.none.cn"
+
+    # 提取新闻标题
+    # 提取新闻标题
+    title_td = soup.find('td', style=re.compile(r'font-size:30px.*font-weight:bold.*text-align:center.*'))
+    title = title_td.get_text(strip=True) if title_td else "无"
+
+    content = ''
+    for p in soup.find_all('p'):  # 新闻内容
+        content += p.get_text(strip=True) + ' '
+    content = content.strip() if content else "无内容"
+
+    page_link = soup.find('a', {'class': 'page_link'})  # 相关新闻
+    page_link = page_link['href'] if page_link else "无相关新闻"
+
+    # 使用jieba分词并选取前几个关键词
+    cleaned_title = clean_keywords(title)
+    keywords = ' '.join(list(jieba.cut(cleaned_title))[:3])  # 使用jieba分词并取前五个词
+
+    return {
+        'ctime': ctime,
+        'url': url,
+        'wapurl': wapurl,
+        'title': title,
+        'media_name': media_name,
+        'keywords': keywords,
+        'content': content,
+        'page_link': page_links
+    }
+
+
+def fixture_pages(count, paragraphs=12):
+    """本地测试站点格式的文章页"""
+    pages = {}
+    for i in range(count):
+        rng = random.Random(i)
+        body = ''.join(f"<p>{''.join(rng.choice(WORDS) for _ in range(40))}。</p>" for _ in range(paragraphs))
+        pages[f"fixture_{i}"] = ARTICLE_PAGE.format(
+            title=f"{rng.choice(WORDS)}{rng.choice(WORDS)}新闻 {i}", path=f"/system/{i}.shtml", page="0001",
+            paragraphs=body, ctime=f"2024-{rng.randint(1, 12)}-{rng.randint(1, 28)} 10:00"
+        )
+    return pages
+
+
+def load_golden(directory):
+    """读取保存的页面 (*.html / *.shtml) 及对应的 .json 基准"""
+    pages, expected = {}, {}
+    for name in sorted(os.listdir(directory)):
+        stem, ext = os.path.splitext(name)
+        if ext not in ('.html', '.shtml', '.htm'):
+            continue
+        with open(os.path.join(directory, name), 'r', encoding='utf-8', errors='replace') as f:
+            pages[stem] = f.read()
+        golden = os.path.join(directory, stem + '.json')
+        if os.path.exists(golden):
+            with open(golden, 'r', encoding='utf-8') as f:
+                expected[stem] = json.load(f)
+    return pages, expected
+
+
+def diff_fields(actual, expected):
+    return [key for key in expected if actual.get(key) != expected[key]]
+
+
+def bench(parser, pages, repeat):
+    """单进程重复解析，返回 pages/sec（即单核吞吐）"""
+    items = list(pages.items())
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for name, html in items:
+            parser(html, name, [])
+    elapsed = time.perf_counter() - start
+    return len(items) * repeat / elapsed
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="新闻页解析对比与基准测试")
+    parser.add_argument('--golden', help="保存的新闻页目录，每个页面对应一个同名 .json 基准")
+    parser.add_argument('--update-golden', action='store_true', help="用 BeautifulSoup 原实现重新生成 .json 基准")
+    parser.add_argument('--fixture-pages', type=int, default=50, help="未指定 --golden 时生成的测试页面数")
+    parser.add_argument('--repeat', type=int, default=5, help="基准测试重复次数")
+    args = parser.parse_args()
+
+    if args.golden:
+        pages, expected = load_golden(args.golden)
+        if args.update_golden:
+            for name, html in pages.items():
+                result = parse_news_content_soup(html, name, [])
+                expected[name] = {key: result[key] for key in GOLDEN_FIELDS}
+                with open(os.path.join(args.golden, name + '.json'), 'w', encoding='utf-8') as f:
+                    json.dump(expected[name], f, ensure_ascii=False, indent=2)
+            print(f"✓ 已生成 {len(pages)} 个基准文件")
+    else:
+        pages = {**EDGE_CASES, **fixture_pages(args.fixture_pages)}
+        expected = {}
+    if not pages:
+        print("✗ 没有可用的页面")
+        sys.exit(1)
+
+    mismatches = 0
+    for name, html in pages.items():
+        want = expected.get(name) or parse_news_content_soup(html, name, [])
+        got = parse_news_content(html, name, [])
+        fields = diff_fields(got, want)
+        if fields:
+            mismatches += 1
+            print(f"✗ {name}: " + ', '.join(f"{key} {got.get(key)!r} != {want[key]!r}" for key in fields))
+    print(f"{'✓' if not mismatches else '✗'} 输出一致 {len(pages) - mismatches}/{len(pages)}")
+
+    soup_rate = bench(parse_news_content_soup, pages, args.repeat)
+    fast_rate = bench(parse_news_content, pages, args.repeat)
+    print(f"BeautifulSoup: {soup_rate:.1f} pages/sec/core")
+    print(f"单遍提取:      {fast_rate:.1f} pages/sec/core ({fast_rate / soup_rate:.1f}x)")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Search payload benchmark
+对比完整 _source 响应与摘要响应的负载大小和序列化耗时
+
+用法:
+    python scripts/benchmark_payload.py [--queries queries.txt] [--size 10]
+"""
+
+import os
+import sys
+import json
+import gzip
+import time
+import argparse
+import statistics
+
+# Add project root and Code/server to path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'Code', 'server'))
+
+from elasticsearch import Elasticsearch
+from config import Config
+from search_query import search_request, format_search_response
+
+DEFAULT_QUERIES = [
+    "南开大学", "研究生", "招生", "学术会议", "人工智能", "图书馆", "校庆", "奖学金",
+    "化学学院", "经济学院", "国际交流", "科研成果", "毕业典礼", "志愿服务", "体育比赛",
+]
+
+
+def measure(es, query, size, full_content, repeat):
+    """执行一次搜索并测量响应 JSON 大小、gzip 后大小和序列化耗时"""
+    result = es.search(
+        index=Config.NEWS_INDEX,
+        **search_request("normal", query, size=size, full_content=full_content)
+    )
+    response = format_search_response(result, full_content=full_content)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = json.dumps(response, ensure_ascii=False).encode('utf-8')
+        timings.append((time.perf_counter() - start) * 1000)
+    return len(body), len(gzip.compress(body, compresslevel=Config.COMPRESS_LEVEL)), statistics.median(timings)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="搜索响应负载对比")
+    parser.add_argument('--queries', help="查询词文件，每行一个")
+    parser.add_argument('--size', type=int, default=10, help="每页结果数")
+    parser.add_argument('--repeat', type=int, default=20, help="序列化重复次数（取中位数）")
+    args = parser.parse_args()
+
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, 'r', encoding='utf-8') as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    es = Elasticsearch(**Config.get_elasticsearch_config())
+    totals = {True: [0, 0, 0.0], False: [0, 0, 0.0]}
+
+    print(f"{'查询':<10}{'完整(B)':>12}{'摘要(B)':>12}{'摘要gzip(B)':>14}{'完整(ms)':>10}{'摘要(ms)':>10}")
+    for query in queries:
+        row = {}
+        for full_content in (True, False):
+            row[full_content] = measure(es, query, args.size, full_content, args.repeat)
+            for i, value in enumerate(row[full_content]):
+                totals[full_content][i] += value
+        print(f"{query:<10}{row[True][0]:>12}{row[False][0]:>12}{row[False][1]:>14}"
+              f"{row[True][2]:>10.3f}{row[False][2]:>10.3f}")
+
+    full_bytes, _, full_ms = totals[True]
+    slim_bytes, slim_gzip, slim_ms = totals[False]
+    if full_bytes:
+        print(f"\n负载: {full_bytes} B -> {slim_bytes} B ({1 - slim_bytes / full_bytes:.1%} 减少), "
+              f"gzip 后 {slim_gzip} B ({1 - slim_gzip / full_bytes:.1%} 减少)")
+    if full_ms:
+        print(f"序列化: {full_ms:.2f} ms -> {slim_ms:.2f} ms ({1 - slim_ms / full_ms:.1%} 减少)")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ Elasticsearch 初始化脚本
 
 import sys
 import os
+import time
 
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -14,7 +15,7 @@ from elasticsearch import Elasticsearch
 from config import Config
 from elasticsearch_config import (
     NEWS_INDEX_SETTINGS, NEWS_INDEX_MAPPINGS,
-    DOCUMENTS_INDEX_SETTINGS, DOCUMENTS_INDEX_MAPPINGS
+    DOCUMENTS_INDEX_SETTINGS, DOCUMENTS_INDEX_MAPPINGS, DOCUMENT_CHUNK_PROPERTIES
 )
 
 def test_elasticsearch_connection():
@@ -35,6 +36,14 @@ def test_elasticsearch_connection():
         print(f"✗ Elasticsearch 连接异常: {e}")
         return None
 
+def ensure_chunk_mapping(es, index_name):
+    """保留的旧文档索引补充段落块字段（doc_id 等），搜索按 doc_id 折叠时需要 keyword 映射"""
+    try:
+        es.indices.put_mapping(index=index_name, properties=DOCUMENT_CHUNK_PROPERTIES)
+    except Exception as e:
+        print(f"✗ {index_name} 无法补充段落块字段映射（doc_id 可能已被动态映射为 text，需要删除重建）: {e}")
+
+
 def create_index(es, index_name, settings, mappings):
     """创建索引"""
     try:
@@ -62,13 +71,44 @@ def create_index(es, index_name, settings, mappings):
         print(f"✗ 创建索引 {index_name} 失败: {e}")
         return False
 
+def create_aliased_index(es, alias, settings, mappings):
+    """创建带时间戳的版本索引并通过别名访问，便于之后零停机重建"""
+    try:
+        if es.indices.exists_alias(name=alias):
+            print(f"⚠ 别名 {alias} 已存在，跳过（重建请运行: python run.py index --mode reindex）")
+            return True
+
+        actions = []
+        if es.indices.exists(index=alias):
+            print(f"⚠ 索引 {alias} 已存在，是否替换为版本索引 + 别名？(y/N): ", end='')
+            choice = input().lower()
+            if choice != 'y':
+                print(f"跳过索引 {alias}")
+                return True
+            actions.append({"remove_index": {"index": alias}})
+
+        index_name = f"{alias}_v{time.strftime('%Y%m%d%H%M%S')}"
+        es.indices.create(
+            index=index_name,
+            settings=settings,
+            mappings=mappings
+        )
+        actions.append({"add": {"index": index_name, "alias": alias}})
+        es.indices.update_aliases(actions=actions)
+        print(f"✓ 索引 {index_name} 创建成功，别名 {alias}")
+        return True
+
+    except Exception as e:
+        print(f"✗ 创建索引 {alias} 失败: {e}")
+        return False
+
 def verify_index(es, index_name):
-    """验证索引"""
+    """验证索引（支持别名）"""
     try:
         # 获取索引信息
-        index_info = es.indices.get(index=index_name)
-        mappings = index_info[index_name]['mappings']
-        settings = index_info[index_name]['settings']
+        index_info = next(iter(es.indices.get(index=index_name).values()))
+        mappings = index_info['mappings']
+        settings = index_info['settings']
         
         print(f"✓ 索引 {index_name} 验证成功")
         print(f"  字段数量: {len(mappings.get('properties', {}))}")
@@ -119,12 +159,13 @@ def main():
     
     # 创建新闻索引
     print(f"\n3. 创建新闻索引 ({Config.NEWS_INDEX})...")
-    if create_index(es, Config.NEWS_INDEX, NEWS_INDEX_SETTINGS, NEWS_INDEX_MAPPINGS):
+    if create_aliased_index(es, Config.NEWS_INDEX, NEWS_INDEX_SETTINGS, NEWS_INDEX_MAPPINGS):
         verify_index(es, Config.NEWS_INDEX)
     
     # 创建文档索引
     print(f"\n4. 创建文档索引 ({Config.DOCUMENTS_INDEX})...")
     if create_index(es, Config.DOCUMENTS_INDEX, DOCUMENTS_INDEX_SETTINGS, DOCUMENTS_INDEX_MAPPINGS):
+        ensure_chunk_mapping(es, Config.DOCUMENTS_INDEX)
         verify_index(es, Config.DOCUMENTS_INDEX)
     
     print("\n✓ Elasticsearch 初始化完成！")
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Load test for the search API
+搜索/推荐接口压测脚本：对比 Flask (app.py) 与 ASGI (async_app.py) 服务的 p50/p99 延迟和 RPS
+
+用法:
+    python scripts/load_test.py --target flask=http://localhost:3000 --target asgi=http://localhost:3001
+    python scripts/load_test.py --target flask=http://localhost:3000 --endpoint recommend
+"""
+
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+import aiohttp
+
+DEFAULT_QUERIES = [
+    "南开大学", "研究生", "招生", "学术会议", "人工智能", "图书馆", "校庆", "奖学金",
+    "化学学院", "经济学院", "国际交流", "科研成果", "毕业典礼", "志愿服务", "体育比赛",
+]
+
+
+def percentile(values, p):
+    """最近秩法计算百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def request_for(endpoint, base_url, queries, doc_ids, user_id):
+    """一个随机请求的 (URL, JSON)"""
+    if endpoint == 'recommend':
+        return f"{base_url}/api/recommend", {"current_id": random.choice(doc_ids)}
+    return f"{base_url}/api/search/{user_id}", {"query": random.choice(queries), "page": 1, "size": 10}
+
+
+async def collect_doc_ids(base_url, queries, user_id, timeout):
+    """用搜索结果收集推荐压测使用的文章 id"""
+    doc_ids = []
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        for query in queries:
+            payload = {"query": query, "page": 1, "size": 50}
+            async with session.post(f"{base_url}/api/search/{user_id}", json=payload) as resp:
+                if resp.status == 200:
+                    doc_ids.extend(item["id"] for item in (await resp.json()).get("results", []))
+    return sorted(set(doc_ids))
+
+
+async def run_target(base_url, queries, total, concurrency, user_id, timeout, endpoint='search', doc_ids=None):
+    """以固定并发向一个服务发送 total 个搜索（或推荐）请求，返回延迟列表和错误数"""
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async with aiohttp.ClientSession(timeout=client_timeout, connector=connector) as session:
+        async def worker():
+            nonlocal errors
+            for _ in counter:
+                url, payload = request_for(endpoint, base_url, queries, doc_ids, user_id)
+                start = time.perf_counter()
+                try:
+                    async with session.post(url, json=payload) as resp:
+                        await resp.read()
+                        if resp.status != 200:
+                            errors += 1
+                            continue
+                except Exception:
+                    errors += 1
+                    continue
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": total,
+        "errors": errors,
+        "elapsed": elapsed,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+    }
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="搜索/推荐接口压测")
+    parser.add_argument('--target', action='append', required=True,
+                        help="name=url，可重复，例如 flask=http://localhost:3000")
+    parser.add_argument('--requests', type=int, default=2000, help="每个服务的请求总数")
+    parser.add_argument('--concurrency', type=int, default=50, help="并发连接数")
+    parser.add_argument('--warmup', type=int, default=100, help="正式压测前的预热请求数")
+    parser.add_argument('--user', default='loadtest', help="搜索使用的 user_id")
+    parser.add_argument('--queries', help="查询词文件，每行一个")
+    parser.add_argument('--timeout', type=float, default=30.0, help="单个请求超时时间(秒)")
+    parser.add_argument('--endpoint', choices=['search', 'recommend'], default='search', help="压测的接口")
+    parser.add_argument('--ids', help="recommend 使用的文章 id 文件，每行一个；不指定时从搜索结果中收集")
+    args = parser.parse_args()
+
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, 'r', encoding='utf-8') as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    results = {}
+    for target in args.target:
+        name, _, url = target.partition('=')
+        if not url:
+            name, url = target, target
+        url = url.rstrip('/')
+        doc_ids = None
+        if args.endpoint == 'recommend':
+            if args.ids:
+                with open(args.ids, 'r', encoding='utf-8') as f:
+                    doc_ids = [line.strip() for line in f if line.strip()]
+            else:
+                doc_ids = asyncio.run(collect_doc_ids(url, queries, args.user, args.timeout))
+            if not doc_ids:
+                print(f"✗ {name} 没有可用于推荐的文章 id")
+                sys.exit(1)
+            print(f"推荐压测使用 {len(doc_ids)} 篇文章")
+        print(f"压测 {name} ({url}) ...")
+        options = dict(endpoint=args.endpoint, doc_ids=doc_ids)
+        if args.warmup:
+            asyncio.run(run_target(url, queries, args.warmup, args.concurrency, args.user, args.timeout, **options))
+        results[name] = asyncio.run(
+            run_target(url, queries, args.requests, args.concurrency, args.user, args.timeout, **options)
+        )
+
+    print(f"\n{'服务':<12}{'请求':>8}{'错误':>8}{'RPS':>10}{'p50(ms)':>10}{'p99(ms)':>10}")
+    for name, r in results.items():
+        print(f"{name:<12}{r['requests']:>8}{r['errors']:>8}{r['rps']:>10.1f}{r['p50']:>10.1f}{r['p99']:>10.1f}")
+
+    if any(r['errors'] == r['requests'] for r in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
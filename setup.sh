@@ -123,7 +123,8 @@ echo ""
 echo "下一步操作："
 echo "1. 修改 .env 文件中的配置（特别是数据库密码）"
 echo "2. 初始化数据库: mysql -u root -p < database_schema.sql"
-echo "3. 创建搜索索引: cd Code/index && python index.py"
+echo "3. 创建搜索索引: python scripts/init_elasticsearch.py && cd Code/index && python index.py"
+echo "   (news_index 是别名，全量索引写入新版本索引后切换别名)"
 echo "4. 启动服务: cd Code/server && python app.py"
 echo "5. 访问 http://localhost:3000"
 echo ""
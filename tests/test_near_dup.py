@@ -0,0 +1,116 @@
+"""
+Tests for SimHash banding and near-duplicate clustering
+Code/index/near_dup.py：汉明距离不超过 MAX_DISTANCE 的两个值至少共享一个分桶键；
+近似重复的文章（包括并发处理时）归入同一簇
+"""
+
+import os
+import sys
+import time
+import random
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'Code', 'index'))
+
+from near_dup import (
+    SIMHASH_BITS, BANDS, BAND_BITS, MAX_DISTANCE, NearDupIndex, bands, hamming, shingles, simhash
+)
+
+WORDS = ["南开大学", "学术会议", "人工智能", "研究生", "图书馆", "科研成果", "国际交流", "志愿服务",
+         "实验室", "奖学金", "毕业典礼", "新生入学"]
+
+
+def article(seed, length=400):
+    rng = random.Random(seed)
+    return '，'.join(''.join(rng.choice(WORDS) for _ in range(4)) for _ in range(length // 4))
+
+
+def flip(value, positions):
+    for position in positions:
+        value ^= 1 << position
+    return value
+
+
+@pytest.mark.parametrize("distance", range(MAX_DISTANCE + 1))
+def test_close_values_share_a_band_key(distance):
+    rng = random.Random(distance)
+    for _ in range(2000):
+        value = rng.getrandbits(SIMHASH_BITS)
+        other = flip(value, rng.sample(range(SIMHASH_BITS), distance))
+        assert hamming(value, other) == distance
+        assert set(bands(value)) & set(bands(other))
+
+
+def test_spread_out_differences_still_share_a_band_key():
+    # 最坏情况：MAX_DISTANCE 个不同的位分别落在不同的段里
+    rng = random.Random(0)
+    for _ in range(500):
+        value = rng.getrandbits(SIMHASH_BITS)
+        touched = rng.sample(range(BANDS), MAX_DISTANCE)
+        other = flip(value, [band * BAND_BITS + rng.randrange(BAND_BITS) for band in touched])
+        assert set(bands(value)) & set(bands(other))
+
+
+def test_band_keys_identify_segment_pairs():
+    keys = bands(0)
+    assert len(keys) == len(set(keys))
+    assert all(key.endswith(':0000') for key in keys)
+
+
+def test_near_duplicate_texts_are_close_and_unrelated_are_far():
+    text = article(1)
+    reposted = "编者按：本文转载自南开新闻网。" + text
+    assert hamming(simhash(shingles(text)), simhash(shingles(reposted))) <= MAX_DISTANCE
+    assert hamming(simhash(shingles(text)), simhash(shingles(article(2)))) > MAX_DISTANCE
+
+
+def test_assign_clusters_near_duplicates():
+    index = NearDupIndex()
+    text = article(1)
+    first = index.assign("a", text)
+    assert first["dup_cluster"] == "a"
+    assert index.assign("b", text)["dup_cluster"] == "a"
+    assert index.assign("c", "编者按：本文转载自南开新闻网。" + text)["dup_cluster"] == "a"
+    assert index.assign("d", article(2))["dup_cluster"] == "d"
+    assert index.stats == {"docs": 4, "clustered": 2, "too_short": 0}
+
+
+def test_short_text_is_its_own_cluster():
+    index = NearDupIndex()
+    assert index.assign("a", "南开") == {"dup_cluster": "a"}
+    assert index.stats["too_short"] == 1
+
+
+class SlowEmptyES:
+    """已有索引中没有候选；查询时等待，让并发的 assign 都先错过内存中的候选"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+
+    def search(self, **kwargs):
+        time.sleep(self.delay)
+        return {"hits": {"hits": []}}
+
+
+def test_concurrent_near_duplicates_share_one_cluster():
+    index = NearDupIndex(es=SlowEmptyES(), index_name="news")
+    text = article(3)
+    threads = 8
+    barrier = threading.Barrier(threads)
+    results = {}
+
+    def worker(number):
+        barrier.wait()
+        results[number] = index.assign(f"doc-{number}", text + "。" * number)["dup_cluster"]
+
+    workers = [threading.Thread(target=worker, args=(number,)) for number in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    assert len(set(results.values())) == 1
+    assert index.stats == {"docs": threads, "clustered": threads - 1, "too_short": 0}
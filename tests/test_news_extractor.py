@@ -0,0 +1,37 @@
+"""
+Golden-file tests for the single-pass news extractor
+tests/golden/news 下保存南开新闻网格式的页面 (*.html) 和原 BeautifulSoup 实现的提取结果 (*.json)，
+news_extractor 的输出必须逐字段一致；新增页面后用
+python scripts/benchmark_parser.py --golden tests/golden/news --update-golden 生成基准
+"""
+
+import os
+import sys
+import json
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, 'Code', 'spider'))
+
+from news_extractor import extract_news_fields
+
+GOLDEN_DIR = os.path.join(ROOT, 'tests', 'golden', 'news')
+FIELDS = ('media_name', 'ctime', 'wapurl', 'title', 'content')
+
+PAGES = sorted(os.path.splitext(name)[0] for name in os.listdir(GOLDEN_DIR) if name.endswith('.html'))
+
+
+def test_golden_pages_present():
+    assert PAGES, "tests/golden/news 下没有保存的页面"
+    for name in PAGES:
+        assert os.path.exists(os.path.join(GOLDEN_DIR, name + '.json')), f"{name} 缺少 .json 基准"
+
+
+@pytest.mark.parametrize("name", PAGES)
+def test_extract_matches_golden(name):
+    with open(os.path.join(GOLDEN_DIR, name + '.html'), 'r', encoding='utf-8') as f:
+        html = f.read()
+    with open(os.path.join(GOLDEN_DIR, name + '.json'), 'r', encoding='utf-8') as f:
+        expected = json.load(f)
+    assert dict(zip(FIELDS, extract_news_fields(html))) == expected